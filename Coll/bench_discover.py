@@ -0,0 +1,825 @@
+#!/usr/bin/env python3
+"""
+bench_discover.py
+
+Dry-run harness for discover_sys_audit.py: builds a scratch oratab, a fake
+`sqlplus` (canned answers after a configurable logon/query delay) and a
+synthetic audit_file_dest per SID, then runs the real script against it.
+
+  workers   wall time of a full run for each --workers value; the CSV and
+            console output of every run must match the serial run
+  sessions  one sqlplus session per SID against --sqlplus-per-query:
+            wall time and logons (the fake counts them), same CSV
+  checkpoint  --checkpoint runs across appends, new files, renames,
+            delete/recreate, copytruncate and a half-written record: each
+            SYS CONNECT is reported exactly once; then a no-change rerun
+            against a full scan
+  scan      wall time and the reported files/s and MB/s for each
+            --scan-processes value; same CSV and console output
+  output    peak RSS of a run against the number of findings, CSV and
+            NDJSON: the findings writer streams, so it stays flat
+  parser    the streaming record parser and the mmap pre-filter against a
+            frozen copy of the regex scanner they replaced: identical
+            findings on a synthetic audit dir, hand-written edge cases and
+            random fuzz files at several read sizes, then MB/s of each on
+            files with and without a SYS CONNECT
+  trail     the incremental audit trail extraction: its SQL, sqlplus and
+            oracledb flavours (run on SQLite), returns every row once across
+            pages and timestamp ties; --checkpoint runs read only rows after
+            the high-water mark
+  upload    --collector-url against a real dbcollector (uvicorn, scratch
+            SQLite): every finding is stored, a rerun stores nothing new,
+            write-behind mode and a collector that comes up mid-run (the
+            uploader retries) end with the same rows
+
+Usage:
+  python bench_discover.py workers --sids 16 --workers 1,2,4,8
+  python bench_discover.py sessions --sids 8
+  python bench_discover.py checkpoint --files 1000 --blocks 200
+  python bench_discover.py scan --files 2000 --processes 1,2,4
+  python bench_discover.py output --findings 50000,200000
+  python bench_discover.py parser --files 200 --blocks 200 --fuzz 500
+  python bench_discover.py trail --rows 2000 --page 200
+  python bench_discover.py upload --files 2000 --batch 100
+"""
+
+import os, sys, argparse, tempfile, subprocess, time, random, stat, hashlib, csv, re, socket, sqlite3
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, 'discover_sys_audit.py')
+
+# Reads SQL*Plus input line by line like the real client: SET lines are
+# accepted silently, PROMPT echoes, a statement runs at its closing ';'.
+FAKE_SQLPLUS = r'''#!{python}
+import os, sys, time, re
+logon = float(os.environ.get("FAKE_SQLPLUS_LOGON", "0.2"))
+query = float(os.environ.get("FAKE_SQLPLUS_QUERY", "0.05"))
+root = os.environ["FAKE_SQLPLUS_ROOT"]
+rows = int(os.environ.get("FAKE_SQLPLUS_ROWS", "25"))
+sid = os.environ.get("ORACLE_SID", "")
+unified = not sid[-1:].isdigit() or int(sid[-1]) % 2 == 0
+hang_on = os.environ.get("FAKE_SQLPLUS_HANG_ON", "").lower()
+
+def answer(stmt):
+    low = stmt.lower()
+    if "v$parameter" in low and "audit_file_dest" in low:
+        return [os.path.join(root, "audit", sid)]
+    if "v$parameter" in low and "audit_sys_operations" in low:
+        return ["TRUE"]
+    if "v$option" in low:
+        return ["TRUE" if unified else "FALSE"]
+    m = re.search(r"order by (?:event_timestamp_utc|timestamp), nvl.* fetch first (\d+) rows only", low)
+    if m:
+        return trail_page(low, int(m.group(1)))
+    # two logons a second, from different clients, one of them failed (ORA-01017):
+    # only the trailing sessionid|entry_id tells them apart
+    if "unified_audit_trail" in low:
+        return [f"2024-01-01 00:{i // 120:02d}:{i // 2 % 60:02d}|SYS|client{i % 7}|sqlplus@app{i % 3}|oracle|"
+                f"{1017 if i % 2 else 0}|{1000 + i}|1" for i in range(rows)]
+    if "dba_audit_session" in low:
+        return [f"2024-01-01 00:{i // 120:02d}:{i // 2 % 60:02d}|SYS|oracle|app{i % 3}|pts/{i % 4}|"
+                f"{1017 if i % 2 else 0}|{1000 + i}|0" for i in range(rows)]
+    if "from dual" in low:
+        m = re.search(r"select\s+'([^']*)'", stmt, re.IGNORECASE)
+        return [m.group(1)] if m else []
+    return []
+
+def trail_page(low, limit):
+    # an audit trail of `rows` logons, three per second, paged after the
+    # high-water mark the query spells out, like audit_page_sql asks
+    keyed = []
+    for i in range(rows):
+        ts = f"2024-01-01 {i // 10800:02d}:{i // 180 % 60:02d}:{i // 3 % 60:02d}"
+        row = (f"{ts}|SYS|client{i % 7}|sqlplus@app{i % 3}|oracle|0" if unified
+               else f"{ts}|SYS|oracle|app{i % 3}|pts/{i % 4}|0")
+        keyed.append(((ts + ".000000" if unified else ts, 1000 + i, 1 if unified else 0), row))
+    m = re.search(r"to_(?:timestamp|date)\('([^']+)'", low)
+    if m:
+        s1 = re.search(r"nvl\(sessionid,0\) > (\d+)", low)
+        s2 = re.search(r"nvl\(entry_id,0\) > (\d+)", low)
+        mark = (m.group(1), int(s1.group(1)), int(s2.group(1)) if s2 else 0)
+        keyed = [k for k in keyed if k[0] > mark]
+    keyed.sort()
+    return [f"{k[0]}|{k[1]}|{k[2]}|{row}" for k, row in keyed[:limit]]
+
+time.sleep(logon)
+if os.environ.get("FAKE_SQLPLUS_FAIL_LOGON"):
+    print("ERROR:\nORA-01017: invalid username/password; logon denied", flush=True)
+    sys.exit(1)
+with open(os.path.join(root, "logons.log"), "a") as fh:
+    fh.write(sid + "\n")
+buf = []
+for line in sys.stdin:
+    s = line.strip()
+    if not s:
+        continue
+    up = s.upper()
+    if up in ("EXIT", "QUIT") or up.startswith(("EXIT ", "QUIT ")):
+        break
+    if up.startswith("SET "):
+        continue
+    if up.startswith("PROMPT"):
+        print(s[6:].strip(), flush=True)
+        continue
+    buf.append(s)
+    if s.endswith(";"):
+        stmt = " ".join(buf)
+        buf = []
+        time.sleep(query)
+        if hang_on and hang_on in stmt.lower():
+            time.sleep(3600)
+        for out in answer(stmt):
+            print(out)
+        sys.stdout.flush()
+'''
+
+# ------------------------
+# Synthetic audit files
+# ------------------------
+HIT_BLOCKS = [
+    "ACTION : 'CONNECT'\nDATABASE USER: 'SYS'\nPRIVILEGE : SYSDBA\nCLIENT USER: oracle\n"
+    "CLIENT TERMINAL: pts/0\nCLIENT ADDRESS: (ADDRESS=(PROTOCOL=tcp)(HOST=10.1.{n}.{m})(PORT=51234))\n"
+    "PROGRAM: 'sqlplus@app{m}'\nAUTHENTICATION: 'PASSWORD'\nSTATUS: 0",
+    "ACTION : 'CONNECT'\nDATABASE USER: 'SYS'\nPRIVILEGE : SYSDBA\nCLIENT USER: oracle\n"
+    "CLIENT TERMINAL: pts/{n}\nPROTOCOL=BEQ LOCAL\nPROGRAM: 'sqlplus@dbhost (TNS V1-V3)'\nSTATUS: 0",
+    "ACTION :[7] 'CONNECT'\nDATABASE USER:[3] 'SYS'\nPRIVILEGE :[6] 'SYSDBA'\nCLIENT USER:[6] 'oracle'\n"
+    "CLIENT TERMINAL:[5] 'pts/{n}'\nSTATUS:[1] '0'\nDBID:[10] '1234567890'",
+]
+MISS_BLOCKS = [
+    "ACTION : 'SELECT'\nDATABASE USER: 'APPUSER'\nPRIVILEGE : NONE\nCLIENT USER: app\nSTATUS: 0",
+    "ACTION :[6] 'LOGOFF'\nDATABASE USER:[7] 'APPUSER'\nPRIVILEGE :[4] 'NONE'\nSTATUS:[1] '0'",
+]
+# what audit_sys_operations writes for every statement a SYSDBA session runs
+SYS_STATEMENT_BLOCKS = [
+    "ACTION :[{n}0] 'select name, open_mode, database_role from v$database where rownum <= {m}'\n"
+    "DATABASE USER:[1] '/'\nPRIVILEGE :[6] 'SYSDBA'\nCLIENT USER:[6] 'oracle'\nCLIENT TERMINAL:[5] 'pts/{n}'\n"
+    "STATUS:[1] '0'\nDBID:[10] '1234567890'\nSESSIONID:[10] '4294967295'\nUSERHOST:[6] 'dbhost'",
+    "ACTION :[{n}4] 'BEGIN dbms_stats.gather_schema_stats(ownname => ''APP{m}''); END;'\n"
+    "DATABASE USER:[3] 'SYS'\nPRIVILEGE :[6] 'SYSDBA'\nCLIENT USER:[6] 'oracle'\nCLIENT TERMINAL:[7] 'UNKNOWN'\n"
+    "STATUS:[1] '0'\nDBID:[10] '1234567890'",
+]
+HEADER = ("Audit file {path}\nOracle Database 19c Enterprise Edition Release 19.0.0.0.0 - Production\n"
+          "Build label:    RDBMS_19.3.0.0.0DBRU_LINUX.X64_190417\nORACLE_HOME:    /u01/app/oracle/product/19c\n"
+          "System name:    Linux\nNode name:      dbhost\nInstance name: {sid}\nRedo thread mounted by this instance: 1\n"
+          "Oracle process number: 42\nUnix process pid: {pid}, image: oracle@dbhost\n")
+
+
+def make_audit_file(path, sid, rnd, hit, blocks, misses=MISS_BLOCKS):
+    parts = [HEADER.format(path=path, sid=sid, pid=rnd.randint(1000, 99999))]
+    hit_at = rnd.randrange(blocks) if hit else -1
+    for i in range(blocks):
+        tmpl = rnd.choice(HIT_BLOCKS) if i == hit_at else rnd.choice(misses)
+        parts.append(f"Mon Jan  1 00:{i % 60:02d}:00 2024 +00:00\nLENGTH : '{rnd.randint(150, 400)}'\n"
+                     + tmpl.format(n=rnd.randint(0, 9), m=rnd.randint(0, 9)) + "\n")
+    with open(path, 'w') as fh:
+        fh.write("\n".join(parts))
+
+
+def make_audit_dir(directory, sid, files, hit_ratio=0.2, blocks=8, seed=0, misses=MISS_BLOCKS):
+    """files .aud files for sid; hit_ratio of them hold one SYS CONNECT block."""
+    os.makedirs(directory, exist_ok=True)
+    rnd = random.Random(f"{seed}:{sid}")
+    for i in range(files):
+        path = os.path.join(directory, f"{sid}_ora_{10000 + i}_20240101000000000000.aud")
+        make_audit_file(path, sid, rnd, rnd.random() < hit_ratio, blocks, misses)
+        # distinct mtimes keep find_audit_files' newest-first order stable
+        os.utime(path, (1700000000 + i, 1700000000 + i))
+
+
+def make_fixture(root, sids, files_per_sid, blocks=8):
+    """Scratch oratab + fake sqlplus under root; returns the oratab path."""
+    bindir = os.path.join(root, 'home', 'bin')
+    os.makedirs(bindir, exist_ok=True)
+    fake = os.path.join(bindir, 'sqlplus')
+    with open(fake, 'w') as fh:
+        fh.write(FAKE_SQLPLUS.replace('{python}', sys.executable, 1))
+    os.chmod(fake, os.stat(fake).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+    oratab = os.path.join(root, 'oratab')
+    with open(oratab, 'w') as fh:
+        fh.write("# scratch oratab\n")
+        for i in range(sids):
+            sid = f"BENCH{i:02d}"
+            fh.write(f"{sid}:{os.path.join(root, 'home')}:N\n")
+            make_audit_dir(os.path.join(root, 'audit', sid), sid, files_per_sid, blocks=blocks)
+    return oratab
+
+
+def run_discover(root, oratab, output, extra, env_extra):
+    env = dict(os.environ, FAKE_SQLPLUS_ROOT=root, **env_extra)
+    t0 = time.perf_counter()
+    p = subprocess.run([sys.executable, SCRIPT, '--oratab', oratab, '--output', output] + extra,
+                       env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    if p.returncode != 0:
+        sys.exit(f"discover_sys_audit.py failed ({p.returncode}):\n{p.stderr}")
+    return wall, p.stdout
+
+
+def stable_stdout(stdout, output):
+    """Console output without what changes from run to run: the CSV path and scan rates."""
+    return re.sub(r" in [0-9.]+s \(.*\)", "", stdout.replace(output, '<output>'))
+
+
+def digest(path):
+    with open(path, 'rb') as fh:
+        return hashlib.sha256(fh.read()).hexdigest()[:12]
+
+
+# ------------------------
+# Benchmarks
+# ------------------------
+def bench_workers(args):
+    root = tempfile.mkdtemp(prefix="bench_discover_")
+    oratab = make_fixture(root, args.sids, args.files)
+    env = {'FAKE_SQLPLUS_LOGON': str(args.logon_delay), 'FAKE_SQLPLUS_QUERY': str(args.query_delay)}
+
+    print(f"{args.sids} SIDs, {args.files} audit files each, logon {args.logon_delay}s, query {args.query_delay}s")
+    base = None
+    for n in [int(x) for x in args.workers.split(',')]:
+        out = os.path.join(root, f"findings_w{n}.csv")
+        wall, stdout = run_discover(root, oratab, out, ['--workers', str(n)], env)
+        stdout = stable_stdout(stdout, out)
+        if base is None:
+            base = (wall, digest(out), stdout)
+        same = digest(out) == base[1] and stdout == base[2]
+        print(f"  --workers {n:<3d} {wall:7.2f}s  speedup {base[0] / wall:5.2f}x  "
+              f"csv {digest(out)}  {'identical' if same else 'DIFFERS from serial run'}")
+        if not same:
+            return 1
+    return 0
+
+
+def bench_sessions(args):
+    root = tempfile.mkdtemp(prefix="bench_discover_")
+    oratab = make_fixture(root, args.sids, args.files)
+    env = {'FAKE_SQLPLUS_LOGON': str(args.logon_delay), 'FAKE_SQLPLUS_QUERY': str(args.query_delay)}
+    logons = os.path.join(root, 'logons.log')
+
+    print(f"{args.sids} SIDs, logon {args.logon_delay}s, query {args.query_delay}s")
+    base = None
+    for name, extra in (("per query", ['--sqlplus-per-query']), ("session", [])):
+        if os.path.exists(logons):
+            os.remove(logons)
+        out = os.path.join(root, f"findings_{len(extra)}.csv")
+        wall, _ = run_discover(root, oratab, out, extra, env)
+        with open(logons) as fh:
+            count = sum(1 for _ in fh)
+        if base is None:
+            base = (wall, digest(out))
+        same = digest(out) == base[1]
+        print(f"  {name:10s} {wall:7.2f}s  speedup {base[0] / wall:5.2f}x  logons {count:4d}  "
+              f"csv {digest(out)}  {'identical' if same else 'DIFFERS'}")
+        if not same:
+            return 1
+    return 0
+
+
+def bench_scan(args):
+    root = tempfile.mkdtemp(prefix="bench_discover_")
+    oratab = make_fixture(root, args.sids, args.files, args.blocks)
+    env = {'FAKE_SQLPLUS_LOGON': '0', 'FAKE_SQLPLUS_QUERY': '0'}
+    mb = sum(e.stat().st_size for d in os.scandir(os.path.join(root, 'audit')) for e in os.scandir(d.path)) / 1e6
+
+    print(f"{args.sids} SIDs, {args.files} audit files each, {mb:.0f} MB, {os.cpu_count()} CPUs")
+    base = None
+    for n in [int(x) for x in args.processes.split(',')]:
+        out = os.path.join(root, f"findings_p{n}.csv")
+        wall, stdout = run_discover(root, oratab, out, ['--max-audit-files', '0', '--scan-processes', str(n)], env)
+        rates = re.findall(r"\(([0-9]+ files/s, [0-9.]+ MB/s)", stdout)
+        stdout = stable_stdout(stdout, out)
+        if base is None:
+            base = (wall, digest(out), stdout)
+        same = digest(out) == base[1] and stdout == base[2]
+        print(f"  --scan-processes {n:<3d} {wall:7.2f}s  speedup {base[0] / wall:5.2f}x  "
+              f"scan {'; '.join(rates)}  csv {digest(out)}  {'identical' if same else 'DIFFERS from serial run'}")
+        if not same:
+            return 1
+    return 0
+
+
+def bench_output(args):
+    root = tempfile.mkdtemp(prefix="bench_discover_")
+    oratab = make_fixture(root, 1, 0)
+    adir = os.path.join(root, 'audit', 'BENCH00')
+    env = dict(os.environ, FAKE_SQLPLUS_ROOT=root, FAKE_SQLPLUS_LOGON='0', FAKE_SQLPLUS_QUERY='0')
+    # peak RSS of the script alone, from a wrapper process
+    wrapper = ("import resource, subprocess, sys; subprocess.run(sys.argv[1:], check=True, stdout=subprocess.DEVNULL);"
+               "print(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)")
+    failures = 0
+    for n in [int(x) for x in args.findings.split(',')]:
+        for f in os.listdir(adir):
+            os.remove(os.path.join(adir, f))
+        per_file = 5000
+        for i in range(0, n, per_file):
+            with open(os.path.join(adir, f"BENCH00_ora_{i}.aud"), 'w') as fh:
+                fh.write(''.join(tagged_hit(f"T{j}") for j in range(i, min(n, i + per_file))))
+        for fmt in ('csv', 'ndjson'):
+            out = os.path.join(root, f"findings.{fmt}")
+            t0 = time.perf_counter()
+            p = subprocess.run([sys.executable, '-c', wrapper, sys.executable, SCRIPT, '--oratab', oratab,
+                                '--output', out, '--output-format', fmt, '--max-audit-files', '0'],
+                               env=env, capture_output=True, text=True)
+            wall = time.perf_counter() - t0
+            if p.returncode != 0:
+                sys.exit(f"discover_sys_audit.py failed:\n{p.stderr}")
+            with open(out) as fh:
+                rows = sum(1 for _ in fh) - (fmt == 'csv')
+            ok = rows == n + 10   # plus the fake's unified_audit_trail rows
+            failures += not ok
+            print(f"  {n:8d} findings  {fmt:6s} peak RSS {int(p.stdout) / 1024:7.1f} MB  {wall:6.2f}s  "
+                  f"rows {rows}{'' if ok else ' (WRONG)'}")
+    return 1 if failures else 0
+
+
+def tagged_hit(tag):
+    """A remote SYS CONNECT record whose PROGRAM identifies it in the findings."""
+    return ("Mon Jan  1 00:00:00 2024 +00:00\nLENGTH : '300'\nACTION : 'CONNECT'\nDATABASE USER: 'SYS'\n"
+            "CLIENT ADDRESS: (ADDRESS=(PROTOCOL=tcp)(HOST=10.9.9.9)(PORT=1521))\n"
+            f"PROGRAM: 'sqlplus@{tag}'\nAUTHENTICATION: 'PASSWORD'\n\n")
+
+
+def audit_findings(path):
+    if not os.path.exists(path):
+        return []   # no findings, no file
+    with open(path, newline='') as fh:
+        return [r for r in csv.DictReader(fh) if r['source'] == 'audit_file']
+
+
+def bench_checkpoint(args):
+    root = tempfile.mkdtemp(prefix="bench_discover_")
+    oratab = make_fixture(root, 1, args.files, args.blocks)
+    adir = os.path.join(root, 'audit', 'BENCH00')
+    env = {'FAKE_SQLPLUS_LOGON': '0', 'FAKE_SQLPLUS_QUERY': '0'}
+    ckpt = os.path.join(root, 'checkpoint.json')
+    files = sorted(os.listdir(adir))
+    A, C, D, E, F = (os.path.join(adir, f) for f in files[:5])
+    old = 1700000000
+
+    def write(path, text, mode='a', mtime=old):
+        with open(path, mode) as fh:
+            fh.write(text)
+        os.utime(path, (mtime, mtime))
+
+    def tags(out):
+        return sorted(r['program'].split('@', 1)[1] for r in audit_findings(out)
+                      if r['program'].startswith('sqlplus@T'))
+
+    def run(n, extra):
+        out = os.path.join(root, f"findings_{n}.csv")
+        wall, _ = run_discover(root, oratab, out, ['--max-audit-files', '0'] + extra, env)
+        return wall, out
+
+    for path, tag in ((C, 'T0'), (D, 'T4'), (F, 'T7')):
+        write(path, "\n" + tagged_hit(tag))
+    failures = 0
+
+    def check(step, got, want):
+        nonlocal failures
+        ok = got == want
+        failures += not ok
+        print(f"  {step:44s} {'ok' if ok else 'FAILED'}  {got}" + ("" if ok else f" (want {want})"))
+
+    _, out = run(1, ['--checkpoint', ckpt])
+    check("first run reports the seeded records", tags(out), ['T0', 'T4', 'T7'])
+
+    write(A, "\n" + tagged_hit('T1'))                                       # append
+    write(os.path.join(adir, 'new_ora_1.aud'), tagged_hit('T2'), 'w')        # new file
+    os.rename(C, C + '.rotated.aud')                                         # rename ...
+    write(C + '.rotated.aud', "\n" + tagged_hit('T3'))                       # ... and append
+    os.remove(D)                                                             # delete/recreate
+    write(D, "Audit file recreated\n\n" + tagged_hit('T5'), 'w')
+    half = tagged_hit('T6')
+    write(E, "\n" + half[:120], mtime=time.time())                           # still being written
+    write(F, "Audit file truncated\n\n" + tagged_hit('T8'), 'w')              # copytruncate
+    _, out = run(2, ['--checkpoint', ckpt])
+    check("second run: only the changes", tags(out), ['T1', 'T2', 'T3', 'T5', 'T8'])
+    check("  untouched files not rescanned", len(audit_findings(out)), 5)
+
+    write(E, half[120:])
+    _, out = run(3, ['--checkpoint', ckpt])
+    check("third run: the completed record", tags(out), ['T6'])
+
+    wall_inc, out = run(4, ['--checkpoint', ckpt])
+    check("no-change run finds nothing", len(audit_findings(out)), 0)
+    wall_full, out = run(5, [])
+    check("full scan sees what is left", tags(out), ['T0', 'T1', 'T2', 'T3', 'T5', 'T6', 'T8'])
+    mb = sum(os.path.getsize(os.path.join(adir, f)) for f in os.listdir(adir)) / 1e6
+    print(f"  {args.files} files, {mb:.0f} MB: full scan {wall_full:.2f}s, "
+          f"no-change checkpoint run {wall_inc:.2f}s")
+    return 1 if failures else 0
+
+# ------------------------
+# Parser equivalence
+# ------------------------
+def reference_scan_aud_file(path):
+    """The regex scanner as it was before the streaming parser: the oracle."""
+    try:
+        with open(path, 'r', errors='ignore') as fh:
+            text = fh.read()
+    except Exception:
+        return []
+    findings = []
+    # [block, sep, block, sep, ..., block], for each block's offset in the text
+    parts = re.split(r"(\n\s*\n|\n-+\n)", text)
+    pos = 0
+    for i in range(0, len(parts), 2):
+        b, offset = parts[i], pos
+        pos += len(b) + (len(parts[i + 1]) if i + 1 < len(parts) else 0)
+        if 'DATABASE USER' in b.upper() and 'SYS' in b.upper():
+            db_user = ''
+            if m := re.search(r"DATABASE USER\s*:\s*['\"]?([A-Z0-9_]+)['\"]?", b, re.IGNORECASE):
+                db_user = m.group(1).upper()
+            action = ''
+            if m := re.search(r"ACTION\s*:\s*'?\s*([A-Z_ ]+)\s*'?", b, re.IGNORECASE):
+                action = m.group(1).strip().upper()
+            if db_user == 'SYS' and action.startswith('CONNECT'):
+                client_addr = ''
+                if m := re.search(r"CLIENT ADDRESS\s*:\s*(.+)", b, re.IGNORECASE):
+                    client_addr = m.group(1).strip()
+                program = ''
+                if m := re.search(r"PROGRAM\s*:\s*['\"]?([^\n']+)['\"]?", b, re.IGNORECASE):
+                    program = m.group(1).strip()
+                auth = ''
+                if m := re.search(r"AUTHENTICATION\s*:\s*['\"]?([A-Z0-9_ -]+)['\"]?", b, re.IGNORECASE):
+                    auth = m.group(1).strip().upper()
+                location = 'unknown'
+                method = 'unknown'
+                if re.search(r"PROTOCOL\s*=\s*tcp", b, re.IGNORECASE) or re.search(r"\bHOST\s*=", b, re.IGNORECASE) or re.search(r"\b\d{1,3}(\.\d{1,3}){3}\b", b):
+                    location = 'remote'
+                    method = 'password' if 'PASS' in auth else 'likely-password'
+                if re.search(r"PROTOCOL\s*=\s*BEQ", b, re.IGNORECASE) or re.search(r"\bLOCAL\b", b, re.IGNORECASE) or 'BEQ' in b.upper():
+                    location = 'local'
+                    method = 'password' if 'PASS' in auth else 'local-auth'
+                if 'sqlplus' in program.lower() and method == 'unknown':
+                    method = 'possible-password-in-cmdline'
+                findings.append({'file': path, 'offset': offset, 'db_user': db_user, 'action': action,
+                                 'client_address': client_addr, 'program': program, 'auth': auth,
+                                 'detected_method': method, 'detected_location': location})
+    return findings
+
+
+# records the regexes can read more than one way
+EDGE_BLOCKS = [
+    "ACTION :\n  'CONNECT'\nDATABASE USER:\n 'SYS'\nCLIENT ADDRESS:\n(ADDRESS=(PROTOCOL=tcp)(HOST=h1))",
+    "action : connect\ndatabase user: sys\nprogram: sqlplus@x\nauthentication: password",
+    "TRANSACTION : 'CONNECT' DATABASE USER: 'SYS' PROGRAM: 'a' PROGRAM: 'b'",
+    "DATABASE USER:[3] 'SYS'\nDATABASE USER: 'SYS'\nACTION :[7] 'CONNECT'\nSTATUS: 0",
+    "DATABASE USER: '/'\nDATABASE USER: 'SYS'\nACTION : 'CONNECT'",
+    "DATABASE USER: 'SYSTEM'\nACTION : 'CONNECT'\nCLIENT ADDRESS: 10.0.0.1",
+    "ACTION : '   CONNECT AS SYSDBA '\nDATABASE USER: \"SYS\"\nCLIENT ADDRESS:   \nPROGRAM: ''",
+    "ACTION : 'CONNECT'\nDATABASE USER: 'SYS'\nCLIENT ADDRESS: 192.168.1.300\nAUTHENTICATION: 'OS'",
+    "ACTION : 'CONNECT'\nDATABASE USER: 'SYS'\nNOTE: HOST = dbhost, not local\nAUTHENTICATION: PASS-WORD",
+    "ACTION : 'CONNECT'\nDATABASE USER: 'SYS'\nCLIENT ADDRESS: (protocol=beq)(localhost)",
+    "ACTION : 'CONNECT'\nDATABASE USER: 'SYS'\nPROGRAM: 'SQLPLUS.EXE'\nAUTHENTICATION :",
+    "ACTION:'CONNECT'\tDATABASE USER:'SYS'\tCLIENT ADDRESS:(HOST=a)\tPROGRAM:'p'\tAUTHENTICATION:'PASSWORD'",
+    "ACTION : 'CONNECT'\nDATABAſE USER: 'SYS'\nCLIENT ADDRESS: LOCAL",
+    "ACTION : 'CONNECT'\nDATABASE USER: 'sys'\nCLIENT ADDRESS: \u00e9\u00e8 1.2.3.4",
+    "Mon Jan  1 00:00:00 2024\nACTION : 'LOGOFF'\nDATABASE USER: 'SYS'\nPRIVILEGE : SYSDBA",
+    "ACTION : 'CONNECT'\nDATABASE USER: 'SYS'",
+]
+SEPARATORS = ["\n\n", "\n \n", "\n\t\n\n", "\n---\n", "\n-\n\n", "\n\n\n\n", "\n  \n  ", "\n---\n---\n", "\n"]
+FUZZ_LINES = ["ACTION : 'CONNECT'", "ACTION :", "'CONNECT'", "DATABASE USER: 'SYS'", "DATABASE USER:",
+              "'SYS'", "DATABASE USER:[3] 'SYS'", "CLIENT ADDRESS:", "CLIENT ADDRESS: (HOST=10.0.0.1)",
+              "PROGRAM: 'sqlplus@h'", "PROGRAM:", "AUTHENTICATION: 'PASSWORD'", "AUTHENTICATION:",
+              "PROTOCOL=BEQ", "local", "", " ", "\t", "-", "---", "--- ", "STATUS: 0", "PRIVILEGE : SYSDBA",
+              "sys", "1.2.3.4", "host =", "ACTION : 'SELECT'", "DATABASE USER: SYS", "database user : sys",
+              "DATABASE USER: 'SYSTEM'", "SYS", "\f", " \v ", "-- -", "----"]
+# lines that keep a file off the byte-level fast path
+FUZZ_TEXT_MODE_LINES = ["DATABAſE USER: 'SYS'", "PROGRAM: '\u00e9t\u00e9'", "\x1c", "ACTION : 'CONNECT'\r"]
+
+
+def write_bytes(path, text, crlf=False):
+    data = text.replace("\n", "\r\n") if crlf else text
+    with open(path, 'wb') as fh:
+        fh.write(data.encode('utf-8', 'surrogateescape'))
+
+
+def bench_parser(args):
+    sys.path.insert(0, HERE)
+    import discover_sys_audit as dsa
+    root = tempfile.mkdtemp(prefix="bench_discover_")
+
+    # application sessions, and SYSDBA sessions where nearly every record is SYS
+    adir = os.path.join(root, 'synthetic')
+    make_audit_dir(adir, 'APP', args.files // 2, hit_ratio=args.hit_ratio, blocks=args.blocks)
+    make_audit_dir(adir, 'SYS', args.files - args.files // 2, hit_ratio=args.hit_ratio, blocks=args.blocks,
+                   misses=SYS_STATEMENT_BLOCKS + MISS_BLOCKS[:1])
+    synthetic = sorted(os.path.join(adir, f) for f in os.listdir(adir))
+
+    edir = os.path.join(root, 'edge')
+    os.makedirs(edir)
+    edge = []
+    for i, sep in enumerate(SEPARATORS):
+        for crlf in (False, True):
+            path = os.path.join(edir, f"edge_{i}_{int(crlf)}.aud")
+            # invalid utf-8 and a record with no separator at end of file
+            write_bytes(path, "Audit file\udcff\udcfe" + sep + sep.join(EDGE_BLOCKS) + sep.rstrip("\n"), crlf)
+            edge.append(path)
+
+    fdir = os.path.join(root, 'fuzz')
+    os.makedirs(fdir)
+    fuzz = []
+    for i in range(args.fuzz):
+        rnd = random.Random(i)
+        vocabulary = FUZZ_LINES + (FUZZ_TEXT_MODE_LINES if i % 2 else [])
+        lines = [rnd.choice(vocabulary) + rnd.choice(["", "", " ", "  LOCAL", " x"]) for _ in range(rnd.randint(1, 120))]
+        text = "\n".join(lines)
+        path = os.path.join(fdir, f"fuzz_{i}.aud")
+        write_bytes(path, text, crlf=i % 2 and rnd.random() < 0.2)
+        fuzz.append(path)
+
+    failures = 0
+    for name, paths in (("synthetic", synthetic), ("edge cases", edge), ("fuzz", fuzz)):
+        bad = 0
+        found = 0
+        for path in paths:
+            want = reference_scan_aud_file(path)
+            found += len(want)
+            # small read sizes put chunk boundaries inside records and separators
+            for size in (1, 7, 64, 4096, 1 << 20):
+                dsa.AUD_CHUNK_SIZE = size
+                if dsa.scan_aud_file_for_sys(path) != want:
+                    bad += 1
+                    if bad <= 3:
+                        print(f"  MISMATCH {path} read size {size}")
+                    break
+        dsa.AUD_CHUNK_SIZE = 1 << 20
+        failures += bad
+        print(f"  {name:12s} {len(paths):5d} files {found:6d} findings  {'identical' if not bad else f'{bad} differ'}")
+
+    hits = [p for p in synthetic if reference_scan_aud_file(p)]
+    misses = [p for p in synthetic if p not in set(hits)]
+    print(f"  synthetic: {len(misses)} files without a SYS CONNECT, {len(hits)} with one")
+    for name, fn in (("regex scanner", reference_scan_aud_file), ("streaming parser", dsa._scan_aud_file_text),
+                     ("mmap pre-filter", dsa.scan_aud_file_for_sys)):
+        rates = []
+        for paths in (synthetic, misses, hits):
+            mb = sum(os.path.getsize(p) for p in paths) / 1e6
+            best = None
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                for path in paths:
+                    fn(path)
+                wall = time.perf_counter() - t0
+                best = wall if best is None else min(best, wall)
+            rates.append(mb / best)
+        print(f"  {name:16s} all {rates[0]:7.1f} MB/s   miss files {rates[1]:7.1f} MB/s   "
+              f"hit files {rates[2]:7.1f} MB/s  (best of {args.repeat})")
+    return 1 if failures else 0
+
+
+class SQLiteTrail:
+    """db.run() (sqlplus lines) or db.fetch() (oracledb rows) over a SQLite
+    copy of an audit trail, with the Oracle bits audit_page_sql uses mapped
+    onto SQLite."""
+    def __init__(self, typed=False):
+        self.typed = typed
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.create_function('NVL', 2, lambda a, b: b if a is None else a)
+        self.conn.create_function('TO_CHAR', 1, str)
+        self.conn.create_function('TO_CHAR', 2, lambda v, fmt: v if fmt.endswith('FF6') else v[:19])
+        self.conn.create_function('TO_TIMESTAMP', 2, lambda v, fmt: v)
+        self.conn.create_function('TO_DATE', 2, lambda v, fmt: v)
+        self.queries = 0
+
+    def fetch(self, sql, params=None, arraysize=None):
+        self.queries += 1
+        sql = re.sub(r"FETCH FIRST (\S+) ROWS ONLY", r"LIMIT \1", sql)
+        # sqlite3 ignores extra named parameters; oracledb fails on them (DPY-4008)
+        unused = set(params or {}) - set(re.findall(r":(\w+)", sql))
+        if unused:
+            raise ValueError(f"binds not used by the SQL: {sorted(unused)}")
+        return True, self.conn.execute(sql.rstrip(';'), params or {}).fetchall()
+
+    def run(self, sql):
+        ok, rows = self.fetch(sql)
+        return ok, [r[0] for r in rows]
+
+
+def make_trail(db, trail, rnd, count, day):
+    # few distinct timestamps, so most rows tie on it, and NULL session ids
+    if trail == 'unified_audit_trail':
+        db.conn.execute("CREATE TABLE IF NOT EXISTS unified_audit_trail (event_timestamp_utc, event_timestamp, "
+                        "sessionid, entry_id, dbusername, action_name, client_host, client_program_name, "
+                        "os_username, return_code)")
+        rows = []
+        for _ in range(count):
+            hms = f"00:{rnd.randint(0, 5):02d}.{rnd.choice([0, 500000]):06d}"
+            # local time, as event_timestamp is from 12.2: the clocks went back an hour before day 2
+            rows.append((f"2024-01-{day:02d} 00:{hms}", f"2024-01-01 {2 - day:02d}:{hms}",
+                         rnd.choice([None, rnd.randint(1, 50)]), rnd.randint(1, 4),
+                         rnd.choice(['SYS', 'SYSTEM', 'APP']), rnd.choice(['LOGON', 'LOGON', 'SELECT']),
+                         'host', 'sqlplus', 'oracle', 0))
+        # (timestamp, session, entry) is unique in a real trail, the key the mark relies on
+        rows = list({(r[0], r[2] or 0, r[3]): r for r in rows}.values())
+        db.conn.executemany("INSERT INTO unified_audit_trail VALUES (?,?,?,?,?,?,?,?,?,?)", rows)
+        return {(r[0], r[2] or 0, r[3]): r for r in rows if r[4] in ('SYS', 'SYSTEM') and r[5] == 'LOGON'}
+    db.conn.execute("CREATE TABLE IF NOT EXISTS dba_audit_session (timestamp, sessionid, username, "
+                    "os_username, userhost, terminal, returncode)")
+    rows = [(f"2024-01-{day:02d} 00:00:{rnd.randint(0, 5):02d}", rnd.randint(1, 10 ** 6),
+             rnd.choice(['SYS', 'SYSTEM', 'APP']), 'oracle', 'host', 'pts/0', 0) for _ in range(count)]
+    rows = list({(r[0], r[1], 0): r for r in rows}.values())
+    db.conn.executemany("INSERT INTO dba_audit_session VALUES (?,?,?,?,?,?,?)", rows)
+    return {(r[0], r[1], 0): r for r in rows if r[2] in ('SYS', 'SYSTEM')}
+
+
+def bench_trail(args):
+    sys.path.insert(0, HERE)
+    import discover_sys_audit as dsa
+    failures = 0
+
+    def check(step, ok, detail=''):
+        nonlocal failures
+        failures += not ok
+        print(f"  {step:52s} {'ok' if ok else 'FAILED'}  {detail}")
+
+    # the generated SQL itself, on SQLite: every row exactly once, in key order,
+    # for any page size, also when rows tie on the timestamp across page ends
+    for trail, typed in [(t, typed) for t in dsa.AUDIT_TRAILS for typed in (False, True)]:
+        for page in (1, 3, 64):
+            rnd, db = random.Random(page), SQLiteTrail(typed)
+            want, mark, got = {}, None, []
+            for day in (1, 2):   # the second day arrives after the first extraction
+                want.update(make_trail(db, trail, rnd, args.trail_rows, day))
+                for row_mark, _ in dsa.query_audit_since(db, trail, mark, page):
+                    mark = row_mark
+                    got.append((row_mark[0], int(row_mark[1]), int(row_mark[2])))
+            check(f"{trail} {'oracledb' if typed else 'sqlplus'} pages of {page}", got == sorted(want),
+                  f"{len(got)} rows in {db.queries} queries")
+
+    # end to end against the fake: each run reads only the rows after the checkpoint
+    root = tempfile.mkdtemp(prefix="bench_discover_")
+    oratab = make_fixture(root, 2, 0)   # BENCH00 unified, BENCH01 traditional
+    ckpt = os.path.join(root, 'checkpoint.json')
+
+    def run(n, rows, extra):
+        out = os.path.join(root, f"findings_{n}.csv")
+        env = {'FAKE_SQLPLUS_LOGON': '0', 'FAKE_SQLPLUS_QUERY': '0', 'FAKE_SQLPLUS_ROWS': str(rows)}
+        run_discover(root, oratab, out, ['--limit-audit-rows', str(args.page)] + extra, env)
+        if not os.path.exists(out):
+            return []   # no findings, no file
+        with open(out) as fh:
+            found = [r for r in csv.DictReader(fh) if r['source'] != 'audit_file']
+        return sorted((r['sid'], r['timestamp'], r['row']) for r in found)
+
+    first = run(1, args.trail_rows, ['--checkpoint', ckpt])
+    check("first run: the whole trail", len(first) == 2 * args.trail_rows, f"{len(first)} rows")
+    check("no-change run: nothing", run(2, args.trail_rows, ['--checkpoint', ckpt]) == [])
+    grown = run(3, args.trail_rows * 2, ['--checkpoint', ckpt])
+    everything = run(4, args.trail_rows * 2, ['--checkpoint', ckpt + '.fresh'])
+    check("grown trail: only the new rows", sorted(first + grown) == everything,
+          f"{len(grown)} rows")
+    legacy = run(5, args.trail_rows, [])
+    check("without --checkpoint: newest rows, as before",
+          len(legacy) == 2 * min(10, args.trail_rows) and all(r[2].count('|') == 5 for r in legacy))
+    return 1 if failures else 0
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_collector(workdir, port, env_extra):
+    """uvicorn dbcollector:app with its SQLite database in workdir; waits until it listens."""
+    env = dict(os.environ, **env_extra)
+    proc = subprocess.Popen([sys.executable, '-m', 'uvicorn', '--app-dir', HERE, '--port', str(port),
+                             '--log-level', 'warning', 'dbcollector:app'],
+                            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(200):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    sys.exit("dbcollector did not start (is uvicorn installed?)")
+
+
+def stored_rows(workdir):
+    conn = sqlite3.connect(os.path.join(workdir, 'central.db'))
+    try:
+        return conn.execute("SELECT COUNT(*) FROM db_sys_audit").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def bench_upload(args):
+    root = tempfile.mkdtemp(prefix="bench_discover_")
+    oratab = make_fixture(root, args.sids, args.files)
+    env = dict(os.environ, FAKE_SQLPLUS_ROOT=root, FAKE_SQLPLUS_LOGON='0', FAKE_SQLPLUS_QUERY='0')
+
+    # the CSV run says how many findings each upload must deliver
+    out = os.path.join(root, 'findings.csv')
+    run_discover(root, oratab, out, ['--max-audit-files', '0'], {'FAKE_SQLPLUS_LOGON': '0', 'FAKE_SQLPLUS_QUERY': '0'})
+    with open(out, newline='') as fh:
+        findings = list(csv.DictReader(fh))
+    want = len(findings)
+    # a file that already holds a SYS CONNECT, for one more appended between uploads
+    grown = next(r['file'] for r in findings if r['source'] == 'audit_file')
+
+    def upload(port, delay_start=None):
+        cmd = [sys.executable, SCRIPT, '--oratab', oratab, '--max-audit-files', '0',
+               '--collector-url', f"http://127.0.0.1:{port}", '--collector-batch', str(args.batch)]
+        t0 = time.perf_counter()
+        p = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if delay_start:
+            time.sleep(delay_start[0])
+            delay_start[1]()
+        stdout, stderr = p.communicate()
+        wall = time.perf_counter() - t0
+        if p.returncode != 0:
+            sys.exit(f"discover_sys_audit.py failed ({p.returncode}):\n{stdout}\n{stderr}")
+        m = re.search(r"Uploaded \d+ findings .*", stdout)
+        return wall, m.group(0) if m else '(no upload line)', stderr.count('retry')
+
+    print(f"{args.sids} SIDs, {args.files} audit files each, {want} findings, batches of {args.batch}")
+    failures = 0
+    for name, env_extra in (("direct", {}), ("write-behind", {'COLLECTOR_WRITE_BEHIND': '1'})):
+        workdir = tempfile.mkdtemp(dir=root)
+        port = free_port()
+        proc = start_collector(workdir, port, env_extra)
+        try:
+            for run in ("first", "rerun", "grown"):
+                if run == "grown":
+                    with open(grown, 'a') as fh:
+                        fh.write("\nMon Jan  1 01:00:00 2024 +00:00\n" + HIT_BLOCKS[0].format(n=9, m=9) + "\n")
+                    want += 1
+                wall, line, _ = upload(port)
+                time.sleep(0.5 if env_extra else 0)  # let the writer thread drain
+                rows = stored_rows(workdir)
+                # one row per finding; the rerun's duplicates are ignored, the grown file's new one is not
+                ok = rows == want
+                failures += not ok
+                print(f"  {name:12s} {run:5s} {wall:6.2f}s  db_sys_audit {rows:6d}  {line}")
+            first = rows
+        finally:
+            proc.terminate()
+            proc.wait()
+
+        # collector down when the upload starts: batches are retried until it is up
+        workdir = tempfile.mkdtemp(dir=root)
+        port = free_port()
+        started = []
+        wall, line, retries = upload(port, (1.0, lambda: started.append(start_collector(workdir, port, env_extra))))
+        time.sleep(0.5 if env_extra else 0)
+        try:
+            rows = stored_rows(workdir)
+        finally:
+            for proc in started:
+                proc.terminate()
+                proc.wait()
+        ok = rows == first and retries > 0
+        failures += not ok
+        print(f"  {name:12s} late  {wall:6.2f}s  db_sys_audit {rows:6d}  {retries} retries  "
+              f"{'same rows' if ok else 'DIFFERS'}")
+    return 1 if failures else 0
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmarks for discover_sys_audit.py against a fake sqlplus.")
+    sub = p.add_subparsers(dest='bench', required=True)
+    w = sub.add_parser('workers', help="wall time against --workers")
+    w.add_argument('--sids', type=int, default=16)
+    w.add_argument('--files', type=int, default=20, help="audit files per SID")
+    w.add_argument('--workers', default='1,2,4,8', help="comma-separated --workers values")
+    w.add_argument('--logon-delay', type=float, default=0.3)
+    w.add_argument('--query-delay', type=float, default=0.1)
+    se = sub.add_parser('sessions', help="persistent session against one sqlplus per query")
+    se.add_argument('--sids', type=int, default=8)
+    se.add_argument('--files', type=int, default=5, help="audit files per SID")
+    se.add_argument('--logon-delay', type=float, default=0.3)
+    se.add_argument('--query-delay', type=float, default=0.05)
+    ck = sub.add_parser('checkpoint', help="--checkpoint correctness and a no-change rerun")
+    ck.add_argument('--files', type=int, default=1000, help="audit files in the directory")
+    ck.add_argument('--blocks', type=int, default=200, help="audit records per file")
+    sc = sub.add_parser('scan', help="--scan-processes: wall time and scan rates")
+    sc.add_argument('--sids', type=int, default=1)
+    sc.add_argument('--files', type=int, default=2000, help="audit files per SID")
+    sc.add_argument('--blocks', type=int, default=200, help="audit records per file")
+    sc.add_argument('--processes', default='1,2,4', help="comma-separated --scan-processes values")
+    ou = sub.add_parser('output', help="peak RSS against the number of findings")
+    ou.add_argument('--findings', default='50000,200000', help="comma-separated finding counts")
+    pa = sub.add_parser('parser', help="streaming parser against the regex scanner: findings and MB/s")
+    pa.add_argument('--files', type=int, default=200, help="synthetic audit files")
+    pa.add_argument('--blocks', type=int, default=200, help="audit records per synthetic file")
+    pa.add_argument('--fuzz', type=int, default=500, help="random fuzz files")
+    pa.add_argument('--hit-ratio', type=float, default=0.1, help="synthetic files holding a SYS CONNECT")
+    pa.add_argument('--repeat', type=int, default=3)
+    tr = sub.add_parser('trail', help="incremental audit trail extraction: every row once")
+    tr.add_argument('--rows', dest='trail_rows', type=int, default=2000, help="audit trail rows")
+    tr.add_argument('--page', type=int, default=200, help="--limit-audit-rows")
+    up = sub.add_parser('upload', help="--collector-url against a scratch dbcollector")
+    up.add_argument('--sids', type=int, default=2)
+    up.add_argument('--files', type=int, default=200, help="audit files per SID")
+    up.add_argument('--batch', type=int, default=100, help="--collector-batch")
+    args = p.parse_args()
+    return {'workers': bench_workers, 'sessions': bench_sessions,
+            'checkpoint': bench_checkpoint,
+            'scan': bench_scan, 'output': bench_output, 'parser': bench_parser,
+            'trail': bench_trail, 'upload': bench_upload}[args.bench](args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+bench_submit.py
+
+Compare /submit ingest throughput (rows/sec) for the per-row loop and the
+set-based bulk path, against a scratch SQLite database.
+
+Usage:
+  python bench_submit.py --hosts 20 --checks 2000 --change-ratio 0.1
+"""
+
+import os, sys, argparse, tempfile, time, random
+
+# dbcollector creates its database in the working directory on import
+os.chdir(tempfile.mkdtemp(prefix="bench_submit_"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dbcollector import Assessment
+from storage import SQLiteStorage
+
+
+def make_batch(hosts, checks, change_ratio, seed):
+    rnd = random.Random(seed)
+    batch = []
+    for h in range(hosts):
+        for c in range(checks):
+            changed = rnd.random() < change_ratio
+            batch.append(Assessment(
+                hostname=f"host{h:04d}", oracle_sid="ORCL", pdb_name="PDB1",
+                check_name=f"check_{c:05d}",
+                result=f"value {c}" + (f" rev{seed}" if changed else ""),
+                status="FAIL" if c % 7 == 0 else "PASS"))
+    return batch
+
+
+def run(store, fn, batch):
+    t0 = time.perf_counter()
+    with store.writer() as cur:
+        counters = fn(cur, batch, time.strftime("%Y-%m-%d %H:%M:%S"))
+    return time.perf_counter() - t0, counters
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark row-wise vs set-based /submit ingest.")
+    p.add_argument('--hosts', type=int, default=20)
+    p.add_argument('--checks', type=int, default=2000)
+    p.add_argument('--change-ratio', type=float, default=0.1)
+    args = p.parse_args()
+
+    first = make_batch(args.hosts, args.checks, 0.0, seed=1)
+    second = make_batch(args.hosts, args.checks, args.change_ratio, seed=2)
+    rows = len(first)
+
+    print(f"rows per batch: {rows}")
+    for name in ("rowwise", "bulk"):
+        store = SQLiteStorage(os.path.abspath(f"{name}.db"))
+        store.init_schema()
+        fn = getattr(store, f"_submit_{name}")
+        t_load, c_load = run(store, fn, first)
+        t_resubmit, c_resubmit = run(store, fn, second)
+        store.close()
+        print(f"{name:8s} initial load: {rows / t_load:10.0f} rows/sec  (inserted, updated)={c_load}")
+        print(f"{name:8s} resubmit:     {rows / t_resubmit:10.0f} rows/sec  (inserted, updated)={c_resubmit}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -14,23 +14,24 @@ CREATE UNIQUE INDEX IF NOT EXISTS uq_oracle_endpoints_host_endpoint ON oracle_en
 
 # FastAPI Route — Accept JSON from the Bash Script
 
-from fastapi import APIRouter, HTTPException, Request
-import sqlite3
+from fastapi import APIRouter, Body, HTTPException
 import datetime
 
-router = APIRouter()
+# the collector's store, so its one writer connection serialises these writes
+# too; mount with dbcollector.app.include_router(router)
+from dbcollector import store
 
-DB_PATH = "/path/to/your/database.db"   # update for your app
+router = APIRouter()
 
+# plain def: the writer lock is a threading.Lock, taken in the threadpool, not on the event loop
 @router.post("/collect/oracle/endpoints")
-async def collect_oracle_endpoints(request: Request):
+def collect_oracle_endpoints(data=Body(...)):
     """
     Payload format expected:
     {
       "hostname": [ "host:port/service", "host:port/service2", ... ]
     }
     """
-    data = await request.json()
 
     if not isinstance(data, dict) or len(data.keys()) != 1:
         raise HTTPException(status_code=400, detail="Invalid payload format")
@@ -41,37 +42,29 @@ async def collect_oracle_endpoints(request: Request):
     if not isinstance(endpoints, list):
         raise HTTPException(status_code=400, detail="Payload value must be a list")
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    for ep in endpoints:
+    now = datetime.datetime.utcnow()
+    with store.writer() as cur:
         # Insert new or update last_seen if exists
-        cur.execute("""
+        cur.executemany(store.sql("""
             INSERT INTO oracle_endpoints(hostname, endpoint)
             VALUES(?, ?)
             ON CONFLICT(hostname, endpoint) DO UPDATE
             SET last_seen = ?
-        """, (hostname, ep, datetime.datetime.utcnow()))
-
-    conn.commit()
-    conn.close()
+        """), [(hostname, ep, now) for ep in endpoints])
 
     return {"status": "ok", "hostname": hostname, "count": len(endpoints)}
 
 #FastAPI Route — Retrieve Latest Endpoints for a Host
 @router.get("/oracle/endpoints/{hostname}")
 def get_oracle_endpoints(hostname: str):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT endpoint
-        FROM oracle_endpoints
-        WHERE hostname = ?
-        ORDER BY endpoint
-    """, (hostname,))
-    rows = cur.fetchall()
-    conn.close()
+    with store.reader() as cur:
+        cur.execute(store.sql("""
+            SELECT endpoint
+            FROM oracle_endpoints
+            WHERE hostname = ?
+            ORDER BY endpoint
+        """), (hostname,))
+        rows = cur.fetchall()
 
     return {
         "hostname": hostname,
@@ -81,16 +74,13 @@ def get_oracle_endpoints(hostname: str):
 # FastAPI Route — Retrieve All Known Endpoints (Grouped)
 @router.get("/oracle/endpoints")
 def get_all_oracle_endpoints():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT hostname, endpoint
-        FROM oracle_endpoints
-        ORDER BY hostname, endpoint
-    """)
-    rows = cur.fetchall()
-    conn.close()
+    with store.reader() as cur:
+        cur.execute("""
+            SELECT hostname, endpoint
+            FROM oracle_endpoints
+            ORDER BY hostname, endpoint
+        """)
+        rows = cur.fetchall()
 
     result = {}
     for host, ep in rows:
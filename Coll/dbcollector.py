@@ -1,10 +1,36 @@
-from fastapi import FastAPI, Request, UploadFile, File, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, Response, UploadFile, File, Form, HTTPException, Query
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
-import sqlite3, time, hashlib, csv, io
-
-DB = "central.db"
+from fastapi.concurrency import run_in_threadpool
+import time, csv, io, os, logging, queue, shutil, tempfile, gzip, zlib
+from storage import open_storage, RESULT_COLUMNS, SYS_AUDIT_COLUMNS, SYS_AUDIT_PAGE_COLUMNS
+from writebehind import WriteBehindQueue
+
+# SQLite (default) or PostgreSQL, chosen by COLLECTOR_STORAGE; see storage.py
+store = open_storage()
+# batches at least this large go through the set-based ingest path
+BULK_THRESHOLD = int(os.environ.get("COLLECTOR_BULK_THRESHOLD", "200"))
+# rows per executemany when streaming a sys audit upload
+SYS_AUDIT_BATCH = int(os.environ.get("COLLECTOR_SYS_AUDIT_BATCH", "1000"))
+# decompressed bytes accepted in one /upload-sys-audit/stream body
+MAX_UPLOAD_BYTES = int(os.environ.get("COLLECTOR_MAX_UPLOAD_BYTES", str(1 << 30)))
+# body bytes gathered before each threadpool write to the upload's spool file
+SPOOL_FLUSH_BYTES = int(os.environ.get("COLLECTOR_SPOOL_FLUSH_BYTES", str(1 << 20)))
+# default and maximum rows per page on the read endpoints
+PAGE_SIZE = int(os.environ.get("COLLECTOR_PAGE_SIZE", "500"))
+MAX_PAGE_SIZE = int(os.environ.get("COLLECTOR_MAX_PAGE_SIZE", "5000"))
+# write-behind mode: ingest endpoints answer 202 with a batch id and a
+# background writer group-commits the queued batches
+WRITE_BEHIND = os.environ.get("COLLECTOR_WRITE_BEHIND", "0").lower() in ("1", "true", "yes")
+WRITE_QUEUE_SIZE = int(os.environ.get("COLLECTOR_WRITE_QUEUE_SIZE", "256"))
+WRITE_GROUP_SIZE = int(os.environ.get("COLLECTOR_WRITE_GROUP_SIZE", "64"))
+WRITE_RETRY_AFTER = os.environ.get("COLLECTOR_WRITE_RETRY_AFTER", "2")
+# months of db_assessment_history to keep, current month included (0 keeps
+# all); expired months are written to the archive dir first when it is set
+HISTORY_RETENTION_MONTHS = int(os.environ.get("COLLECTOR_HISTORY_RETENTION_MONTHS", "0"))
+HISTORY_ARCHIVE_DIR = os.environ.get("COLLECTOR_HISTORY_ARCHIVE_DIR") or None
+log = logging.getLogger("dbcollector")
 app = FastAPI()
 templates = Jinja2Templates(directory="templates")
 
@@ -19,155 +45,217 @@ class Assessment(BaseModel):
 
 
 # -------------------- DB Initialization --------------------
-def init_db():
-    with sqlite3.connect(DB) as conn:
-        cur = conn.cursor()
-
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS db_assessment_results (
-            hostname TEXT NOT NULL,
-            oracle_sid TEXT NOT NULL,
-            pdb_name TEXT,
-            check_name TEXT NOT NULL,
-            result TEXT NOT NULL,
-            status TEXT NOT NULL,
-            hash TEXT NOT NULL,
-            timestamp TEXT NOT NULL,
-            PRIMARY KEY (hostname, oracle_sid, pdb_name, check_name)
-        );
-        """)
-
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS db_assessment_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            hostname TEXT NOT NULL,
-            oracle_sid TEXT NOT NULL,
-            pdb_name TEXT,
-            check_name TEXT NOT NULL,
-            result TEXT NOT NULL,
-            status TEXT NOT NULL,
-            hash TEXT NOT NULL,
-            timestamp TEXT NOT NULL
-        );
-        """)
-
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS db_sys_audit (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            hostname TEXT NOT NULL,
-            sid TEXT NOT NULL,
-            timestamp TEXT NOT NULL,
-            file TEXT NOT NULL,
-            database_user TEXT NOT NULL,
-            client_address TEXT NOT NULL,
-            client_user TEXT NOT NULL,
-            status TEXT NOT NULL,
-            action TEXT NOT NULL,
-            UNIQUE(hostname, sid, timestamp, file)
-        );
-        """)
-
-        conn.commit()
-
-init_db()
+store.init_schema()
+store.check_query_plans(PAGE_SIZE)
+if HISTORY_RETENTION_MONTHS:
+    with store.writer() as cur:
+        store.expire_history(cur, HISTORY_RETENTION_MONTHS, HISTORY_ARCHIVE_DIR)
+
+
+writer = WriteBehindQueue(store, WRITE_QUEUE_SIZE, WRITE_GROUP_SIZE) if WRITE_BEHIND else None
+
+
+@app.on_event("startup")
+def startup_event():
+    if writer:
+        writer.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    if writer:
+        writer.stop()
+    store.close()
 # -----------------------------------------------------------
 
 
+def _enqueue(kind, apply, cleanup=None):
+    """Hand a job to the write-behind queue; 503 + Retry-After when it is full."""
+    try:
+        batch_id = writer.enqueue(kind, apply, cleanup)
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="Write queue full, retry later",
+                            headers={"Retry-After": WRITE_RETRY_AFTER})
+    return JSONResponse(status_code=202, content={"batch_id": batch_id, "state": "queued"})
+
+
 @app.post("/submit")
-def submit(data: list[Assessment]):
+def submit(data: list[Assessment], bulk: bool | None = None):
     ts = time.strftime("%Y-%m-%d %H:%M:%S")
-    inserted = updated = 0
-
-    with sqlite3.connect(DB) as conn:
-        cur = conn.cursor()
-
-        for item in data:
-            new_hash = hashlib.sha256(item.result.encode()).hexdigest()
-            row = cur.execute("""
-                SELECT hash FROM db_assessment_results
-                WHERE hostname = ? AND oracle_sid = ? AND pdb_name = ? AND check_name = ?
-            """, (item.hostname, item.oracle_sid, item.pdb_name, item.check_name)).fetchone()
-
-            if row and row[0] == new_hash:
-                continue  # no change
-
-            # store in history if previous record existed
-            if row:
-                updated += 1
-            else:
-                inserted += 1
-
-            # INSERT/REPLACE into main table
-            cur.execute("""
-                INSERT OR REPLACE INTO db_assessment_results
-                (hostname, oracle_sid, pdb_name, check_name, result, status, hash, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (item.hostname, item.oracle_sid, item.pdb_name,
-                  item.check_name, item.result, item.status, new_hash, ts))
-
-            # insert into history
-            cur.execute("""
-                INSERT INTO db_assessment_history
-                (hostname, oracle_sid, pdb_name, check_name, result, status, hash, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (item.hostname, item.oracle_sid, item.pdb_name,
-                  item.check_name, item.result, item.status, new_hash, ts))
-
-        conn.commit()
-
-    return {"received": len(data), "inserted": inserted, "updated": updated}
+    if bulk is None:
+        bulk = len(data) >= BULK_THRESHOLD
+
+    def apply(cur):
+        inserted, updated = store.submit(cur, data, ts, bulk)
+        return {"received": len(data), "inserted": inserted, "updated": updated}
+
+    if writer:
+        return _enqueue("submit", apply)
+    with store.writer() as cur:
+        return apply(cur)
+
+SYS_AUDIT_FIELDS = [c.strip() for c in SYS_AUDIT_COLUMNS.split(",")]
+
+
+def _read_sys_audit_csv(hostname, fh):
+    """
+    Yield db_sys_audit rows from a binary CSV stream (gzip'd or not), decoding
+    as it reads. A header naming the db_sys_audit columns (what
+    discover_sys_audit.py sends) is read by name, anything else by position;
+    the hostname always comes from the request.
+    """
+    if _gzip_magic(fh):
+        fh = gzip.GzipFile(fileobj=fh, mode="rb")
+    text = io.TextIOWrapper(fh, encoding="utf-8", newline="")
+    try:
+        reader = csv.reader(text)
+        names = [h.strip().lower() for h in next(reader, None) or []]
+        if set(SYS_AUDIT_FIELDS[1:]) <= set(names):
+            idx = [names.index(col) for col in SYS_AUDIT_FIELDS[1:]]
+            for row in reader:
+                yield (hostname,) + tuple(row[i] for i in idx)
+            return
+        for row in reader:
+            (_, sid, timestamp, fname, db_user, addr, cuser, status, action) = row
+            yield (hostname, sid, timestamp, fname, db_user, addr, cuser, status, action)
+    finally:
+        text.detach()  # leave the upload's file open for FastAPI to close
+
+
+def _gzip_magic(fh):
+    magic = fh.read(2)
+    fh.seek(-len(magic), os.SEEK_CUR)
+    return magic == b"\x1f\x8b"
+
+
+def _store_sys_audit_spool(hostname, path):
+    """apply(cur) storing the sys audit CSV spooled at path."""
+    def apply(cur):
+        with open(path, "rb") as fh:
+            return {"stored": store.store_sys_audit(cur, _read_sys_audit_csv(hostname, fh), SYS_AUDIT_BATCH)}
+    return apply
+
 
 @app.post("/upload-sys-audit")
-async def upload_sys_audit(hostname: str = Form(...), file: UploadFile = File(...)):
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    reader = csv.reader(io.StringIO((await file.read()).decode()))
-    next(reader, None)  # skip header
-
-    inserted = 0
-    for row in reader:
-        (_, sid, timestamp, fname, db_user, addr, cuser, status, action) = row
-        try:
-            cur.execute("""
-                INSERT INTO db_sys_audit
-                (hostname, sid, timestamp, file, database_user, client_address,
-                 client_user, status, action)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (hostname, sid, timestamp, fname, db_user, addr, cuser, status, action))
-            inserted += 1
-        except sqlite3.IntegrityError:
-            pass  # duplicate → ignored
-
-    conn.commit()
-    conn.close()
+def upload_sys_audit(hostname: str = Form(...), file: UploadFile = File(...)):
+    # sync handler: runs in the threadpool, so reading the spooled upload
+    # in chunks does not block the event loop
+    if writer:
+        # the upload is closed when the request ends; keep a spool copy on
+        # disk for the writer rather than holding the rows in memory
+        spool = tempfile.NamedTemporaryFile(prefix="sys_audit_", suffix=".csv", delete=False)
+        with spool:
+            shutil.copyfileobj(file.file, spool)
+        return _enqueue("upload-sys-audit", _store_sys_audit_spool(hostname, spool.name),
+                        cleanup=lambda: os.unlink(spool.name))
+
+    with store.writer() as cur:
+        inserted = store.store_sys_audit(cur, _read_sys_audit_csv(hostname, file.file), SYS_AUDIT_BATCH)
     return {"stored": inserted}
 
+
+def _discard_spool(spool):
+    spool.close()
+    os.unlink(spool.name)
+
+
+@app.post("/upload-sys-audit/stream")
+async def upload_sys_audit_stream(request: Request, hostname: str):
+    """
+    The same rows as /upload-sys-audit, posted as the raw CSV body, which is
+    how discover_sys_audit.py --collector-url sends its batches. Chunked
+    transfer encoding and Content-Encoding: gzip are decoded as the body
+    arrives, into a spool file: neither form is held in memory. The body is
+    gathered on the event loop and inflated and written in the threadpool,
+    SPOOL_FLUSH_BYTES at a time, so disk I/O never blocks the loop.
+    """
+    encoding = request.headers.get("content-encoding", "identity").lower()
+    if encoding not in ("identity", "gzip"):
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {encoding}")
+    inflate = zlib.decompressobj(wbits=31) if encoding == "gzip" else None
+    spool = await run_in_threadpool(tempfile.NamedTemporaryFile, prefix="sys_audit_", suffix=".csv", delete=False)
+    size = 0
+
+    def write(body):
+        nonlocal size
+        # bounded output per step, so a small gzip body cannot inflate unchecked
+        while body:
+            data = inflate.decompress(body, 1 << 20) if inflate else body
+            body = inflate.unconsumed_tail if inflate else b""
+            size += len(data)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail="Upload too large")
+            spool.write(data)
+
+    try:
+        pending = bytearray()
+        async for chunk in request.stream():
+            pending += chunk
+            if len(pending) >= SPOOL_FLUSH_BYTES:
+                body, pending = bytes(pending), bytearray()
+                await run_in_threadpool(write, body)
+        await run_in_threadpool(write, bytes(pending))
+        await run_in_threadpool(spool.close)
+        if inflate and not inflate.eof:
+            raise HTTPException(status_code=400, detail="Truncated gzip body")
+        apply = _store_sys_audit_spool(hostname, spool.name)
+        if writer:
+            # from here the queue removes the spool, also when it is full
+            path, spool = spool.name, None
+            return _enqueue("upload-sys-audit", apply, cleanup=lambda: os.unlink(path))
+
+        def store_now():
+            with store.writer() as cur:
+                return apply(cur)
+
+        return await run_in_threadpool(store_now)
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Bad gzip body: {e}")
+    finally:
+        if spool is not None:
+            await run_in_threadpool(_discard_spool, spool)
+
+
+@app.get("/batches/{batch_id}")
+def batch_status(batch_id: str):
+    """Outcome of a write-behind batch: queued, applying, done (with counters) or failed."""
+    st = writer.status(batch_id) if writer else None
+    if st is None:
+        raise HTTPException(status_code=404, detail="Unknown batch id")
+    return st
+
+def fetch_page(table, columns, filters, cursor, limit):
+    try:
+        return store.fetch_page(table, columns, filters, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def fetch_history_page(filters, cursor, limit):
+    try:
+        return store.fetch_history_page(filters, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @app.get("/latest_failures")
-def latest_failures():
-    with sqlite3.connect(DB) as conn:
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        rows = cur.execute("""
-            SELECT * FROM db_assessment_results
-            WHERE status = 'FAIL'
-            ORDER BY timestamp DESC
-        """).fetchall()
-    return [dict(r) for r in rows]
+def latest_failures(response: Response, cursor: str | None = None,
+                    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                    hostname: str | None = None, sid: str | None = None,
+                    check_name: str | None = None):
+    rows, next_cursor = fetch_page(
+        "db_assessment_results", RESULT_COLUMNS,
+        {"status": "FAIL", "hostname": hostname, "oracle_sid": sid, "check_name": check_name},
+        cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
 
 
 @app.get("/stats")
 def stats():
-    with sqlite3.connect(DB) as conn:
-        cur = conn.cursor()
-
-        by_status = cur.execute("""
-            SELECT status, COUNT(*) FROM db_assessment_results GROUP BY status
-        """).fetchall()
-
-        by_host = cur.execute("""
-            SELECT hostname, status, COUNT(*)
-            FROM db_assessment_results GROUP BY hostname, status
-        """).fetchall()
+    # reads the maintained summary, never the fact table
+    by_status, by_host = store.stats()
 
     return {
         "global_status_counts": {row[0]: row[1] for row in by_status},
@@ -176,46 +264,69 @@ def stats():
 
 
 @app.get("/changes")
-def changes(limit: int = 100):
-    with sqlite3.connect(DB) as conn:
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        rows = cur.execute("""
-            SELECT * FROM db_assessment_history
-            ORDER BY timestamp DESC
-            LIMIT ?
-        """, (limit,)).fetchall()
-    return [dict(r) for r in rows]
+def changes(response: Response, cursor: str | None = None,
+            limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+            hostname: str | None = None, sid: str | None = None,
+            check_name: str | None = None, status: str | None = None):
+    rows, next_cursor = fetch_history_page(
+        {"hostname": hostname, "oracle_sid": sid, "check_name": check_name, "status": status},
+        cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
 
 
 # ---------------------- HTML dashboard ----------------------
+# Both views render one page and link to the next with the same filters.
 @app.get("/dashboard", response_class=HTMLResponse)
-def dashboard(request: Request):
-    with sqlite3.connect(DB) as conn:
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        rows = cur.execute("""
-            SELECT hostname, oracle_sid, pdb_name, check_name,
-                   result, status, timestamp
-            FROM db_assessment_results
-            ORDER BY hostname, oracle_sid, check_name
-        """).fetchall()
+def dashboard(request: Request, cursor: str | None = None,
+              limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+              hostname: str | None = None, sid: str | None = None,
+              check_name: str | None = None, status: str | None = None):
+    rows, next_cursor = fetch_page(
+        "db_assessment_results",
+        "hostname, oracle_sid, pdb_name, check_name, result, status, timestamp",
+        {"hostname": hostname, "oracle_sid": sid, "check_name": check_name, "status": status},
+        cursor, limit)
+    next_url = request.url.include_query_params(cursor=next_cursor) if next_cursor else None
 
     return templates.TemplateResponse(
-        "dashboard.html", {"request": request, "rows": rows}
+        "dashboard.html", {"request": request, "rows": rows, "next_url": next_url,
+                           "filters": request.query_params}
     )
 
 @app.get("/dashboard/sys-audit")
-def dashboard_sys_audit(request: Request):
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT hostname, sid, timestamp, client_address, client_user, status, action
-        FROM db_sys_audit
-        ORDER BY timestamp DESC
-        LIMIT 500
-    """)
-    rows = cur.fetchall()
-    conn.close()
+def dashboard_sys_audit(request: Request, cursor: str | None = None,
+                        limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        hostname: str | None = None, sid: str | None = None,
+                        status: str | None = None):
+    rows, next_cursor = fetch_page(
+        "db_sys_audit", SYS_AUDIT_PAGE_COLUMNS,
+        {"hostname": hostname, "sid": sid, "status": status},
+        cursor, limit)
+    next_url = request.url.include_query_params(cursor=next_cursor) if next_cursor else None
     return templates.TemplateResponse("sysdash.html",
-                                      {"request": request, "rows": rows})
+                                      {"request": request, "rows": rows, "next_url": next_url,
+                                       "filters": request.query_params})
+
+
+if __name__ == "__main__":
+    import argparse, sys
+    p = argparse.ArgumentParser(description="Central collector maintenance commands.")
+    p.add_argument('command', choices=['check-summary', 'expire-history'],
+                   help="check-summary: rebuild db_status_summary and report any drift; "
+                        "expire-history: apply COLLECTOR_HISTORY_RETENTION_MONTHS now")
+    args = p.parse_args()
+
+    if args.command == 'check-summary':
+        with store.writer() as cur:
+            drift = store.rebuild_status_summary(cur)
+        for h, st, was, actual in drift:
+            print(f"drift: hostname={h} status={st} summary={was} actual={actual}")
+        print(f"db_status_summary rebuilt; {len(drift)} drifted counter(s)")
+        sys.exit(1 if drift else 0)
+
+    if args.command == 'expire-history':
+        with store.writer() as cur:
+            expired = store.expire_history(cur, HISTORY_RETENTION_MONTHS, HISTORY_ARCHIVE_DIR)
+        print(f"expired history months: {', '.join(expired) or 'none'}")
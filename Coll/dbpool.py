@@ -0,0 +1,116 @@
+"""
+dbpool.py
+
+Shared SQLite connection layer for the collector apps: a single writer
+connection that serialises all writes, a pool of read-only connections, and
+WAL mode with tuned pragmas so readers never block behind the writer.
+
+Configured per deployment through environment variables:
+  COLLECTOR_DB                 database path (default central.db)
+  COLLECTOR_READ_POOL_SIZE     read-only connections (default 4)
+  COLLECTOR_BUSY_TIMEOUT_MS    busy_timeout for every connection (default 5000)
+  COLLECTOR_CACHE_SIZE_KB      page cache per connection (default 65536)
+  COLLECTOR_MMAP_SIZE          mmap_size in bytes (default 268435456)
+  COLLECTOR_SYNCHRONOUS        synchronous level for the writer (default NORMAL)
+"""
+
+import os, sqlite3, threading, queue
+from contextlib import contextmanager
+
+DB_PATH = os.environ.get("COLLECTOR_DB", "central.db")
+READ_POOL_SIZE = int(os.environ.get("COLLECTOR_READ_POOL_SIZE", "4"))
+BUSY_TIMEOUT_MS = int(os.environ.get("COLLECTOR_BUSY_TIMEOUT_MS", "5000"))
+CACHE_SIZE_KB = int(os.environ.get("COLLECTOR_CACHE_SIZE_KB", "65536"))
+MMAP_SIZE = int(os.environ.get("COLLECTOR_MMAP_SIZE", str(256 * 1024 * 1024)))
+SYNCHRONOUS = os.environ.get("COLLECTOR_SYNCHRONOUS", "NORMAL")
+
+
+class SQLitePool:
+    def __init__(self, path=DB_PATH, read_pool_size=READ_POOL_SIZE,
+                 busy_timeout_ms=BUSY_TIMEOUT_MS, cache_size_kb=CACHE_SIZE_KB,
+                 mmap_size=MMAP_SIZE, synchronous=SYNCHRONOUS):
+        self.path = path
+        self.read_pool_size = max(1, read_pool_size)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.synchronous = synchronous
+
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self._readers = queue.LifoQueue()
+        self._opened = 0
+        self._open_lock = threading.Lock()
+
+    def _connect(self, readonly):
+        # connections move between FastAPI threadpool workers; access is
+        # serialised by the write lock or by checking out of the pool
+        uri = f"file:{self.path}?mode=ro" if readonly else f"file:{self.path}"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                               timeout=self.busy_timeout_ms / 1000)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        if readonly:
+            conn.row_factory = sqlite3.Row
+        else:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+            conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """Hold the single writer connection; commits on success, rolls back on error."""
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect(readonly=False)
+            conn = self._writer
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    @contextmanager
+    def reader(self):
+        """Check out a read-only connection (rows are sqlite3.Row)."""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._open_lock:
+                grow = self._opened < self.read_pool_size
+                if grow:
+                    self._opened += 1
+            if grow:
+                try:
+                    # the writer creates the file and switches it to WAL first
+                    with self.writer():
+                        pass
+                    conn = self._connect(readonly=True)
+                except BaseException:
+                    with self._open_lock:
+                        self._opened -= 1
+                    raise
+            else:
+                conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    def close(self):
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._open_lock:
+            self._opened = 0
@@ -9,15 +9,38 @@ SYS/SYSTEM, then scans audit dump files for SYS CONNECT events.
 Usage:
   chmod +x discover_sys_audit.py
   ./discover_sys_audit.py --output /tmp/sys_audit_findings.csv
+  ./discover_sys_audit.py --workers 8      # hosts with many SIDs
+  ./discover_sys_audit.py --checkpoint /var/tmp/sys_audit.ckpt   # only new audit records and rows
+  ./discover_sys_audit.py --scan-processes 8   # big audit_file_dest, one core is not enough
+  ./discover_sys_audit.py --output /tmp/sys_audit.ndjson --output-format ndjson
+  ./discover_sys_audit.py --collector-url http://collector:8000   # straight to /upload-sys-audit/stream
 
 Notes:
 - Requires sqlplus in PATH (or ORACLE_HOME/bin in PATH).
 - Script uses bequeath connection by setting ORACLE_SID and running:
     sqlplus -S / as sysdba
+  One sqlplus session per SID carries all of its queries (a single logon);
+  --sqlplus-per-query starts a fresh sqlplus for every statement instead.
+- With python-oracledb installed (and Oracle Client libraries for its thick
+  mode) the same bequeath / as sysdba logon goes through the driver instead:
+  typed rows fetched in arrays, no sqlplus text to parse. Without it, or
+  with --driver sqlplus, everything runs through sqlplus as above.
+- With --checkpoint the unified/traditional audit rows are read incrementally
+  too: every row after the SID's high-water mark, oldest first, in pages of
+  --limit-audit-rows. A SID's first run starts --audit-lookback-days back.
+  Without it the newest --limit-audit-rows rows are read on each run.
 - Be cautious with permissions; results may contain sensitive data.
 """
 
 import os, sys, argparse, subprocess, re, csv, fnmatch, tempfile, shutil, datetime
+import threading, queue, time, io, json, hashlib, multiprocessing, mmap, locale, collections
+import gzip, socket, http.client, urllib.parse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+    import oracledb
+except ImportError:  # optional: without it every query goes through sqlplus
+    oracledb = None
 
 # ------------------------
 # Helpers
@@ -39,24 +62,25 @@ def parse_oratab(path="/etc/oratab"):
                     sids.append((sid, home))
     return sids
 
+SQLPLUS_SETTINGS = [
+    "SET FEEDBACK OFF",
+    "SET HEADING OFF",
+    "SET PAGESIZE 0",
+    "SET LINESIZE 1000",
+    "SET TRIMSPOOL ON",
+    "SET TRIMOUT ON",
+    "SET COLSEP '|'",
+]
+SQLPLUS_TIMEOUT = 60
+
 def run_sqlplus(env, sql):
     """Run sqlplus -S / as sysdba with env dict; return stdout as list of lines"""
     cmd = ['sqlplus', '-S', '/ as sysdba']
     # build a here-doc style input that prints a known marker and quits cleanly
-    wrapper = "\n".join([
-        "SET FEEDBACK OFF",
-        "SET HEADING OFF",
-        "SET PAGESIZE 0",
-        "SET LINESIZE 1000",
-        "SET TRIMSPOOL ON",
-        "SET TRIMOUT ON",
-        "SET COLSEP '|'",
-        sql,
-        "EXIT"
-    ]) + "\n"
+    wrapper = "\n".join(SQLPLUS_SETTINGS + [sql, "EXIT"]) + "\n"
     try:
         p = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, text=True)
-        out, err = p.communicate(wrapper, timeout=60)
+        out, err = p.communicate(wrapper, timeout=SQLPLUS_TIMEOUT)
     except Exception as e:
         return False, f"SQL*Plus invocation failed: {e}"
     if p.returncode != 0:
@@ -66,116 +90,1168 @@ def run_sqlplus(env, sql):
     lines = [ln.rstrip() for ln in out.splitlines() if ln.strip()!='']
     return True, lines
 
-def query_parameter(env, param_name):
+class SqlplusPerQuery:
+    """One sqlplus process per statement (the original behaviour)."""
+    typed = False
+    def __init__(self, env):
+        self.env = env
+    def run(self, sql):
+        return run_sqlplus(self.env, sql)
+    def close(self):
+        pass
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        self.close()
+
+class SqlplusSession:
+    """
+    One `sqlplus -S -L / as sysdba` co-process for a SID: a single logon and
+    SET preamble, then every statement goes over stdin. Each result is framed
+    by PROMPT markers and read back on its own. run() keeps run_sqlplus's
+    (ok, lines) contract; a statement that times out kills the session and
+    the next run() logs on again.
+    """
+    typed = False
+
+    def __init__(self, env, timeout=SQLPLUS_TIMEOUT):
+        self.env = env
+        self.timeout = timeout
+        self.proc = None
+        self._seq = 0
+
+    def _start(self):
+        # -L: give up after one failed logon instead of prompting on stdin
+        self.proc = subprocess.Popen(['sqlplus', '-S', '-L', '/ as sysdba'], stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                     env=self.env, text=True, bufsize=1)
+        self._out = queue.Queue()
+        self._err = []
+        self._err_reader = threading.Thread(target=self._pump, args=(self.proc.stderr, self._err.append), daemon=True)
+        self._err_reader.start()
+        threading.Thread(target=self._pump, args=(self.proc.stdout, self._out.put), daemon=True).start()
+        self.proc.stdin.write("\n".join(SQLPLUS_SETTINGS) + "\n")
+
+    @staticmethod
+    def _pump(stream, sink):
+        for line in stream:
+            sink(line)
+        sink(None)
+
+    def _stop(self, kill):
+        proc, self.proc = self.proc, None
+        if proc is None:
+            return
+        try:
+            if kill:
+                proc.kill()
+            else:
+                proc.stdin.write("EXIT\n")
+                proc.stdin.close()
+            proc.wait(timeout=5)
+        except Exception:
+            proc.kill()
+            proc.wait()
+
+    def run(self, sql):
+        try:
+            if self.proc is None:
+                self._start()
+            self._seq += 1
+            begin, end = f"__DSA_BEGIN_{self._seq}__", f"__DSA_END_{self._seq}__"
+            self.proc.stdin.write(f"PROMPT {begin}\n{sql}\nPROMPT {end}\n")
+            self.proc.stdin.flush()
+        except BrokenPipeError:
+            pass  # sqlplus already exited; its output explains why
+        except Exception as e:
+            self._stop(kill=True)
+            return False, f"SQL*Plus invocation failed: {e}"
+
+        deadline = time.monotonic() + self.timeout
+        out = []
+        while True:
+            try:
+                line = self._out.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                self._stop(kill=True)
+                return False, f"SQL*Plus invocation failed: no reply within {self.timeout} seconds"
+            if line is None:
+                # sqlplus exited (failed logon, killed): fail like a non-zero exit
+                proc = self.proc
+                self._stop(kill=True)
+                self._err_reader.join(1)
+                err = "".join(ln for ln in self._err if ln).strip()
+                return False, err or "\n".join(out).strip() or f"SQL*Plus exited with code {proc.returncode}"
+            line = line.rstrip("\n")
+            if line.strip() == begin:
+                out = []
+            elif line.strip() == end:
+                break
+            else:
+                out.append(line)
+        return True, [ln.rstrip() for ln in out if ln.strip()!='']
+
+    def close(self):
+        self._stop(kill=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# rows per round trip on the oracledb path; prefetch one more so a result
+# that fits in one batch needs no second round trip to see its end
+ORACLEDB_ARRAYSIZE = 1000
+_oracledb_lock = threading.Lock()
+_oracledb_client = None   # None until tried, then True or the reason it failed
+
+def _init_oracledb(home):
+    """Thick mode, which / as sysdba over bequeath needs, loaded once per process."""
+    global _oracledb_client
+    if _oracledb_client is None:
+        try:
+            lib_dir = os.path.join(home, 'lib') if home else None
+            if lib_dir and os.path.isdir(lib_dir):
+                oracledb.init_oracle_client(lib_dir=lib_dir)
+            else:
+                oracledb.init_oracle_client()
+            _oracledb_client = True
+        except Exception as e:
+            _oracledb_client = f"Oracle Client libraries not loaded: {e}"
+    return _oracledb_client
+
+class OracleDriverSession:
+    """
+    One python-oracledb connection (/ as sysdba, bequeath) for a SID. fetch()
+    returns typed rows: no pipe-concatenated SQL, no text to parse. run()
+    keeps the sqlplus (ok, lines) contract for the statements that still
+    use it, one '|'-joined line per row.
+    """
+    typed = True
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @classmethod
+    def open(cls, sid, home, timeout=SQLPLUS_TIMEOUT):
+        """(session, None), or (None, reason) when oracledb cannot be used for sid."""
+        if oracledb is None:
+            return None, "python-oracledb is not installed"
+        with _oracledb_lock:
+            ready = _init_oracledb(home)
+            if ready is not True:
+                return None, ready
+            # bequeath reads ORACLE_SID/ORACLE_HOME from the environment at connect time
+            saved = {k: os.environ.get(k) for k in ('ORACLE_SID', 'ORACLE_HOME')}
+            os.environ['ORACLE_SID'] = sid
+            if home:
+                os.environ['ORACLE_HOME'] = home
+            try:
+                conn = oracledb.connect(mode=oracledb.AUTH_MODE_SYSDBA)
+            except oracledb.Error as e:
+                return None, str(e).strip()
+            finally:
+                for k, v in saved.items():
+                    if v is None:
+                        os.environ.pop(k, None)
+                    else:
+                        os.environ[k] = v
+        conn.call_timeout = timeout * 1000
+        return cls(conn), None
+
+    def fetch(self, sql, params=None, arraysize=ORACLEDB_ARRAYSIZE):
+        """(True, list of row tuples) or (False, error text)."""
+        try:
+            with self.conn.cursor() as cur:
+                cur.arraysize = arraysize
+                cur.prefetchrows = arraysize + 1
+                cur.execute(sql, params or {})
+                return True, cur.fetchall()
+        except oracledb.Error as e:
+            return False, str(e).strip()
+
+    def run(self, sql):
+        ok, rows = self.fetch(sql.rstrip().rstrip(';'))
+        if not ok:
+            return ok, rows
+        return True, ['|'.join('' if v is None else str(v) for v in row) for row in rows]
+
+    def close(self):
+        try:
+            self.conn.close()
+        except oracledb.Error:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def query_parameter(db, param_name):
+    if db.typed:
+        ok, res = db.fetch("SELECT value FROM v$parameter WHERE name = :name", {'name': param_name}, arraysize=1)
+        if not ok:
+            return None, res
+        value = res[0][0] if res else None
+        return (value.strip() if value and value.strip() else None), None
     sql = f"SELECT value FROM v$parameter WHERE name = '{param_name}';"
-    ok, res = run_sqlplus(env, sql)
+    ok, res = db.run(sql)
     if not ok:
         return None, res
     if res:
         return res[0].strip(), None
     return None, None
 
-def query_unified_audit(env, limit=200):
-    # produce pipe-delimited lines: timestamp|dbusername|client_host|client_program|os_username|returncode
+def query_unified_audit(db, limit=200):
+    if db.typed:
+        return _newest_audit_rows(db, 'unified_audit_trail', limit)
+    # produce pipe-delimited lines: timestamp|dbusername|client_host|client_program|os_username|returncode|sessionid|entry_id
     sql = (
         "SELECT TO_CHAR(event_timestamp,'YYYY-MM-DD HH24:MI:SS') || '|' || "
-        "NVL(dbusername,'') || '|' || NVL(client_host,'') || '|' || NVL(client_program_name,'') || '|' || NVL(os_username,'') || '|' || NVL(TO_CHAR(return_code),'') "
+        "NVL(dbusername,'') || '|' || NVL(client_host,'') || '|' || NVL(client_program_name,'') || '|' || NVL(os_username,'') || '|' || NVL(TO_CHAR(return_code),'') || '|' || "
+        "NVL(sessionid,0) || '|' || NVL(entry_id,0) "
         "FROM unified_audit_trail "
         "WHERE dbusername IN ('SYS','SYSTEM') AND action_name='LOGON' "
         "ORDER BY event_timestamp DESC FETCH FIRST %d ROWS ONLY;" % limit
     )
-    ok, res = run_sqlplus(env, sql)
+    ok, res = db.run(sql)
     if not ok:
         return None, res
     return res, None
 
-def query_traditional_audit(env, limit=200):
-    # query DBA_AUDIT_SESSION
+def query_traditional_audit(db, limit=200):
+    if db.typed:
+        return _newest_audit_rows(db, 'dba_audit_session', limit)
+    # query DBA_AUDIT_SESSION: timestamp|username|os_username|userhost|terminal|returncode|sessionid|0
     sql = (
         "SELECT TO_CHAR(timestamp,'YYYY-MM-DD HH24:MI:SS') || '|' || "
-        "NVL(username,'') || '|' || NVL(os_username,'') || '|' || NVL(userhost,'') || '|' || NVL(terminal,'') || '|' || NVL(TO_CHAR(returncode),'') "
+        "NVL(username,'') || '|' || NVL(os_username,'') || '|' || NVL(userhost,'') || '|' || NVL(terminal,'') || '|' || NVL(TO_CHAR(returncode),'') || '|' || "
+        "NVL(sessionid,0) || '|' || 0 "
         "FROM dba_audit_session "
         "WHERE username IN ('SYS','SYSTEM') "
         "ORDER BY timestamp DESC FETCH FIRST %d ROWS ONLY;" % limit
     )
-    ok, res = run_sqlplus(env, sql)
+    ok, res = db.run(sql)
     if not ok:
         return None, res
     return res, None
 
+def _newest_audit_rows(db, trail, limit):
+    # typed rows in the column order of the text queries above
+    t = AUDIT_TRAILS[trail]
+    k1, k2 = t['keys']
+    sql = (f"SELECT {', '.join(t['columns'])}, NVL({k1},0), NVL({k2},0) FROM {trail} WHERE {t['where']} "
+           f"ORDER BY {t['ts']} DESC FETCH FIRST :n ROWS ONLY")
+    ok, res = db.fetch(sql, {'n': limit}, arraysize=min(limit, ORACLEDB_ARRAYSIZE) or 1)
+    if not ok:
+        return None, res
+    return res, None
+
+# Incremental extraction: rows strictly after a high-water mark
+# (timestamp, sessionid, entry_id), oldest first, one page per query. The
+# plain range predicate on the timestamp column lets Oracle prune the
+# interval partitions of AUDSYS.AUD$UNIFIED, and the ascending top-N sort
+# stops after one page, so the trail is never sorted in full. From 12.2
+# unified_audit_trail.event_timestamp is converted to local time, which
+# prevents that pruning and can go back at a DST change, so that trail is
+# keyed on event_timestamp_utc; 'now' is the current time in the same zone.
+AUDIT_TS_FORMAT = 'YYYY-MM-DD HH24:MI:SS.FF6'
+
+AUDIT_TRAILS = {
+    'unified_audit_trail': {
+        'ts': 'event_timestamp_utc', 'to_ts': 'TO_TIMESTAMP', 'keys': ('sessionid', 'entry_id'),
+        'now': 'SYS_EXTRACT_UTC(SYSTIMESTAMP)',
+        'where': "dbusername IN ('SYS','SYSTEM') AND action_name='LOGON'",
+        'row': "TO_CHAR(event_timestamp,'YYYY-MM-DD HH24:MI:SS') || '|' || "
+               "NVL(dbusername,'') || '|' || NVL(client_host,'') || '|' || NVL(client_program_name,'') || '|' || NVL(os_username,'') || '|' || NVL(TO_CHAR(return_code),'')",
+        'columns': ('event_timestamp', 'dbusername', 'client_host', 'client_program_name', 'os_username', 'return_code'),
+    },
+    'dba_audit_session': {
+        # one row per session, so its id breaks timestamp ties on its own
+        'ts': 'timestamp', 'to_ts': 'TO_DATE', 'keys': ('sessionid', '0'), 'now': 'SYSTIMESTAMP',
+        'where': "username IN ('SYS','SYSTEM')",
+        'row': "TO_CHAR(timestamp,'YYYY-MM-DD HH24:MI:SS') || '|' || "
+               "NVL(username,'') || '|' || NVL(os_username,'') || '|' || NVL(userhost,'') || '|' || NVL(terminal,'') || '|' || NVL(TO_CHAR(returncode),'')",
+        'columns': ('timestamp', 'username', 'os_username', 'userhost', 'terminal', 'returncode'),
+    },
+}
+
+def audit_page_sql(trail, mark, limit, lookback_days=0, typed=False):
+    """
+    (sql, binds) for one page of trail rows after mark ([timestamp, sessionid,
+    entry_id] or None). Text: each line 'timestamp|sessionid|entry_id|<row>',
+    the values inlined. Typed: (timestamp, sessionid, entry_id, <columns>)
+    rows, the values bound; the timestamp stays a string converted in SQL to
+    the column's own type, which keeps partition pruning working.
+    """
+    t = AUDIT_TRAILS[trail]
+    ts, (k1, k2) = t['ts'], t['keys']
+    fmt = AUDIT_TS_FORMAT if t['to_ts'] == 'TO_TIMESTAMP' else 'YYYY-MM-DD HH24:MI:SS'
+    where, binds = [t['where']], {}
+    if mark:
+        mts, s1, s2 = mark[0], int(mark[1]), int(mark[2])
+        if typed:
+            # oracledb rejects a bind the SQL does not use: no :s2 for a one-key trail
+            binds.update(ts=mts, s1=s1, **({'s2': s2} if k2 != '0' else {}))
+            mts, s1, s2 = ':ts', ':s1', ':s2'
+            since = f"{t['to_ts']}(:ts,'{fmt}')"
+        else:
+            # the mark came back from this query; still, only digits and the timestamp shape go into the SQL
+            if not re.fullmatch(r"[0-9: .-]+", mts):
+                raise ValueError(f"bad audit high-water mark: {mark!r}")
+            since = f"{t['to_ts']}('{mts}','{fmt}')"
+        where.append(f"{ts} >= {since}")
+        tie = f"NVL({k1},0) > {s1}"
+        if k2 != '0':
+            tie += f" OR (NVL({k1},0) = {s1} AND NVL({k2},0) > {s2})"
+        where.append(f"({ts} > {since} OR {tie})")
+    elif lookback_days:
+        where.append(f"{ts} >= {t['now']} - NUMTODSINTERVAL({int(lookback_days)},'DAY')")
+    if typed:
+        binds['n'] = int(limit)
+        select, fetch = f"TO_CHAR({ts},'{fmt}'), NVL({k1},0), NVL({k2},0), {', '.join(t['columns'])}", ":n"
+    else:
+        select, fetch = f"TO_CHAR({ts},'{fmt}') || '|' || NVL({k1},0) || '|' || NVL({k2},0) || '|' || {t['row']}", int(limit)
+    return (
+        f"SELECT {select} "
+        f"FROM {trail} "
+        f"WHERE {' AND '.join(where)} "
+        f"ORDER BY {ts}, NVL({k1},0), NVL({k2},0) FETCH FIRST {fetch} ROWS ONLY" + ("" if typed else ";")
+    ), binds
+
+def query_audit_since(db, trail, mark, page_size=200, lookback_days=0):
+    """
+    Yield (mark, row) for every trail row after mark, oldest first, fetched
+    page_size rows per query; row is what query_unified_audit /
+    query_traditional_audit return for the backend. Raises RuntimeError if
+    a query fails.
+    """
+    while True:
+        sql, binds = audit_page_sql(trail, mark, page_size, lookback_days, db.typed)
+        if db.typed:
+            ok, res = db.fetch(sql, binds, arraysize=min(page_size, ORACLEDB_ARRAYSIZE))
+            rows = [([r[0], str(int(r[1])), str(int(r[2]))], r[3:]) for r in res] if ok else None
+        else:
+            ok, res = db.run(sql)
+            parts = [line.split('|', 3) for line in res] if ok else []
+            rows = [([p[0].strip(), p[1].strip(), p[2].strip()], p[3]) for p in parts if len(p) == 4]
+        if not ok:
+            raise RuntimeError(res)
+        start = mark
+        for mark, row in rows:
+            yield mark, row
+        if len(res) < page_size or mark == start:
+            return
+
 # ------------------------
 # Audit file scanning heuristics (conservative)
 # ------------------------
-def find_audit_files(directory, max_files=1000):
+def list_audit_files(directory):
+    """(path, stat) for each candidate audit file, newest first; one stat per file
+    (None if it vanished or is a dangling link)."""
     out = []
     if not os.path.isdir(directory):
         return out
     for root, dirs, files in os.walk(directory):
         for f in files:
             if f.lower().endswith('.aud') or fnmatch.fnmatch(f, 'ora_*.aud') or f.lower().endswith('.log'):
-                out.append(os.path.join(root, f))
-    out.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0, reverse=True)
+                path = os.path.join(root, f)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    st = None
+                out.append((path, st))
+    out.sort(key=lambda e: e[1].st_mtime if e[1] else 0, reverse=True)
+    return out
+
+def find_audit_files(directory, max_files=1000):
+    out = [path for path, _ in list_audit_files(directory)]
     if max_files and max_files>0:
         return out[:max_files]
     return out
 
+# audit records are separated by blank lines or lines of ----
+BLOCK_SEP = re.compile(r"\n\s*\n|(?:\n-+\n)")
+BLOCK_SEP_BYTES = re.compile(rb"\n\s*\n|(?:\n-+\n)")
+# the same, keeping the separators
+_BLOCK_SPLIT = re.compile(r"(\n\s*\n|\n-+\n)")
+AUD_CHUNK_SIZE = 1 << 20
+
+# record fields, precompiled; every match starts with the field's key
+_DB_USER = re.compile(r"DATABASE USER\s*:\s*['\"]?([A-Z0-9_]+)['\"]?", re.IGNORECASE)
+_ACTION = re.compile(r"ACTION\s*:\s*'?\s*([A-Z_ ]+)\s*'?", re.IGNORECASE)
+_CLIENT_ADDRESS = re.compile(r"CLIENT ADDRESS\s*:\s*(.+)", re.IGNORECASE)
+_PROGRAM = re.compile(r"PROGRAM\s*:\s*['\"]?([^\n']+)['\"]?", re.IGNORECASE)
+_AUTHENTICATION = re.compile(r"AUTHENTICATION\s*:\s*['\"]?([A-Z0-9_ -]+)['\"]?", re.IGNORECASE)
+_REMOTE_HINT = re.compile(r"PROTOCOL\s*=\s*tcp|\bHOST\s*=|\b\d{1,3}(\.\d{1,3}){3}\b", re.IGNORECASE)
+_LOCAL_HINT = re.compile(r"\bLOCAL\b", re.IGNORECASE)
+
+def iter_aud_blocks(fh, chunk_size=None):
+    """
+    Stream the records of a text file as (offset, block): the same blocks
+    BLOCK_SEP.split() gives for the whole text, each with its offset in the
+    text. The last separator read and what follows it are carried into the
+    next chunk, since more data could extend either.
+    """
+    buf, pos = '', 0
+    while True:
+        chunk = fh.read(chunk_size or AUD_CHUNK_SIZE)
+        # [block, sep, block, sep, ..., tail]
+        parts = _BLOCK_SPLIT.split(buf + chunk)
+        keep = len(parts) if not chunk else len(parts) - 2
+        for i in range(0, keep, 2):
+            yield pos, parts[i]
+            pos += len(parts[i]) + (len(parts[i + 1]) if i + 1 < keep else 0)
+        if not chunk:
+            return
+        buf = ''.join(parts[-2:])
+
+def _field(b, u, key, pattern):
+    """
+    pattern.search(b).group(1), or ''. In an ASCII record the key's offsets in
+    u = b.upper() are its case-insensitive offsets in b, so the pattern is only
+    tried where the key is instead of at every character.
+    """
+    if not b.isascii():
+        m = pattern.search(b)
+        return m.group(1) if m else ''
+    pos = u.find(key)
+    while pos >= 0:
+        m = pattern.match(b, pos)
+        if m:
+            return m.group(1)
+        pos = u.find(key, pos + 1)
+    return ''
+
+def parse_aud_block(path, b, u, offset=0):
+    """
+    The SYS CONNECT finding in one audit record, or None; u is b.upper() and
+    the caller has checked it names DATABASE USER and SYS. offset is where
+    the record starts in the file, which tells apart the records of a file.
+    """
+    db_user = _field(b, u, 'DATABASE USER', _DB_USER).upper()
+    if db_user != 'SYS':
+        return None
+    action = _field(b, u, 'ACTION', _ACTION).strip().upper()
+    if not action.startswith('CONNECT'):
+        return None
+    client_addr = _field(b, u, 'CLIENT ADDRESS', _CLIENT_ADDRESS).strip()
+    program = _field(b, u, 'PROGRAM', _PROGRAM).strip()
+    auth = _field(b, u, 'AUTHENTICATION', _AUTHENTICATION).strip().upper()
+    # heuristics for remote vs local
+    location = 'unknown'
+    method = 'unknown'
+    if _REMOTE_HINT.search(b):
+        location = 'remote'
+        method = 'password' if 'PASS' in auth else 'likely-password'
+    # PROTOCOL=BEQ is covered by the BEQ test
+    if 'BEQ' in u or _LOCAL_HINT.search(b):
+        location = 'local'
+        method = 'password' if 'PASS' in auth else 'local-auth'
+    if 'sqlplus' in program.lower() and method == 'unknown':
+        method = 'possible-password-in-cmdline'
+    return {
+        'file': path,
+        'offset': offset,
+        'db_user': db_user,
+        'action': action,
+        'client_address': client_addr,
+        'program': program,
+        'auth': auth,
+        'detected_method': method,
+        'detected_location': location
+    }
+
 def scan_aud_file_for_sys(path):
+    try:
+        findings = _scan_aud_file_mapped(path)
+    except Exception:
+        findings = None
+    if findings is None:
+        findings = _scan_aud_file_text(path)
+    return findings
+
+def _scan_aud_file_text(path):
     findings = []
     try:
         with open(path, 'r', errors='ignore') as fh:
-            text = fh.read()
+            for pos, b in iter_aud_blocks(fh):
+                u = b.upper()
+                if 'DATABASE USER' in u and 'SYS' in u:
+                    f = parse_aud_block(path, b, u, pos)
+                    if f is not None:
+                        findings.append(f)
     except Exception:
-        return findings
-    # split into blocks separated by blank lines or lines of ----
-    blocks = re.split(r"\n\s*\n|(?:\n-+\n)", text)
-    for b in blocks:
-        if 'DATABASE USER' in b.upper() and 'SYS' in b.upper():
-            # quick heuristic checks
-            db_user = ''
-            if m := re.search(r"DATABASE USER\s*:\s*['\"]?([A-Z0-9_]+)['\"]?", b, re.IGNORECASE):
-                db_user = m.group(1).upper()
-            action = ''
-            if m := re.search(r"ACTION\s*:\s*'?\s*([A-Z_ ]+)\s*'?", b, re.IGNORECASE):
-                action = m.group(1).strip().upper()
-            if db_user == 'SYS' and action.startswith('CONNECT'):
-                client_addr = ''
-                if m := re.search(r"CLIENT ADDRESS\s*:\s*(.+)", b, re.IGNORECASE):
-                    client_addr = m.group(1).strip()
-                program = ''
-                if m := re.search(r"PROGRAM\s*:\s*['\"]?([^\n']+)['\"]?", b, re.IGNORECASE):
-                    program = m.group(1).strip()
-                auth = ''
-                if m := re.search(r"AUTHENTICATION\s*:\s*['\"]?([A-Z0-9_ -]+)['\"]?", b, re.IGNORECASE):
-                    auth = m.group(1).strip().upper()
-                # heuristics for remote vs local
-                location = 'unknown'
-                method = 'unknown'
-                if re.search(r"PROTOCOL\s*=\s*tcp", b, re.IGNORECASE) or re.search(r"\bHOST\s*=", b, re.IGNORECASE) or re.search(r"\b\d{1,3}(\.\d{1,3}){3}\b", b):
-                    location = 'remote'
-                    if 'PASS' in auth:
-                        method = 'password'
-                    else:
-                        method = 'likely-password'
-                if re.search(r"PROTOCOL\s*=\s*BEQ", b, re.IGNORECASE) or re.search(r"\bLOCAL\b", b, re.IGNORECASE) or 'BEQ' in b.upper():
-                    location = 'local'
-                    if 'PASS' in auth:
-                        method = 'password'
-                    else:
-                        method = 'local-auth'
-                if 'sqlplus' in program.lower() and method == 'unknown':
-                    method = 'possible-password-in-cmdline'
-                findings.append({
-                    'file': path,
-                    'db_user': db_user,
-                    'action': action,
-                    'client_address': client_addr,
-                    'program': program,
-                    'auth': auth,
-                    'detected_method': method,
-                    'detected_location': location
-                })
+        return []
+    return findings
+
+def scan_aud_file_incremental(path, offset, size, settled):
+    """
+    Scan the bytes of path from offset up to size; returns (findings, new_offset).
+    Unless the file has settled (not modified for a while) a trailing record
+    without a separator after it may still be being written, so it is left
+    for the next run and new_offset stops in front of it.
+    """
+    try:
+        with open(path, 'rb') as fh:
+            fh.seek(offset)
+            data = fh.read(max(0, size - offset))
+    except Exception:
+        return [], offset
+    end = len(data)
+    if not settled:
+        last = None
+        for last in BLOCK_SEP_BYTES.finditer(data):
+            pass
+        end = last.end() if last else 0
+    if end == 0:
+        return [], offset
+    findings = _scan_clean_bytes(path, data[:end], offset)
+    if findings is None:
+        # decoded exactly as scan_aud_file_for_sys's text-mode open() would
+        text = io.TextIOWrapper(io.BytesIO(data[:end]), errors='ignore').read()
+        findings = scan_aud_text(path, text, offset)
+    return findings, offset + end
+
+def scan_aud_text(path, text, base=0):
+    # offsets in decoded text: the byte offsets for ASCII, never past the bytes read otherwise
+    findings = []
+    for pos, b in iter_aud_blocks(io.StringIO(text)):
+        u = b.upper()
+        if 'DATABASE USER' in u and 'SYS' in u:
+            f = parse_aud_block(path, b, u, base + pos)
+            if f is not None:
+                findings.append(f)
     return findings
 
+# ------------------------
+# Byte-level pre-filter
+# ------------------------
+# Most audit files hold no SYS CONNECT record. A record is only reported when
+# its first DATABASE USER value is SYS, so a file without this marker (in its
+# upper-cased bytes) is rejected before anything is decoded, and in a file
+# with markers only the records around them are parsed.
+_SYS_MARKER = re.compile(rb"DATABASE USER\s*:\s*['\"]?SYS(?![A-Z0-9_])")
+# bytes text mode would change (newlines) or str \s would treat differently
+_TEXT_MODE_BYTES = (b'\r', b'\x1c', b'\x1d', b'\x1e', b'\x1f')
+# bigger files are streamed rather than mapped and upper-cased whole
+AUD_MMAP_MAX = 64 << 20
+
+def _ascii_text_mode():
+    """True when text-mode open() reads ASCII bytes as themselves."""
+    probe = bytes(range(128))
+    try:
+        return probe.decode(locale.getpreferredencoding(False)) == probe.decode('ascii')
+    except (LookupError, UnicodeDecodeError):
+        return False
+
+_ASCII_TEXT_MODE = _ascii_text_mode()
+
+def _scan_aud_file_mapped(path):
+    """scan_aud_file_for_sys via mmap and the pre-filter; None if the file needs the text parser."""
+    with open(path, 'rb') as fh:
+        size = os.fstat(fh.fileno()).st_size
+        if size == 0:
+            return []
+        if size > AUD_MMAP_MAX:
+            return None
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _scan_clean_bytes(path, mm)
+
+def _scan_clean_bytes(path, data, base=0):
+    """
+    Findings in data (bytes or mmap) read from offset base of path, parsing
+    only the records that hold a SYS marker. None unless data is ASCII without the bytes text mode treats
+    specially: only then are its records the same as in the decoded text.
+    """
+    if not _ASCII_TEXT_MODE or any(data.find(c) >= 0 for c in _TEXT_MODE_BYTES):
+        return None
+    upper = data[:].upper()
+    if not upper.isascii():
+        return None
+    findings = []
+    last = None
+    for m in _SYS_MARKER.finditer(upper):
+        start, end = _record_span(upper, m.start())
+        if start == last:
+            continue
+        last = start
+        b = data[start:end].decode('ascii')
+        u = upper[start:end].decode('ascii')
+        # a marker can run across a separator
+        if 'DATABASE USER' in u and 'SYS' in u:
+            f = parse_aud_block(path, b, u, base + start)
+            if f is not None:
+                findings.append(f)
+    return findings
+
+def _is_separator_line(line):
+    # blank or all dashes: the only lines a BLOCK_SEP match takes in
+    return not line.strip(b' \t\f\v') or not line.strip(b'-')
+
+def _record_span(data, h):
+    """
+    (start, end) of the record holding offset h, as BLOCK_SEP_BYTES.split() of
+    all of data would cut it; h is on a line that is not a separator line. The
+    split is the same from the newline ending any such line, so only the
+    lines around h are looked at.
+    """
+    nl = data.find(b'\n', h)
+    m = BLOCK_SEP_BYTES.search(data, nl) if nl >= 0 else None
+    end = m.start() if m else len(data)
+    first = data.rfind(b'\n', 0, h) + 1
+    while first > 0:
+        above = data.rfind(b'\n', 0, first - 1) + 1
+        if not _is_separator_line(data[above:first - 1]):
+            first = above
+            continue
+        # a run of separator lines: replay the split over it from the line above
+        top = above
+        while top > 0:
+            prev = data.rfind(b'\n', 0, top - 1) + 1
+            if not _is_separator_line(data[prev:top - 1]):
+                break
+            top = prev
+        sep = None
+        for m in BLOCK_SEP_BYTES.finditer(data, max(top - 1, 0)):
+            if m.start() >= first:
+                break
+            sep = m
+        if sep is not None:
+            return sep.end(), end
+        if top == 0:
+            break
+        first = prev
+    return 0, end
+
+# ------------------------
+# Audit file checkpoint
+# ------------------------
+# a file untouched this long is taken as complete, trailing record included
+AUDIT_SETTLE_SECONDS = 60
+# bytes fingerprinted to tell a renamed file from a new one on a reused inode
+HEAD_BYTES = 1024
+
+def _file_head(path, length):
+    try:
+        with open(path, 'rb') as fh:
+            return hashlib.sha1(fh.read(length)).hexdigest()
+    except OSError:
+        return None
+
+class AuditCheckpoint:
+    """
+    What has already been scanned of each audit file, kept as JSON between runs:
+    (device, inode, path) -> mtime, size and the byte offset processed so far,
+    plus a fingerprint of the file's first bytes. Audit files are append-only,
+    so a later run only reads what was appended.
+
+    - unchanged files are skipped without being opened;
+    - a file renamed (rotated) to another audit file name is recognised by
+      device/inode and fingerprint and carries on from its offset;
+    - a file truncated, or a new file on a reused inode, fails the size or
+      fingerprint check and is scanned from the start.
+
+    It also keeps each SID's high-water mark in its audit trail (see
+    query_audit_since), so the DB audit rows are extracted incrementally too.
+
+    Updates stay in memory until save(), which main() calls only after the
+    findings have been written, so an interrupted run rescans instead of
+    losing findings. Safe to share between --workers threads.
+    """
+    def __init__(self, path):
+        self.path = path
+        data = {}
+        if os.path.exists(path):
+            with open(path) as fh:
+                data = json.load(fh)
+        self.files = data.get('files', {})
+        self.audit_marks = data.get('audit_marks', {})
+        self._by_inode = {}
+        for key, rec in self.files.items():
+            dev, ino, _ = key.split(':', 2)
+            self._by_inode[(dev, ino)] = key
+        self._seen = set()
+        self._dirs = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path, st):
+        return f"{st.st_dev}:{st.st_ino}:{path}"
+
+    def pending(self, directory, entries):
+        """The (path, stat, offset) of entries with bytes not yet scanned, in the given order."""
+        out = []
+        with self._lock:
+            self._dirs.add(directory)
+            for path, st in entries:
+                if st is None:
+                    continue
+                key = self._key(path, st)
+                self._seen.add(key)
+                rec = self.files.get(key)
+                renamed = False
+                if rec is None:
+                    old = self._by_inode.get((str(st.st_dev), str(st.st_ino)))
+                    rec = self.files.get(old) if old else None
+                    renamed = rec is not None
+                if rec is not None and not renamed and rec['mtime'] == st.st_mtime \
+                        and rec['size'] == st.st_size and rec['offset'] == st.st_size:
+                    continue  # fully scanned and unchanged since
+                offset = 0
+                if rec is not None and rec['offset'] <= st.st_size \
+                        and _file_head(path, rec['head_len']) == rec['head']:
+                    offset = rec['offset']
+                out.append((path, st, offset))
+        return out
+
+    def done(self, directory, path, st, offset):
+        """Record that path (as stat'ed by pending) has been scanned up to offset."""
+        head_len = min(st.st_size, HEAD_BYTES)
+        rec = {'dir': directory, 'mtime': st.st_mtime, 'size': st.st_size, 'offset': offset,
+               'head_len': head_len, 'head': _file_head(path, head_len)}
+        key = self._key(path, st)
+        with self._lock:
+            self.files[key] = rec
+            self._by_inode[(str(st.st_dev), str(st.st_ino))] = key
+
+    def audit_mark(self, sid, trail):
+        """The last [timestamp, sessionid, entry_id] extracted from sid's trail, or None."""
+        with self._lock:
+            rec = self.audit_marks.get(sid)
+        # a mark on another timestamp column (event_timestamp before event_timestamp_utc) does not apply
+        if rec and rec['trail'] == trail and rec.get('ts', 'event_timestamp') == AUDIT_TRAILS[trail]['ts']:
+            return rec['mark']
+        return None
+
+    def set_audit_mark(self, sid, trail, mark):
+        with self._lock:
+            self.audit_marks[sid] = {'trail': trail, 'ts': AUDIT_TRAILS[trail]['ts'], 'mark': mark}
+
+    def save(self):
+        """Write the checkpoint, dropping files no longer present in the directories scanned."""
+        with self._lock:
+            keep = {key: rec for key, rec in self.files.items()
+                    if key in self._seen or rec.get('dir') not in self._dirs}
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as fh:
+                json.dump({'version': 1, 'files': keep, 'audit_marks': self.audit_marks}, fh)
+            os.replace(tmp, self.path)
+
+# ------------------------
+# Audit file scanner
+# ------------------------
+# a shard is at least this many bytes (or one file), and at most this many files
+SHARD_MIN_BYTES = 4 << 20
+SHARD_MAX_BYTES = 64 << 20
+SHARD_MAX_FILES = 256
+
+def _scan_shard(shard):
+    """Scan one shard of (path, offset, size, settled); settled None means a full scan."""
+    out = []
+    for path, offset, size, settled in shard:
+        if settled is None:
+            out.append((scan_aud_file_for_sys(path), None))
+        else:
+            out.append(scan_aud_file_incremental(path, offset, size, settled))
+    return out
+
+class AuditScanner:
+    """
+    Scans audit files in this process, or with processes > 1 in a pool of
+    worker processes shared by all SIDs: the files are cut into shards of
+    about the same number of bytes, and each shard's findings are handed back
+    as soon as it is done (in file order, so the output matches a serial scan)
+    with only a few shards in flight at a time.
+    """
+    def __init__(self, processes=1):
+        self.processes = processes
+        self._pool = None
+        if processes > 1:
+            # sqlplus sessions and --workers threads may be running: don't fork
+            self._pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'))
+
+    def shards(self, files):
+        """Cut [(path, offset, size, settled)] into contiguous runs of about equal bytes."""
+        total = sum(size - offset for _, offset, size, _ in files)
+        # a few shards per process keeps them all busy to the end
+        target = min(SHARD_MAX_BYTES, max(SHARD_MIN_BYTES, total // (self.processes * 4) + 1))
+        shard, nbytes = [], 0
+        for f in files:
+            shard.append(f)
+            nbytes += f[2] - f[1]
+            if nbytes >= target or len(shard) >= SHARD_MAX_FILES:
+                yield shard
+                shard, nbytes = [], 0
+        if shard:
+            yield shard
+
+    def scan(self, files):
+        """Yield (findings, end_offset) for each (path, offset, size, settled) of files, in order."""
+        if self._pool is None:
+            for f in files:
+                yield from _scan_shard([f])
+            return
+        # a couple of shards per process in flight: results wait for their turn in memory
+        pending = collections.deque()
+        for shard in self.shards(files):
+            pending.append(self._pool.submit(_scan_shard, shard))
+            if len(pending) >= 2 * self.processes:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ------------------------
+# Findings output
+# ------------------------
+FINDINGS_COLUMNS = ['sid', 'source', 'file', 'offset', 'row', 'timestamp', 'sessionid', 'entry_id', 'dbusername',
+                    'db_user', 'action', 'client_address', 'client_host', 'program', 'client_program', 'os_username', 'userhost',
+                    'terminal', 'auth', 'detected_method', 'detected_location', 'return_code']
+SAMPLE_SIZE = 10
+
+class FindingsWriter:
+    """
+    Writes findings to CSV or NDJSON as they are produced, with a fixed set of
+    columns, and keeps the summary counters as running totals: nothing grows
+    with the number of findings but the file. The file is created on the
+    first finding, so a run with none leaves no output behind.
+    """
+    def __init__(self, path, fmt='csv'):
+        self.path = path
+        self.fmt = fmt
+        self.total = 0
+        self.remote_pass = 0
+        self.local_pass = 0
+        self.sample = []
+        self._fh = None
+        self._csv = None
+
+    def write(self, rec):
+        self._emit(rec)
+        self.total += 1
+        method, location = rec.get('detected_method'), rec.get('detected_location')
+        if location == 'remote' and method in ('password', 'likely-password', 'possible-password-in-cmdline'):
+            self.remote_pass += 1
+        if location == 'local' and method in ('password', 'possible-password-in-cmdline', 'local-auth'):
+            self.local_pass += 1
+        if len(self.sample) < SAMPLE_SIZE:
+            self.sample.append(rec)
+
+    def _emit(self, rec):
+        if self._fh is None:
+            os.makedirs(os.path.dirname(self.path) or '/tmp', exist_ok=True)
+            self._fh = open(self.path, 'w', newline='' if self.fmt == 'csv' else None)
+            if self.fmt == 'csv':
+                self._csv = csv.DictWriter(self._fh, fieldnames=FINDINGS_COLUMNS)
+                self._csv.writeheader()
+        row = {k: rec.get(k, '') for k in FINDINGS_COLUMNS}
+        if self._csv is not None:
+            self._csv.writerow(row)
+        else:
+            self._fh.write(json.dumps(row) + '\n')
+
+    def close(self):
+        """Flush and close the output (fsync'd: the checkpoint is saved after this)."""
+        if self._fh is not None:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            self._fh.close()
+            self._fh = None
+
+    def report(self):
+        return f"Wrote {self.total} findings to {self.path}"
+
+# the collector's db_sys_audit columns (storage.SYS_AUDIT_COLUMNS): the CSV
+# header of each upload, which the collector reads by name
+SYS_AUDIT_UPLOAD_COLUMNS = ['hostname', 'sid', 'timestamp', 'file', 'database_user', 'client_address',
+                            'client_user', 'status', 'action']
+UPLOAD_PATH = '/upload-sys-audit/stream'
+UPLOAD_CHUNK = 64 << 10
+UPLOAD_TIMEOUT = 120
+UPLOAD_RETRIES = 8
+UPLOAD_BACKOFF_MAX = 60
+
+def sys_audit_row(hostname, rec):
+    """A finding as a db_sys_audit row, in SYS_AUDIT_UPLOAD_COLUMNS order."""
+    if rec['source'] == 'audit_file':
+        # no timestamp parsed from the record: its offset in the file tells it apart
+        # from the file's other records, which may be appended to the file later
+        return [hostname, rec['sid'], '', f"{rec['file']}@{rec['offset']}", rec['db_user'], rec['client_address'], '',
+                f"{rec['detected_location']}/{rec['detected_method']}", rec['action']]
+    # unified_audit_trail / dba_audit_session logons: the timestamp is only to the
+    # second, so the source with the row's (sessionid, entry_id) stands in for the file
+    return [hostname, rec['sid'], rec.get('timestamp', ''), f"{rec['source']}@{rec['sessionid']}:{rec['entry_id']}",
+            rec.get('dbusername', ''),
+            rec.get('client_host') or rec.get('userhost', ''), rec.get('os_username', ''),
+            rec.get('return_code', ''), 'LOGON']
+
+class UploadError(Exception):
+    pass
+
+class CollectorUploader(FindingsWriter):
+    """
+    Sends findings to the collector as they are produced instead of writing a
+    file: batch_size rows at a time, each batch a gzip'd CSV posted with
+    chunked transfer encoding over one keep-alive connection. A failed batch
+    is retried with exponential backoff (or the collector's Retry-After) on a
+    fresh connection; acknowledged batches are never sent again, so the
+    upload carries on from the last one. Rows the collector already has are
+    ignored there, which makes resending a batch harmless.
+    """
+    def __init__(self, url, hostname, batch_size=1000, retries=UPLOAD_RETRIES):
+        super().__init__(url)
+        u = urllib.parse.urlsplit(url)
+        if u.scheme not in ('http', 'https') or not u.hostname:
+            raise ValueError(f"not an http(s) URL: {url}")
+        self._connection = http.client.HTTPSConnection if u.scheme == 'https' else http.client.HTTPConnection
+        self._netloc = u.netloc
+        self._target = u.path.rstrip('/') + UPLOAD_PATH + '?' + urllib.parse.urlencode({'hostname': hostname})
+        self.hostname = hostname
+        self.batch_size = max(1, batch_size)
+        self.retries = retries
+        self.batches = 0
+        self.stored = 0
+        self.queued = 0
+        self._rows = []
+        self._conn = None
+        self._failed = False
+
+    def _emit(self, rec):
+        self._rows.append(sys_audit_row(self.hostname, rec))
+        if len(self._rows) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(SYS_AUDIT_UPLOAD_COLUMNS)
+        w.writerows(self._rows)
+        self._send(gzip.compress(buf.getvalue().encode('utf-8')))
+        self._rows = []
+        self.batches += 1
+
+    def _send(self, payload):
+        seq = self.batches + 1
+        delay = 0.5
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            try:
+                if self._conn is None:
+                    self._conn = self._connection(self._netloc, timeout=UPLOAD_TIMEOUT)
+                chunks = (payload[i:i + UPLOAD_CHUNK] for i in range(0, len(payload), UPLOAD_CHUNK))
+                self._conn.request('POST', self._target, body=chunks, encode_chunked=True,
+                                   headers={'Content-Type': 'text/csv', 'Content-Encoding': 'gzip',
+                                            'X-Upload-Batch': str(seq)})
+                resp = self._conn.getresponse()
+                body = resp.read()
+                if resp.status == 200:
+                    self.stored += json.loads(body).get('stored', 0)
+                    return
+                if resp.status == 202:
+                    self.queued += 1
+                    return
+                err = f"HTTP {resp.status} {body[:200].decode('utf-8', 'replace')}"
+                if resp.status < 500 and resp.status not in (408, 429):
+                    self._failed = True
+                    raise UploadError(f"collector rejected batch {seq}: {err}")
+                retry_after = resp.getheader('Retry-After')
+            except (OSError, http.client.HTTPException) as e:
+                err = f"{type(e).__name__}: {e}"
+                self._disconnect()
+            if attempt == self.retries:
+                break
+            wait = float(retry_after) if retry_after and retry_after.isdigit() else delay
+            print(f"  [!] upload of batch {seq} failed ({err}); retry {attempt + 1}/{self.retries} in {wait:.1f}s",
+                  file=sys.stderr)
+            time.sleep(wait)
+            delay = min(delay * 2, UPLOAD_BACKOFF_MAX)
+        self._failed = True
+        raise UploadError(f"giving up on batch {seq} after {self.retries + 1} attempts: {err}")
+
+    def _disconnect(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def close(self):
+        """Send the last, partial batch and close the connection."""
+        try:
+            if self._rows and not self._failed:
+                self._flush()
+        finally:
+            self._disconnect()
+
+    def report(self):
+        return (f"Uploaded {self.total} findings to {self.path} in {self.batches} batches "
+                f"({self.stored} new rows stored, {self.queued} batches queued by the collector)")
+
+# ------------------------
+# Per-SID driver
+# ------------------------
+def sid_env(sid, home):
+    """Environment for a bequeath connection to sid."""
+    env = os.environ.copy()
+    env['ORACLE_SID'] = sid
+    if home:
+        env['ORACLE_HOME'] = home
+        env['PATH'] = os.path.join(home, 'bin') + ':' + env.get('PATH','')
+    return env
+
+def process_sid(sid, home, args, sink, emit=print, checkpoint=None, scanner=None):
+    """Query audit config/rows for one SID and scan its audit files, handing each
+    finding to sink as it is produced. Console lines go through emit so parallel
+    runs can buffer them per SID."""
+    emit(f"\n=== SID: {sid} (ORACLE_HOME={home or '<unknown>'}) ===")
+    db = None
+    if args.driver == 'auto' and oracledb is not None:
+        db, err = OracleDriverSession.open(sid, home)
+        emit("  Driver: oracledb" if db else f"  Driver: sqlplus (oracledb: {err})")
+    if db is None:
+        session = SqlplusPerQuery if args.sqlplus_per_query else SqlplusSession
+        db = session(sid_env(sid, home))
+    with db:
+        _process_sid(sid, args, sink, emit, db, checkpoint, scanner or AuditScanner())
+
+def audit_row_record(sid, trail, r, keys=None):
+    """
+    A finding from a trail row: a sqlplus line, or a typed row from the
+    oracledb backend. keys is the row's (sessionid, entry_id) when the caller
+    has them apart (query_audit_since's mark); otherwise they are the row's
+    last two fields, as query_unified_audit / query_traditional_audit end it.
+    """
+    if isinstance(r, str):
+        if keys is None:
+            r, *keys = r.rsplit('|', 2)
+        parts = r.split('|')
+    else:
+        if keys is None:
+            r, keys = r[:-2], [str(int(v)) for v in r[-2:]]
+        parts = ['' if v is None else v.strftime('%Y-%m-%d %H:%M:%S') if isinstance(v, datetime.datetime)
+                 else str(v) for v in r]
+        r = '|'.join(parts)
+    get = lambda i: parts[i] if len(parts) > i else ''
+    rec = {'sid': sid, 'source': trail, 'row': r, 'timestamp': get(0), 'dbusername': get(1),
+           'sessionid': keys[0], 'entry_id': keys[1]}
+    if trail == 'unified_audit_trail':
+        # timestamp|dbusername|client_host|client_program|os_username|returncode
+        rec.update(client_host=get(2), client_program=get(3), os_username=get(4), return_code=get(5))
+    else:
+        # timestamp|username|os_username|userhost|terminal|returncode
+        rec.update(os_username=get(2), userhost=get(3), terminal=get(4), return_code=get(5))
+    return rec
+
+def _process_sid(sid, args, sink, emit, db, checkpoint, scanner):
+    # 1) discover audit_file_dest and audit_sys_operations
+    audit_file_dest, err = query_parameter(db, 'audit_file_dest')
+    if err:
+        emit(f"  [!] Could not query audit_file_dest: {err}")
+    else:
+        emit(f"  audit_file_dest = {audit_file_dest}")
+
+    audit_sys_ops, err = query_parameter(db, 'audit_sys_operations')
+    if err:
+        emit(f"  [!] Could not query audit_sys_operations: {err}")
+    else:
+        emit(f"  audit_sys_operations = {audit_sys_ops}")
+
+    # 2) detect unified auditing support
+    ok, val = db.run("SELECT value FROM v$option WHERE parameter='Unified Auditing';")
+    unified_enabled = False
+    if ok and val:
+        if len(val)>0 and val[0].strip().upper().startswith('TRUE'):
+            unified_enabled = True
+    emit(f"  Unified Auditing: {'YES' if unified_enabled else 'NO'}")
+
+    # 3) fetch audit rows from DB audit tables
+    trail = 'unified_audit_trail' if unified_enabled else 'dba_audit_session'
+    if checkpoint is not None:
+        # incremental: every row after this SID's high-water mark
+        mark, count = checkpoint.audit_mark(sid, trail), 0
+        try:
+            for row_mark, r in query_audit_since(db, trail, mark, args.limit_audit_rows, args.audit_lookback_days):
+                sink(audit_row_record(sid, trail, r, row_mark[1:]))
+                mark, count = row_mark, count + 1
+        except RuntimeError as e:
+            emit(f"  [!] Failed to query {trail}: {e}")
+        if count:
+            checkpoint.set_audit_mark(sid, trail, mark)
+        emit(f"  {trail} rows since the checkpoint: {count} (pages of {args.limit_audit_rows})")
+    else:
+        query = query_unified_audit if unified_enabled else query_traditional_audit
+        rows, err = query(db, limit=args.limit_audit_rows)
+        if rows is None:
+            emit(f"  [!] Failed to query {trail}: {err}")
+        else:
+            emit(f"  {trail} rows found: {len(rows)} (showing up to {args.limit_audit_rows})")
+            for r in rows[:10]:
+                sink(audit_row_record(sid, trail, r))
+
+    # 4) If audit_file_dest exists and path is local, scan files
+    if audit_file_dest:
+        ad = audit_file_dest.strip().strip("'\"")
+        if os.path.isdir(ad):
+            emit(f"  Scanning audit directory: {ad}")
+            entries = list_audit_files(ad)
+            if checkpoint is not None:
+                todo = checkpoint.pending(ad, entries)
+                emit(f"    found {len(entries)} candidate audit files, {len(todo)} new or grown since the checkpoint "
+                     f"(scanning up to {args.max_audit_files})")
+            else:
+                todo = [(path, st, 0) for path, st in entries]
+                emit(f"    found {len(entries)} candidate audit files (scanning up to {args.max_audit_files})")
+            if args.max_audit_files and args.max_audit_files>0:
+                todo = todo[:args.max_audit_files]
+            now = time.time()
+            files = [(fpath, offset, st.st_size,
+                      now - st.st_mtime >= AUDIT_SETTLE_SECONDS if checkpoint is not None else None)
+                     for fpath, st, offset in todo]
+            t0 = time.perf_counter()
+            for (fpath, st, offset), (ffind, end) in zip(todo, scanner.scan(files)):
+                if checkpoint is not None:
+                    checkpoint.done(ad, fpath, st, end)
+                for ff in ffind:
+                    rec = {'sid': sid, 'source': 'audit_file', 'file': ff['file'], 'offset': ff['offset'],
+                           'db_user': ff['db_user'], 'action': ff['action'],
+                           'client_address': ff['client_address'], 'program': ff['program'],
+                           'auth': ff['auth'], 'detected_method': ff['detected_method'],
+                           'detected_location': ff['detected_location']}
+                    sink(rec)
+            secs = max(time.perf_counter() - t0, 1e-6)
+            mb = sum(size - offset for _, offset, size, _ in files) / 1e6
+            emit(f"    scanned {len(files)} files, {mb:.1f} MB in {secs:.2f}s "
+                 f"({len(files) / secs:.0f} files/s, {mb / secs:.1f} MB/s, {scanner.processes} process(es))")
+        else:
+            emit(f"  audit_file_dest '{ad}' not found as directory on filesystem (may be NFS or different ORACLE_BASE).")
+    else:
+        emit("  No audit_file_dest returned; skipping audit file scan for this SID.")
+
+def _process_sid_buffered(job):
+    # findings are spooled to a temp file, not held in memory, until it is this SID's turn
+    sid, home, args, checkpoint, scanner = job
+    lines = []
+    spool = tempfile.TemporaryFile('w+')
+    try:
+        process_sid(sid, home, args, lambda rec: spool.write(json.dumps(rec) + '\n'),
+                    emit=lines.append, checkpoint=checkpoint, scanner=scanner)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return lines, spool
+
 # ------------------------
 # Main driver
 # ------------------------
@@ -183,8 +1259,29 @@ def main():
     p = argparse.ArgumentParser(description="Discover DB SIDs, query audit config, and scan audit files for SYS connects.")
     p.add_argument('--oratab', default='/etc/oratab')
     p.add_argument('--output', default='/tmp/sys_audit_findings.csv')
+    p.add_argument('--output-format', choices=('csv', 'ndjson'), default='csv',
+                   help="CSV with a fixed header, or one JSON object per line")
+    p.add_argument('--collector-url',
+                   help="send findings to this dbcollector (e.g. http://collector:8000) instead of --output")
+    p.add_argument('--collector-batch', type=int, default=1000, help="findings per upload batch")
     p.add_argument('--max-audit-files', type=int, default=500)
-    p.add_argument('--limit-audit-rows', type=int, default=200)
+    p.add_argument('--limit-audit-rows', type=int, default=200,
+                   help="rows fetched from the DB audit trail (with --checkpoint: rows per page)")
+    p.add_argument('--audit-lookback-days', type=int, default=7,
+                   help="with --checkpoint, how far back the first run of a SID reads its audit trail (0: all of it)")
+    p.add_argument('--workers', type=int, default=1,
+                   help="SIDs processed concurrently (default 1: one SID at a time)")
+    p.add_argument('--driver', choices=('auto', 'sqlplus'), default='auto',
+                   help="auto: python-oracledb (thick mode) when it is installed and can log on, "
+                        "else sqlplus; sqlplus: always sqlplus")
+    p.add_argument('--sqlplus-per-query', action='store_true',
+                   help="start a new sqlplus for every statement instead of one session per SID")
+    p.add_argument('--checkpoint',
+                   help="JSON file recording how far each audit file and each SID's audit trail has been "
+                        "read; later runs only read new files, appended bytes and newer audit rows "
+                        "(saved after the output is written)")
+    p.add_argument('--scan-processes', type=int, default=1,
+                   help="processes scanning audit files, shared by all SIDs (default 1: scan in this process)")
     args = p.parse_args()
 
     sids = parse_oratab(args.oratab)
@@ -192,126 +1289,49 @@ def main():
         print("No SIDs found in /etc/oratab; exiting.")
         return 1
 
-    all_findings = []
-    for sid, home in sids:
-        print(f"\n=== SID: {sid} (ORACLE_HOME={home or '<unknown>'}) ===")
-        # prepare environment for bequeath connection
-        env = os.environ.copy()
-        env['ORACLE_SID'] = sid
-        if home:
-            env['ORACLE_HOME'] = home
-            env['PATH'] = os.path.join(home, 'bin') + ':' + env.get('PATH','')
-        # 1) discover audit_file_dest and audit_sys_operations
-        audit_file_dest, err = query_parameter(env, 'audit_file_dest')
-        if err:
-            print(f"  [!] Could not query audit_file_dest: {err}")
-        else:
-            print(f"  audit_file_dest = {audit_file_dest}")
-
-        audit_sys_ops, err = query_parameter(env, 'audit_sys_operations')
-        if err:
-            print(f"  [!] Could not query audit_sys_operations: {err}")
-        else:
-            print(f"  audit_sys_operations = {audit_sys_ops}")
-
-        # 2) detect unified auditing support
-        ok, val = run_sqlplus(env, "SELECT value FROM v$option WHERE parameter='Unified Auditing';")
-        unified_enabled = False
-        if ok and val:
-            if len(val)>0 and val[0].strip().upper().startswith('TRUE'):
-                unified_enabled = True
-        print(f"  Unified Auditing: {'YES' if unified_enabled else 'NO'}")
-
-        # 3) fetch audit rows from DB audit tables
-        if unified_enabled:
-            rows, err = query_unified_audit(env, limit=args.limit_audit_rows)
-            if rows is None:
-                print(f"  [!] Failed to query unified_audit_trail: {err}")
-            else:
-                print(f"  unified_audit_trail rows found: {len(rows)} (showing up to {args.limit_audit_rows})")
-                for r in rows[:10]:
-                    # timestamp|dbusername|client_host|client_program|os_username|returncode
-                    parts = r.split('|')
-                    all_findings.append({
-                        'sid': sid,
-                        'source': 'unified_audit_trail',
-                        'row': r,
-                        'timestamp': parts[0] if len(parts)>0 else '',
-                        'dbusername': parts[1] if len(parts)>1 else '',
-                        'client_host': parts[2] if len(parts)>2 else '',
-                        'client_program': parts[3] if len(parts)>3 else '',
-                        'os_username': parts[4] if len(parts)>4 else '',
-                        'return_code': parts[5] if len(parts)>5 else ''
-                    })
-        else:
-            rows, err = query_traditional_audit(env, limit=args.limit_audit_rows)
-            if rows is None:
-                print(f"  [!] Failed to query dba_audit_session: {err}")
-            else:
-                print(f"  dba_audit_session rows found: {len(rows)} (showing up to {args.limit_audit_rows})")
-                for r in rows[:10]:
-                    parts = r.split('|')
-                    all_findings.append({
-                        'sid': sid,
-                        'source': 'dba_audit_session',
-                        'row': r,
-                        'timestamp': parts[0] if len(parts)>0 else '',
-                        'dbusername': parts[1] if len(parts)>1 else '',
-                        'os_username': parts[2] if len(parts)>2 else '',
-                        'userhost': parts[3] if len(parts)>3 else '',
-                        'terminal': parts[4] if len(parts)>4 else '',
-                        'return_code': parts[5] if len(parts)>5 else ''
-                    })
-
-        # 4) If audit_file_dest exists and path is local, scan files
-        if audit_file_dest:
-            ad = audit_file_dest.strip().strip("'\"")
-            if os.path.isdir(ad):
-                print(f"  Scanning audit directory: {ad}")
-                files = find_audit_files(ad)
-                print(f"    found {len(files)} candidate audit files (scanning up to {args.max_audit_files})")
-                if args.max_audit_files and args.max_audit_files>0:
-                    files = files[:args.max_audit_files]
-                for fpath in files:
-                    ffind = scan_aud_file_for_sys(fpath)
-                    for ff in ffind:
-                        rec = {'sid': sid, 'source': 'audit_file', 'file': ff['file'],
-                               'db_user': ff['db_user'], 'action': ff['action'],
-                               'client_address': ff['client_address'], 'program': ff['program'],
-                               'auth': ff['auth'], 'detected_method': ff['detected_method'],
-                               'detected_location': ff['detected_location']}
-                        all_findings.append(rec)
+    checkpoint = AuditCheckpoint(args.checkpoint) if args.checkpoint else None
+    if args.collector_url:
+        writer = CollectorUploader(args.collector_url, socket.gethostname(), args.collector_batch)
+    else:
+        writer = FindingsWriter(args.output, args.output_format)
+    try:
+        with AuditScanner(args.scan_processes) as scanner:
+            if args.workers > 1:
+                # SIDs run concurrently (the time is spent waiting on sqlplus); each
+                # SID's console block and findings are buffered and written in
+                # oratab order, so the output and row order match a serial run
+                with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                    jobs = [(sid, home, args, checkpoint, scanner) for sid, home in sids]
+                    for lines, spool in pool.map(_process_sid_buffered, jobs):
+                        print("\n".join(lines))
+                        with spool:
+                            for line in spool:
+                                writer.write(json.loads(line))
             else:
-                print(f"  audit_file_dest '{ad}' not found as directory on filesystem (may be NFS or different ORACLE_BASE).")
-        else:
-            print("  No audit_file_dest returned; skipping audit file scan for this SID.")
-
-    # ------------------------
-    # Write CSV
-    # ------------------------
-    if all_findings:
-        keys = sorted({k for d in all_findings for k in d.keys()})
-        # ensure some consistent ordering
-        preferred = ['sid','source','file','row','timestamp','dbusername','db_user','action','client_address','client_host','program','client_program','os_username','userhost','terminal','auth','detected_method','detected_location','return_code']
-        keys = [k for k in preferred if k in keys] + [k for k in keys if k not in preferred]
-        outdir = os.path.dirname(args.output) or '/tmp'
-        os.makedirs(outdir, exist_ok=True)
-        with open(args.output, 'w', newline='') as csvf:
-            w = csv.DictWriter(csvf, fieldnames=keys)
-            w.writeheader()
-            for r in all_findings:
-                w.writerow({k: r.get(k,'') for k in keys})
-        print(f"\nWrote {len(all_findings)} findings to {args.output}")
+                for sid, home in sids:
+                    process_sid(sid, home, args, writer.write, checkpoint=checkpoint, scanner=scanner)
+        writer.close()
+    except UploadError as e:
+        # no checkpoint: the next run sends these findings again
+        print(f"\n[!] Upload to {args.collector_url} failed: {e}")
+        return 1
+    finally:
+        # idempotent; after an error it only releases the file or connection
+        writer.close()
+
+    if writer.total:
+        print(f"\n{writer.report()}")
     else:
         print("\nNo findings to write.")
+    # only now: a run that dies before writing its findings rescans next time
+    if checkpoint is not None:
+        checkpoint.save()
 
     # short summary:
-    remote_pass = [r for r in all_findings if r.get('detected_method') in ('password','likely-password','possible-password-in-cmdline') and r.get('detected_location')=='remote']
-    local_pass = [r for r in all_findings if r.get('detected_method') in ('password','possible-password-in-cmdline','local-auth') and r.get('detected_location')=='local']
-    print(f"\nSummary: total records={len(all_findings)}; probable-remote-password={len(remote_pass)}; probable-local-password={len(local_pass)}")
-    if all_findings:
+    print(f"\nSummary: total records={writer.total}; probable-remote-password={writer.remote_pass}; probable-local-password={writer.local_pass}")
+    if writer.sample:
         print("\nSample:")
-        for s in all_findings[:10]:
+        for s in writer.sample:
             print(" ", {k:v for k,v in s.items() if k in ('sid','source','file','db_user','dbusername','timestamp','client_address','program','detected_method','detected_location')})
     return 0
 
@@ -0,0 +1,969 @@
+"""
+storage.py
+
+Storage engines behind the collector API. dbcollector only talks to a
+Storage; SQLiteStorage (default, single node) and PostgresStorage (shared
+central database) implement it over the same tables and return the same
+rows and counters.
+
+Select the engine per deployment:
+  COLLECTOR_STORAGE=sqlite       (default) see dbpool.py for COLLECTOR_DB and tuning
+  COLLECTOR_STORAGE=postgresql   COLLECTOR_PG_DSN (libpq DSN), COLLECTOR_PG_POOL_SIZE
+
+Every ingest method takes the cursor yielded by writer(), so several
+batches can share one transaction (see writebehind.py).
+
+db_assessment_history is split into one partition per month of its
+timestamp (db_assessment_history_YYYYMM) so old months can be archived and
+dropped whole. History rows carry only the result hash; each distinct result
+body is stored once in db_result_bodies.
+"""
+
+import os, io, csv, gzip, time, hashlib, base64, logging
+from contextlib import contextmanager
+
+from dbpool import SQLitePool, DB_PATH
+
+try:
+    import psycopg2, psycopg2.extras, psycopg2.pool
+except ImportError:  # only needed for COLLECTOR_STORAGE=postgresql
+    psycopg2 = None
+
+STORAGE_ENGINE = os.environ.get("COLLECTOR_STORAGE", "sqlite")
+PG_DSN = os.environ.get("COLLECTOR_PG_DSN", "dbname=collector")
+PG_POOL_SIZE = int(os.environ.get("COLLECTOR_PG_POOL_SIZE", "8"))
+
+log = logging.getLogger("dbcollector")
+
+RESULT_COLUMNS = "hostname, oracle_sid, pdb_name, check_name, result, status, hash, timestamp"
+SYS_AUDIT_COLUMNS = ("hostname, sid, timestamp, file, database_user, client_address, "
+                     "client_user, status, action")
+SYS_AUDIT_PAGE_COLUMNS = "hostname, sid, timestamp, client_address, client_user, status, action"
+HISTORY_COLUMNS = "hostname, oracle_sid, pdb_name, check_name, status, hash, timestamp"
+# a history row joined back to its body, in RESULT_COLUMNS order
+HISTORY_SELECT = ("h.hostname, h.oracle_sid, h.pdb_name, h.check_name, b.result, h.status, "
+                  "h.hash, h.timestamp")
+
+
+# ---------------------- keyset cursors ----------------------
+# Read endpoints page on (timestamp, rowid), newest first. The cursor is the
+# key of the last row served, so each page is an index range scan however
+# deep the client pages.
+def encode_cursor(timestamp, rowid):
+    return base64.urlsafe_b64encode(f"{timestamp}|{rowid}".encode()).decode()
+
+def decode_cursor(cursor):
+    """Raises ValueError for a cursor this module did not produce."""
+    timestamp, rowid = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+    return timestamp, int(rowid)
+
+
+# ---------------------- history partitions ----------------------
+def history_month(ts):
+    """'2024-05-17 10:00:00' -> '2024-05'."""
+    return ts[:7]
+
+def _next_month(month):
+    y, m = int(month[:4]), int(month[5:7])
+    return f"{y + m // 12:04d}-{m % 12 + 1:02d}"
+
+def _prev_month(month):
+    y, m = int(month[:4]), int(month[5:7])
+    return f"{y - 1:04d}-12" if m == 1 else f"{y:04d}-{m - 1:02d}"
+
+def history_partition(month):
+    return "db_assessment_history_" + month.replace("-", "")
+
+def _partition_month(name):
+    suffix = name[len("db_assessment_history_"):]
+    return f"{suffix[:4]}-{suffix[4:]}"
+
+
+def _stage_rows(data):
+    """(seq, key..., result, status, hash) per item, and whether a key repeats."""
+    rows, seen, repeated = [], set(), False
+    for seq, item in enumerate(data):
+        key = (item.hostname, item.oracle_sid, item.pdb_name, item.check_name)
+        if item.pdb_name is not None:
+            repeated = repeated or key in seen
+            seen.add(key)
+        rows.append((seq,) + key + (item.result, item.status,
+                                    hashlib.sha256(item.result.encode()).hexdigest()))
+    return rows, repeated
+
+
+# Changed rows of a staged batch. A key repeated inside the batch is compared
+# against its previous occurrence (LAG over the batch order) rather than the
+# stored row, and NULL pdb_name never matches, as with `=` in the row-wise path.
+_CHANGED_SQL = """
+    INSERT INTO submit_changed
+    SELECT s.seq, s.hostname, s.oracle_sid, s.pdb_name, s.check_name,
+           s.result, s.status, s.hash, CASE WHEN r.hash IS NULL THEN 0 ELSE 1 END
+    FROM submit_stage s
+    LEFT JOIN db_assessment_results r
+      ON r.hostname = s.hostname AND r.oracle_sid = s.oracle_sid
+     AND r.pdb_name = s.pdb_name AND r.check_name = s.check_name
+    WHERE r.hash IS NULL OR r.hash <> s.hash
+"""
+
+_CHANGED_WITH_REPEATS_SQL = """
+    INSERT INTO submit_changed
+    SELECT seq, hostname, oracle_sid, pdb_name, check_name, result, status, hash,
+           CASE WHEN prev_hash IS NULL THEN 0 ELSE 1 END
+    FROM (
+        SELECT s.*,
+               CASE WHEN s.pdb_name IS NULL THEN NULL
+                    WHEN LAG(s.seq) OVER w IS NOT NULL THEN LAG(s.hash) OVER w
+                    ELSE r.hash END AS prev_hash
+        FROM submit_stage s
+        LEFT JOIN db_assessment_results r
+          ON r.hostname = s.hostname AND r.oracle_sid = s.oracle_sid
+         AND r.pdb_name = s.pdb_name AND r.check_name = s.check_name
+        WINDOW w AS (PARTITION BY s.hostname, s.oracle_sid, s.pdb_name, s.check_name
+                     ORDER BY s.seq)
+    ) staged
+    WHERE prev_hash IS NULL OR prev_hash <> hash
+"""
+
+
+class Storage:
+    """Queries shared by the engines; subclasses supply connections and dialect."""
+
+    engine = None
+    rowid = "rowid"           # tie-breaker column for keyset pages
+    upsert_result_sql = None  # row-wise upsert of one db_assessment_results row
+
+    # -------------------- connections --------------------
+    def writer(self):
+        """Context manager yielding a cursor inside an open transaction."""
+        raise NotImplementedError
+
+    def reader(self):
+        """Context manager yielding a read cursor whose rows are mappings."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def sql(self, sql):
+        """Translate the `?` placeholders used throughout to the driver's style."""
+        return sql
+
+    # -------------------- schema --------------------
+    def init_schema(self):
+        raise NotImplementedError
+
+    def plan_checked_queries(self, page_size):
+        cursor = ("9999-12-31 23:59:59", 0)
+        return {
+            "/latest_failures": (self.page_sql("db_assessment_results", RESULT_COLUMNS, ["status"], True),
+                                 ("FAIL", *cursor, page_size)),
+            "/changes": (self.history_page_sql(self._newest_history_table(), [], True),
+                         (*cursor, page_size)),
+            "/dashboard": (self.page_sql("db_assessment_results", RESULT_COLUMNS, [], True),
+                           (*cursor, page_size)),
+            "/dashboard/sys-audit": (self.page_sql("db_sys_audit", SYS_AUDIT_PAGE_COLUMNS, [], True),
+                                     (*cursor, page_size)),
+        }
+
+    def check_query_plans(self, page_size):
+        """Warn about endpoint queries that fall back to a full scan or a sort."""
+        problems = {}
+        for endpoint, (sql, params) in self.plan_checked_queries(page_size).items():
+            bad = self._plan_problems(sql, params)
+            if bad:
+                problems[endpoint] = bad
+                log.warning("query plan for %s falls back to: %s", endpoint, "; ".join(bad))
+        return problems
+
+    def _plan_problems(self, sql, params):
+        raise NotImplementedError
+
+    # -------------------- ingest --------------------
+    def submit(self, cur, data, ts, bulk):
+        """Apply a /submit batch; returns (inserted, updated)."""
+        if bulk:
+            return self._submit_bulk(cur, data, ts)
+        return self._submit_rowwise(cur, data, ts)
+
+    def _submit_rowwise(self, cur, data, ts):
+        """Per-item ingest: one lookup, upsert and history insert per row."""
+        inserted = updated = 0
+        history = self._history_target(cur, ts)
+
+        for item in data:
+            new_hash = hashlib.sha256(item.result.encode()).hexdigest()
+            cur.execute(self.sql("""
+                SELECT hash FROM db_assessment_results
+                WHERE hostname = ? AND oracle_sid = ? AND pdb_name = ? AND check_name = ?
+            """), (item.hostname, item.oracle_sid, item.pdb_name, item.check_name))
+            row = cur.fetchone()
+
+            if row and row[0] == new_hash:
+                continue  # no change
+
+            # store in history if previous record existed
+            if row:
+                updated += 1
+            else:
+                inserted += 1
+
+            cur.execute(self.sql(self.upsert_result_sql),
+                        (item.hostname, item.oracle_sid, item.pdb_name,
+                         item.check_name, item.result, item.status, new_hash, ts))
+
+            # insert into history; the body is stored once per hash
+            cur.execute(self.sql("""
+                INSERT INTO db_result_bodies (hash, result) VALUES (?, ?)
+                ON CONFLICT (hash) DO NOTHING
+            """), (new_hash, item.result))
+            cur.execute(self.sql(f"""
+                INSERT INTO {history} ({HISTORY_COLUMNS})
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """), (item.hostname, item.oracle_sid, item.pdb_name,
+                   item.check_name, item.status, new_hash, ts))
+
+        return inserted, updated
+
+    def _submit_bulk(self, cur, data, ts):
+        """
+        Set-based ingest: stage the batch, find changed rows with one join
+        against db_assessment_results and write them with set statements.
+        Counters match _submit_rowwise exactly.
+        """
+        self._create_stage_tables(cur)
+        rows, repeated = _stage_rows(data)
+        self._load_stage(cur, rows)
+
+        # the window sort is only paid for when the batch repeats a key
+        cur.execute(_CHANGED_WITH_REPEATS_SQL if repeated else _CHANGED_SQL)
+        cur.execute("""
+            SELECT COUNT(*) - COALESCE(SUM(existed), 0), COALESCE(SUM(existed), 0)
+            FROM submit_changed
+        """)
+        inserted, updated = (int(n) for n in cur.fetchone())
+
+        self._write_changed_results(cur, ts)
+        # WHERE true: SQLite would otherwise read ON CONFLICT as a join constraint
+        cur.execute("""
+            INSERT INTO db_result_bodies (hash, result)
+            SELECT hash, result FROM submit_changed WHERE true
+            ON CONFLICT (hash) DO NOTHING
+        """)
+        cur.execute(self.sql(f"""
+            INSERT INTO {self._history_target(cur, ts)} ({HISTORY_COLUMNS})
+            SELECT hostname, oracle_sid, pdb_name, check_name, status, hash, ?
+            FROM submit_changed ORDER BY seq
+        """), (ts,))
+
+        cur.execute("DELETE FROM submit_stage")
+        cur.execute("DELETE FROM submit_changed")
+        return inserted, updated
+
+    def _create_stage_tables(self, cur):
+        for name, extra in (("submit_stage", ""), ("submit_changed", ", existed INTEGER")):
+            cur.execute(f"""
+                CREATE TEMP TABLE IF NOT EXISTS {name} (
+                    seq INTEGER PRIMARY KEY,
+                    hostname TEXT, oracle_sid TEXT, pdb_name TEXT, check_name TEXT,
+                    result TEXT, status TEXT, hash TEXT{extra}
+                )
+            """)
+        cur.execute("DELETE FROM submit_stage")
+        cur.execute("DELETE FROM submit_changed")
+
+    def _load_stage(self, cur, rows):
+        raise NotImplementedError
+
+    def _write_changed_results(self, cur, ts):
+        raise NotImplementedError
+
+    def store_sys_audit(self, cur, rows, batch_size):
+        """Insert db_sys_audit rows in batch_size chunks, ignoring duplicates; returns rows stored."""
+        stored = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                stored += self._insert_sys_audit_batch(cur, batch)
+                batch.clear()
+        if batch:
+            stored += self._insert_sys_audit_batch(cur, batch)
+        return stored
+
+    def _insert_sys_audit_batch(self, cur, batch):
+        raise NotImplementedError
+
+    # -------------------- reads --------------------
+    def page_sql(self, table, columns, filter_cols, with_cursor):
+        where = [f"{col} = ?" for col in filter_cols]
+        if with_cursor:
+            where.append(f"(timestamp, {self.rowid}) < (?, ?)")
+        return self.sql(f"SELECT {self.rowid} AS row_id, {columns} FROM {table}"
+                        + (" WHERE " + " AND ".join(where) if where else "")
+                        + f" ORDER BY timestamp DESC, {self.rowid} DESC LIMIT ?")
+
+    def fetch_page(self, table, columns, filters, cursor, limit):
+        """
+        Return (rows, next_cursor) for one page as dicts; empty filters are
+        ignored. Raises ValueError for a malformed cursor.
+        """
+        filters = {col: val for col, val in filters.items() if val not in (None, "")}
+        params = list(filters.values())
+        if cursor:
+            params.extend(decode_cursor(cursor))
+        sql = self.page_sql(table, columns, filters, bool(cursor))
+
+        with self.reader() as cur:
+            cur.execute(sql, params + [limit + 1])
+            rows = [dict(r) for r in cur.fetchall()]
+        return self._page(rows, limit)
+
+    def history_page_sql(self, table, filter_cols, with_cursor):
+        where = [f"h.{col} = ?" for col in filter_cols]
+        if with_cursor:
+            where.append(f"(h.timestamp, h.{self.rowid}) < (?, ?)")
+        return self.sql(f"SELECT h.{self.rowid} AS row_id, {HISTORY_SELECT}"
+                        f" FROM {table} h JOIN db_result_bodies b ON b.hash = h.hash"
+                        + (" WHERE " + " AND ".join(where) if where else "")
+                        + f" ORDER BY h.timestamp DESC, h.{self.rowid} DESC LIMIT ?")
+
+    def fetch_history_page(self, filters, cursor, limit):
+        """fetch_page for db_assessment_history, reading the partitions newest first."""
+        filters = {col: val for col, val in filters.items() if val not in (None, "")}
+        after = decode_cursor(cursor) if cursor else None
+        rows = []
+        with self.reader() as cur:
+            for table in self._history_read_tables(cur, after[0] if after else None):
+                cur.execute(self.history_page_sql(table, filters, bool(after)),
+                            list(filters.values()) + list(after or ()) + [limit + 1 - len(rows)])
+                rows.extend(dict(r) for r in cur.fetchall())
+                if len(rows) > limit:
+                    break
+        return self._page(rows, limit)
+
+    def _page(self, rows, limit):
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["row_id"])
+        for r in rows:
+            del r["row_id"]
+        return rows, next_cursor
+
+    # -------------------- history partitions --------------------
+    def _history_target(self, cur, ts):
+        """Table that takes history rows stamped ts; creates the month's partition."""
+        month = history_month(ts)
+        self._create_history_partition(cur, month)
+        return history_partition(month)
+
+    def _create_history_partition(self, cur, month):
+        raise NotImplementedError
+
+    def _history_months(self, cur):
+        """Months that have a history partition, oldest first."""
+        raise NotImplementedError
+
+    def _history_read_tables(self, cur, before_ts):
+        """Tables a history page reads, newest first, skipping months after before_ts."""
+        raise NotImplementedError
+
+    def _newest_history_table(self):
+        with self.reader() as cur:
+            return self._history_read_tables(cur, None)[0]
+
+    def expire_history(self, cur, keep_months, archive_dir=None, now=None):
+        """
+        Drop the history partitions older than the newest keep_months months
+        (the current month counts as one). With archive_dir, each month is
+        first written to archive_dir/history_YYYY-MM.csv.gz. Result bodies no
+        longer referenced are dropped too. Returns the expired months.
+        """
+        if keep_months <= 0:
+            return []
+        cutoff = history_month(now or time.strftime("%Y-%m-%d %H:%M:%S"))
+        for _ in range(keep_months - 1):
+            cutoff = _prev_month(cutoff)
+
+        expired = [m for m in self._history_months(cur) if m < cutoff]
+        for month in expired:
+            if archive_dir:
+                self._archive_history_month(cur, month, archive_dir)
+            cur.execute(f"DROP TABLE {history_partition(month)}")
+            log.info("expired history month %s", month)
+        if expired:
+            self._drop_orphan_bodies(cur)
+        return expired
+
+    def _archive_history_month(self, cur, month, archive_dir):
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(archive_dir, f"history_{month}.csv.gz")
+        cur.execute(f"""
+            SELECT {HISTORY_SELECT}
+            FROM {history_partition(month)} h JOIN db_result_bodies b ON b.hash = h.hash
+            ORDER BY h.timestamp, h.{self.rowid}
+        """)
+        # written under a temporary name so a half-written archive never
+        # looks complete
+        with gzip.open(path + ".part", "wt", newline="") as fh:
+            out = csv.writer(fh)
+            out.writerow(RESULT_COLUMNS.split(", "))
+            while True:
+                rows = cur.fetchmany(1000)
+                if not rows:
+                    break
+                out.writerows(rows)
+        os.replace(path + ".part", path)
+
+    def _drop_orphan_bodies(self, cur):
+        raise NotImplementedError
+
+    def stats(self):
+        """(status, count) and (hostname, status, count) from the maintained summary."""
+        with self.reader() as cur:
+            cur.execute("""
+                SELECT status, SUM(count) FROM db_status_summary
+                WHERE count > 0 GROUP BY status ORDER BY status
+            """)
+            by_status = [(r[0], int(r[1])) for r in cur.fetchall()]
+            cur.execute("""
+                SELECT hostname, status, count
+                FROM db_status_summary WHERE count > 0 ORDER BY hostname, status
+            """)
+            by_host = [tuple(r) for r in cur.fetchall()]
+        return by_status, by_host
+
+    def rebuild_status_summary(self, cur):
+        """
+        Recount db_status_summary from db_assessment_results and replace it.
+        Returns the drift found as (hostname, status, summary_count, actual_count).
+        """
+        cur.execute("""
+            SELECT hostname, status, COUNT(*) FROM db_assessment_results GROUP BY hostname, status
+        """)
+        actual = {(h, st): int(c) for h, st, c in map(tuple, cur.fetchall())}
+        cur.execute("""
+            SELECT hostname, status, count FROM db_status_summary WHERE count <> 0
+        """)
+        summary = {(h, st): int(c) for h, st, c in map(tuple, cur.fetchall())}
+        drift = [(h, st, summary.get((h, st), 0), actual.get((h, st), 0))
+                 for h, st in sorted(actual.keys() | summary.keys())
+                 if summary.get((h, st), 0) != actual.get((h, st), 0)]
+
+        cur.execute("DELETE FROM db_status_summary")
+        cur.executemany(self.sql("""
+            INSERT INTO db_status_summary (hostname, status, count) VALUES (?, ?, ?)
+        """), [(h, st, c) for (h, st), c in actual.items()])
+        return drift
+
+
+# ============================ SQLite ============================
+class SQLiteStorage(Storage):
+    engine = "sqlite"
+    rowid = "rowid"
+    # REPLACE deletes the old row without firing delete triggers; the summary
+    # triggers below account for that
+    upsert_result_sql = f"""
+        INSERT OR REPLACE INTO db_assessment_results ({RESULT_COLUMNS})
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    def __init__(self, path=DB_PATH, **pool_options):
+        self.pool = SQLitePool(path, **pool_options)
+
+    @contextmanager
+    def writer(self):
+        with self.pool.writer() as conn:
+            # explicit BEGIN so savepoints nest inside it instead of committing
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            yield conn.cursor()
+
+    @contextmanager
+    def reader(self):
+        with self.pool.reader() as conn:
+            yield conn.cursor()
+
+    def close(self):
+        self.pool.close()
+
+    def init_schema(self):
+        with self.writer() as cur:
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS db_assessment_results (
+                hostname TEXT NOT NULL,
+                oracle_sid TEXT NOT NULL,
+                pdb_name TEXT,
+                check_name TEXT NOT NULL,
+                result TEXT NOT NULL,
+                status TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                PRIMARY KEY (hostname, oracle_sid, pdb_name, check_name)
+            );
+            """)
+
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS db_result_bodies (
+                hash TEXT PRIMARY KEY,
+                result TEXT NOT NULL
+            );
+            """)
+            self._create_history_partition(cur, history_month(time.strftime("%Y-%m-%d")))
+            self._migrate_unpartitioned_history(cur)
+
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS db_sys_audit (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                hostname TEXT NOT NULL,
+                sid TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                file TEXT NOT NULL,
+                database_user TEXT NOT NULL,
+                client_address TEXT NOT NULL,
+                client_user TEXT NOT NULL,
+                status TEXT NOT NULL,
+                action TEXT NOT NULL,
+                UNIQUE(hostname, sid, timestamp, file)
+            );
+            """)
+
+            # per host/status counts behind /stats, maintained by triggers so
+            # both submit paths keep it current. INSERT OR REPLACE does not fire
+            # delete triggers, so the row being replaced is subtracted BEFORE INSERT.
+            summary_exists = cur.execute("""
+                SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'db_status_summary'
+            """).fetchone()
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS db_status_summary (
+                hostname TEXT NOT NULL,
+                status TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (hostname, status)
+            );
+            """)
+            cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_results_summary_replace
+            BEFORE INSERT ON db_assessment_results
+            BEGIN
+                UPDATE db_status_summary SET count = count - 1
+                WHERE (hostname, status) IN (
+                    SELECT hostname, status FROM db_assessment_results
+                    WHERE hostname = NEW.hostname AND oracle_sid = NEW.oracle_sid
+                      AND pdb_name = NEW.pdb_name AND check_name = NEW.check_name);
+            END;
+            """)
+            cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_results_summary_insert
+            AFTER INSERT ON db_assessment_results
+            BEGIN
+                INSERT INTO db_status_summary (hostname, status, count)
+                VALUES (NEW.hostname, NEW.status, 1)
+                ON CONFLICT (hostname, status) DO UPDATE SET count = count + 1;
+            END;
+            """)
+            if not summary_exists:
+                self.rebuild_status_summary(cur)
+
+            # indexes for the read endpoints; IF NOT EXISTS builds them on
+            # databases created before they were added
+            cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_results_status_ts
+                ON db_assessment_results (status, timestamp);
+            """)
+            cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_results_ts
+                ON db_assessment_results (timestamp);
+            """)
+            # covering: /dashboard/sys-audit never touches the table itself.
+            # id (the rowid) follows timestamp so keyset pages need no sort.
+            cur.execute("DROP INDEX IF EXISTS idx_sys_audit_ts")
+            cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_sys_audit_ts_id
+                ON db_sys_audit (timestamp, id, hostname, sid, client_address,
+                                 client_user, status, action);
+            """)
+
+    def _plan_problems(self, sql, params):
+        with self.reader() as cur:
+            plan = [row[3] for row in cur.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        return [step for step in plan
+                if (step.startswith("SCAN ") and " USING " not in step)
+                or step.startswith("USE TEMP B-TREE")]
+
+    def _create_history_partition(self, cur, month):
+        table = history_partition(month)
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                hostname TEXT NOT NULL,
+                oracle_sid TEXT NOT NULL,
+                pdb_name TEXT,
+                check_name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                timestamp TEXT NOT NULL
+            )
+        """)
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table} (timestamp)")
+
+    def _history_months(self, cur):
+        cur.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'table' AND name GLOB 'db_assessment_history_[0-9][0-9][0-9][0-9][0-9][0-9]'
+        """)
+        return sorted(_partition_month(r[0]) for r in cur.fetchall())
+
+    def _history_read_tables(self, cur, before_ts):
+        last = history_month(before_ts) if before_ts else None
+        return [history_partition(m) for m in reversed(self._history_months(cur))
+                if last is None or m <= last]
+
+    def _drop_orphan_bodies(self, cur):
+        live = " UNION ALL ".join(f"SELECT hash FROM {history_partition(m)}"
+                                  for m in self._history_months(cur))
+        cur.execute("DELETE FROM db_result_bodies"
+                    + (f" WHERE hash NOT IN ({live})" if live else ""))
+
+    def _migrate_unpartitioned_history(self, cur):
+        # databases from before partitioning keep every row, with its body
+        # inline, in a single db_assessment_history table
+        if not cur.execute("""
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'db_assessment_history'
+        """).fetchone():
+            return
+        cur.execute("""
+            INSERT OR IGNORE INTO db_result_bodies (hash, result)
+            SELECT hash, result FROM db_assessment_history
+        """)
+        months = [r[0] for r in cur.execute(
+            "SELECT DISTINCT substr(timestamp, 1, 7) FROM db_assessment_history").fetchall()]
+        for month in months:
+            self._create_history_partition(cur, month)
+            cur.execute(f"""
+                INSERT INTO {history_partition(month)} ({HISTORY_COLUMNS})
+                SELECT {HISTORY_COLUMNS} FROM db_assessment_history
+                WHERE timestamp >= ? AND timestamp < ? ORDER BY id
+            """, (month, _next_month(month)))
+        cur.execute("DROP TABLE db_assessment_history")
+        log.info("moved db_assessment_history into %d monthly partitions", len(months))
+
+    def _load_stage(self, cur, rows):
+        cur.executemany("""
+            INSERT INTO submit_stage
+            (seq, hostname, oracle_sid, pdb_name, check_name, result, status, hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+    def _write_changed_results(self, cur, ts):
+        # batch order matters: the last change to a repeated key must win
+        cur.execute(f"""
+            INSERT OR REPLACE INTO db_assessment_results ({RESULT_COLUMNS})
+            SELECT hostname, oracle_sid, pdb_name, check_name, result, status, hash, ?
+            FROM submit_changed ORDER BY seq
+        """, (ts,))
+
+    def _insert_sys_audit_batch(self, cur, batch):
+        before = cur.connection.total_changes
+        cur.executemany(f"""
+            INSERT OR IGNORE INTO db_sys_audit ({SYS_AUDIT_COLUMNS})
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, batch)
+        return cur.connection.total_changes - before
+
+
+# ============================ PostgreSQL ============================
+def _copy_text(value):
+    """One field in COPY text format."""
+    if value is None:
+        return "\\N"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+def _copy_rows(cur, table, columns, rows):
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join(_copy_text(v) for v in row))
+        buf.write("\n")
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN", buf)
+
+
+class PostgresStorage(Storage):
+    """
+    Same schema as SQLite, with a BIGSERIAL id standing in for rowid and a
+    UNIQUE key (NULLs distinct, as in SQLite) instead of the composite primary
+    key. Bulk ingest loads staging tables with COPY; upserts use ON CONFLICT.
+    """
+
+    engine = "postgresql"
+    rowid = "id"
+    upsert_result_sql = f"""
+        INSERT INTO db_assessment_results ({RESULT_COLUMNS})
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (hostname, oracle_sid, pdb_name, check_name) DO UPDATE
+        SET result = EXCLUDED.result, status = EXCLUDED.status,
+            hash = EXCLUDED.hash, timestamp = EXCLUDED.timestamp
+    """
+
+    def __init__(self, dsn=PG_DSN, pool_size=PG_POOL_SIZE):
+        if psycopg2 is None:
+            raise RuntimeError("COLLECTOR_STORAGE=postgresql needs psycopg2 (pip install psycopg2-binary)")
+        self.pool = psycopg2.pool.ThreadedConnectionPool(1, max(1, pool_size), dsn)
+
+    @contextmanager
+    def _connection(self, readonly):
+        conn = self.pool.getconn()
+        try:
+            conn.set_session(readonly=readonly)
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+
+    @contextmanager
+    def writer(self):
+        with self._connection(readonly=False) as conn:
+            with conn.cursor() as cur:
+                yield cur
+
+    @contextmanager
+    def reader(self):
+        with self._connection(readonly=True) as conn:
+            # DictCursor rows index by position and by name, like sqlite3.Row
+            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                yield cur
+
+    def close(self):
+        self.pool.closeall()
+
+    def sql(self, sql):
+        return sql.replace("?", "%s")
+
+    def init_schema(self):
+        with self.writer() as cur:
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS db_assessment_results (
+                id BIGSERIAL PRIMARY KEY,
+                hostname TEXT NOT NULL,
+                oracle_sid TEXT NOT NULL,
+                pdb_name TEXT,
+                check_name TEXT NOT NULL,
+                result TEXT NOT NULL,
+                status TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                UNIQUE (hostname, oracle_sid, pdb_name, check_name)
+            );
+            """)
+
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS db_result_bodies (
+                hash TEXT PRIMARY KEY,
+                result TEXT NOT NULL
+            );
+            """)
+            # databases from before partitioning have a plain table here
+            cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('db_assessment_history')")
+            row = cur.fetchone()
+            unpartitioned = row is not None and row[0] == "r"
+            if unpartitioned:
+                cur.execute("DROP INDEX IF EXISTS idx_history_ts")
+                cur.execute("ALTER TABLE db_assessment_history RENAME TO db_assessment_history_unpartitioned")
+            # "C" collation: months sort and bound partitions byte-wise, as in SQLite
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS db_assessment_history (
+                id BIGSERIAL,
+                hostname TEXT NOT NULL,
+                oracle_sid TEXT NOT NULL,
+                pdb_name TEXT,
+                check_name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                timestamp TEXT COLLATE "C" NOT NULL
+            ) PARTITION BY RANGE (timestamp);
+            """)
+            cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_history_ts
+                ON db_assessment_history (timestamp, id);
+            """)
+            self._create_history_partition(cur, history_month(time.strftime("%Y-%m-%d")))
+            if unpartitioned:
+                self._migrate_unpartitioned_history(cur)
+
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS db_sys_audit (
+                id BIGSERIAL PRIMARY KEY,
+                hostname TEXT NOT NULL,
+                sid TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                file TEXT NOT NULL,
+                database_user TEXT NOT NULL,
+                client_address TEXT NOT NULL,
+                client_user TEXT NOT NULL,
+                status TEXT NOT NULL,
+                action TEXT NOT NULL,
+                UNIQUE (hostname, sid, timestamp, file)
+            );
+            """)
+
+            cur.execute("SELECT to_regclass('db_status_summary')")
+            summary_exists = cur.fetchone()[0] is not None
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS db_status_summary (
+                hostname TEXT NOT NULL,
+                status TEXT NOT NULL,
+                count BIGINT NOT NULL,
+                PRIMARY KEY (hostname, status)
+            );
+            """)
+            # ON CONFLICT DO UPDATE is an UPDATE here, so one row trigger
+            # covers inserts, upserts and deletes
+            cur.execute("""
+            CREATE OR REPLACE FUNCTION db_status_summary_maintain() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    UPDATE db_status_summary SET count = count - 1
+                    WHERE hostname = OLD.hostname AND status = OLD.status;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO db_status_summary (hostname, status, count)
+                    VALUES (NEW.hostname, NEW.status, 1)
+                    ON CONFLICT (hostname, status) DO UPDATE
+                    SET count = db_status_summary.count + 1;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql;
+            """)
+            cur.execute("DROP TRIGGER IF EXISTS trg_results_summary ON db_assessment_results")
+            cur.execute("""
+            CREATE TRIGGER trg_results_summary
+            AFTER INSERT OR UPDATE OR DELETE ON db_assessment_results
+            FOR EACH ROW EXECUTE FUNCTION db_status_summary_maintain();
+            """)
+            if not summary_exists:
+                self.rebuild_status_summary(cur)
+
+            cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_results_status_ts
+                ON db_assessment_results (status, timestamp, id);
+            """)
+            cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_results_ts
+                ON db_assessment_results (timestamp, id);
+            """)
+            cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_sys_audit_ts_id
+                ON db_sys_audit (timestamp, id)
+                INCLUDE (hostname, sid, client_address, client_user, status, action);
+            """)
+
+    def _plan_problems(self, sql, params):
+        # with seq scans and sorts priced out, any that remain have no index path
+        with self.reader() as cur:
+            cur.execute("SET LOCAL enable_seqscan = off")
+            cur.execute("SET LOCAL enable_sort = off")
+            cur.execute("EXPLAIN " + sql, params)
+            plan = [row[0].strip().lstrip("-> ") for row in cur.fetchall()]
+        return [step for step in plan if step.startswith(("Seq Scan", "Sort"))]
+
+    def _history_target(self, cur, ts):
+        # rows are routed to their partition by the parent table
+        super()._history_target(cur, ts)
+        return "db_assessment_history"
+
+    def _create_history_partition(self, cur, month):
+        table = history_partition(month)
+        cur.execute("SELECT to_regclass(%s)", (table,))
+        if cur.fetchone()[0] is None:
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} PARTITION OF db_assessment_history
+                FOR VALUES FROM (%s) TO (%s)
+            """, (month, _next_month(month)))
+
+    def _history_months(self, cur):
+        cur.execute("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'db_assessment_history'::regclass
+        """)
+        return sorted(_partition_month(r[0]) for r in cur.fetchall())
+
+    def _history_read_tables(self, cur, before_ts):
+        # one ordered scan over the parent; the cursor prunes later months
+        return ["db_assessment_history"]
+
+    def _drop_orphan_bodies(self, cur):
+        cur.execute("""
+            DELETE FROM db_result_bodies b
+            WHERE NOT EXISTS (SELECT 1 FROM db_assessment_history h WHERE h.hash = b.hash)
+        """)
+
+    def _migrate_unpartitioned_history(self, cur):
+        cur.execute("""
+            INSERT INTO db_result_bodies (hash, result)
+            SELECT hash, result FROM db_assessment_history_unpartitioned
+            ON CONFLICT (hash) DO NOTHING
+        """)
+        cur.execute("SELECT DISTINCT substr(timestamp, 1, 7) FROM db_assessment_history_unpartitioned")
+        months = [r[0] for r in cur.fetchall()]
+        for month in months:
+            self._create_history_partition(cur, month)
+        cur.execute(f"""
+            INSERT INTO db_assessment_history ({HISTORY_COLUMNS})
+            SELECT {HISTORY_COLUMNS} FROM db_assessment_history_unpartitioned ORDER BY id
+        """)
+        cur.execute("DROP TABLE db_assessment_history_unpartitioned")
+        log.info("moved db_assessment_history into %d monthly partitions", len(months))
+
+    def _load_stage(self, cur, rows):
+        _copy_rows(cur, "submit_stage",
+                   "seq, hostname, oracle_sid, pdb_name, check_name, result, status, hash", rows)
+        cur.execute("ANALYZE submit_stage")
+
+    def _write_changed_results(self, cur, ts):
+        # one statement may not upsert the same key twice: keep the last change
+        # per key; NULL pdb_name rows never conflict and all go in
+        cur.execute(f"""
+            INSERT INTO db_assessment_results ({RESULT_COLUMNS})
+            SELECT hostname, oracle_sid, pdb_name, check_name, result, status, hash, %s
+            FROM (
+                SELECT DISTINCT ON (hostname, oracle_sid, pdb_name, check_name) *
+                FROM submit_changed WHERE pdb_name IS NOT NULL
+                ORDER BY hostname, oracle_sid, pdb_name, check_name, seq DESC
+            ) last_change
+            UNION ALL
+            SELECT hostname, oracle_sid, pdb_name, check_name, result, status, hash, %s
+            FROM submit_changed WHERE pdb_name IS NULL
+            ON CONFLICT (hostname, oracle_sid, pdb_name, check_name) DO UPDATE
+            SET result = EXCLUDED.result, status = EXCLUDED.status,
+                hash = EXCLUDED.hash, timestamp = EXCLUDED.timestamp
+        """, (ts, ts))
+
+    def _insert_sys_audit_batch(self, cur, batch):
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS sys_audit_stage (
+                hostname TEXT, sid TEXT, timestamp TEXT, file TEXT, database_user TEXT,
+                client_address TEXT, client_user TEXT, status TEXT, action TEXT
+            )
+        """)
+        cur.execute("TRUNCATE sys_audit_stage")
+        _copy_rows(cur, "sys_audit_stage", SYS_AUDIT_COLUMNS, batch)
+        cur.execute(f"""
+            INSERT INTO db_sys_audit ({SYS_AUDIT_COLUMNS})
+            SELECT {SYS_AUDIT_COLUMNS} FROM sys_audit_stage
+            ON CONFLICT (hostname, sid, timestamp, file) DO NOTHING
+        """)
+        return cur.rowcount
+
+
+def open_storage(engine=STORAGE_ENGINE):
+    if engine == "sqlite":
+        return SQLiteStorage()
+    if engine in ("postgresql", "postgres"):
+        return PostgresStorage()
+    raise ValueError(f"Unknown COLLECTOR_STORAGE engine: {engine}")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+storage_check.py
+
+Run the same ingest/read scenario against the sqlite and postgresql storage
+engines and compare what they return: /submit counters (row-wise and bulk),
+sys audit counts, result and history rows, /stats, keyset pages and history
+expiry with archives.
+
+The PostgreSQL tables are DROPPED first, so point --pg-dsn at a scratch
+database. Without --pg-dsn a throwaway local server is started with pgserver
+(pip install pgserver) when it is installed.
+
+Usage:
+  python storage_check.py --pg-dsn "dbname=collector_scratch"
+"""
+
+import os, sys, argparse, tempfile, random, gzip
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from storage import SQLiteStorage, PostgresStorage, RESULT_COLUMNS, SYS_AUDIT_PAGE_COLUMNS
+
+Item = namedtuple("Item", "hostname oracle_sid pdb_name check_name result status")
+
+TABLES = ("db_assessment_results", "db_assessment_history", "db_result_bodies",
+          "db_status_summary", "db_sys_audit")
+
+
+def make_batches(seed, count=6, size=300):
+    # few hosts/checks so keys repeat inside and across batches; some NULL pdbs
+    rnd = random.Random(seed)
+    return [[Item(f"host{rnd.randint(0, 3)}", "ORCL", rnd.choice([None, "PDB1", "PDB2"]),
+                  f"check_{rnd.randint(0, 40):03d}", f"value {rnd.randint(0, 3)}",
+                  rnd.choice(["PASS", "FAIL", "INFO"]))
+             for _ in range(size)] for _ in range(count)]
+
+
+def make_sys_audit(seed, size=500):
+    rnd = random.Random(seed)
+    return [(f"host{rnd.randint(0, 3)}", "ORCL", f"2024-01-01 00:{rnd.randint(0, 59):02d}:00",
+             f"ora_{rnd.randint(0, 9)}.aud", "SYS", "10.0.0.1", "oracle", "0", "CONNECT")
+            for _ in range(size)]
+
+
+def all_pages(fetch, *args, limit=37):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = fetch(*args, cursor, limit)
+        pages.append([tuple(r.values()) for r in rows])
+        if not cursor:
+            return pages
+
+
+def scenario(store, bulk, archive_dir):
+    out = {}
+    out["submit"] = []
+    for i, batch in enumerate(make_batches(seed=7)):
+        with store.writer() as cur:
+            # one batch per month, so history spans several partitions
+            out["submit"].append(store.submit(cur, batch, f"2024-{i + 1:02d}-15 12:00:00", bulk))
+    with store.writer() as cur:
+        out["sys_audit"] = [store.store_sys_audit(cur, make_sys_audit(seed=3), 128),
+                            store.store_sys_audit(cur, make_sys_audit(seed=3), 128)]
+
+    with store.reader() as cur:
+        cur.execute(f"SELECT {RESULT_COLUMNS} FROM db_assessment_results")
+        out["results"] = sorted((tuple(r) for r in cur.fetchall()), key=repr)
+        cur.execute("SELECT COUNT(*) FROM db_result_bodies")
+        out["bodies"] = int(cur.fetchone()[0])
+
+    out["stats"] = store.stats()
+    # timestamps tie within a batch, so compare page sizes and the row sets
+    for name, fetch, args in (
+            ("latest_failures", store.fetch_page,
+             ("db_assessment_results", RESULT_COLUMNS, {"status": "FAIL"})),
+            ("history", store.fetch_history_page, ({},)),
+            ("changes", store.fetch_history_page, ({"hostname": "host1"},)),
+            ("sys_audit", store.fetch_page, ("db_sys_audit", SYS_AUDIT_PAGE_COLUMNS, {}))):
+        pages = all_pages(fetch, *args)
+        out[f"{name}_page_sizes"] = [len(p) for p in pages]
+        out[f"{name}_rows"] = sorted((r for p in pages for r in p), key=repr)
+    with store.writer() as cur:
+        out["summary_drift"] = store.rebuild_status_summary(cur)
+    out["plan_problems"] = store.check_query_plans(37)
+
+    # keep April..June: January to March are archived and dropped
+    with store.writer() as cur:
+        out["expired"] = store.expire_history(cur, 3, archive_dir, now="2024-06-20 00:00:00")
+    out["archives"] = {name: gzip.open(os.path.join(archive_dir, name), "rt").read()
+                       for name in sorted(os.listdir(archive_dir))}
+    pages = all_pages(store.fetch_history_page, {})
+    out["history_after_expiry"] = sorted((r for p in pages for r in p), key=repr)
+    with store.reader() as cur:
+        cur.execute("SELECT COUNT(*) FROM db_result_bodies")
+        out["bodies_after_expiry"] = int(cur.fetchone()[0])
+    return out
+
+
+def reset_postgres(dsn):
+    import psycopg2
+    conn = psycopg2.connect(dsn)
+    with conn, conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS " + ", ".join(TABLES) + " CASCADE")
+    conn.close()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Compare the sqlite and postgresql storage engines.")
+    p.add_argument('--pg-dsn', help="scratch PostgreSQL database (its collector tables are dropped)")
+    args = p.parse_args()
+
+    dsn, server = args.pg_dsn, None
+    if not dsn:
+        try:
+            import pgserver
+        except ImportError:
+            print("need --pg-dsn (or pip install pgserver for a throwaway local server)")
+            return 2
+        server = pgserver.get_server(tempfile.mkdtemp(prefix="storage_check_pg_"))
+        dsn = server.get_uri()
+
+    workdir = tempfile.mkdtemp(prefix="storage_check_")
+    failures = 0
+    for bulk in (False, True):
+        results = {}
+        sqlite_store = SQLiteStorage(os.path.join(workdir, f"bulk{int(bulk)}.db"))
+        sqlite_store.init_schema()
+        results["sqlite"] = scenario(sqlite_store, bulk, tempfile.mkdtemp(dir=workdir))
+        sqlite_store.close()
+
+        reset_postgres(dsn)
+        pg_store = PostgresStorage(dsn, pool_size=2)
+        pg_store.init_schema()
+        results["postgresql"] = scenario(pg_store, bulk, tempfile.mkdtemp(dir=workdir))
+        pg_store.close()
+
+        mode = "bulk" if bulk else "rowwise"
+        for key, expected in results["sqlite"].items():
+            got = results["postgresql"][key]
+            ok = got == expected
+            failures += not ok
+            print(f"{mode:8s} {key:28s} {'ok' if ok else 'MISMATCH'}")
+            if not ok:
+                print(f"    sqlite:     {str(expected)[:300]}")
+                print(f"    postgresql: {str(got)[:300]}")
+
+    if server is not None:
+        server.cleanup()
+    print("engines agree" if not failures else f"{failures} mismatches")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
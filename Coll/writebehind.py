@@ -0,0 +1,137 @@
+"""
+writebehind.py
+
+In-process write-behind queue for the collector. Request handlers enqueue a
+validated payload as a job and return straight away; one background thread
+drains the queue and applies the jobs of many requests in a single
+transaction (group commit), each inside its own savepoint so one bad job does
+not take its neighbours down with it.
+
+The queue is bounded: when it is full, enqueue() raises queue.Full and the
+caller pushes back on the client.
+"""
+
+import threading, queue, uuid, time, logging
+from collections import OrderedDict
+
+log = logging.getLogger("dbcollector.writebehind")
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    def __init__(self, store, maxsize=256, group_size=64, status_retention=10000):
+        self.store = store
+        self.group_size = max(1, group_size)
+        self.status_retention = status_retention
+        self._queue = queue.Queue(maxsize)
+        self._status = OrderedDict()
+        self._status_lock = threading.Lock()
+        self._thread = None
+
+    # -------------------- producer side --------------------
+    def enqueue(self, kind, apply, cleanup=None):
+        """
+        Queue apply(cursor) -> result dict and return its batch id.
+        cleanup(), if given, runs once the job has been applied or dropped.
+        Raises queue.Full when the writer is behind.
+        """
+        batch_id = uuid.uuid4().hex
+        self._set_status(batch_id, {"batch_id": batch_id, "kind": kind, "state": "queued",
+                                    "queued_at": time.time()})
+        try:
+            self._queue.put_nowait((batch_id, apply, cleanup))
+        except queue.Full:
+            with self._status_lock:
+                self._status.pop(batch_id, None)
+            if cleanup:
+                cleanup()
+            raise
+        return batch_id
+
+    def status(self, batch_id):
+        with self._status_lock:
+            st = self._status.get(batch_id)
+            return dict(st) if st else None
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _set_status(self, batch_id, st):
+        with self._status_lock:
+            self._status[batch_id] = st
+            self._status.move_to_end(batch_id)
+            while len(self._status) > self.status_retention:
+                self._status.popitem(last=False)
+
+    def _update_status(self, batch_id, **fields):
+        with self._status_lock:
+            if batch_id in self._status:
+                self._status[batch_id].update(fields)
+
+    # -------------------- writer side --------------------
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="collector-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=30):
+        """Drain what is queued, then stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                return
+            jobs = [job]
+            stopping = False
+            while len(jobs) < self.group_size:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is _STOP:
+                    stopping = True
+                    break
+                jobs.append(job)
+            self._apply_group(jobs)
+            if stopping:
+                return
+
+    def _apply_group(self, jobs):
+        outcomes = {}
+        try:
+            with self.store.writer() as cur:
+                for batch_id, apply, _ in jobs:
+                    self._update_status(batch_id, state="applying")
+                    cur.execute("SAVEPOINT write_behind_job")
+                    try:
+                        outcomes[batch_id] = ("done", apply(cur))
+                        cur.execute("RELEASE write_behind_job")
+                    except Exception as e:
+                        cur.execute("ROLLBACK TO write_behind_job")
+                        cur.execute("RELEASE write_behind_job")
+                        log.exception("write-behind batch %s failed", batch_id)
+                        outcomes[batch_id] = ("failed", str(e))
+        except Exception as e:
+            log.exception("write-behind group commit of %d batches failed", len(jobs))
+            outcomes = {batch_id: ("failed", f"commit failed: {e}") for batch_id, _, _ in jobs}
+        finally:
+            for _, _, cleanup in jobs:
+                if cleanup:
+                    try:
+                        cleanup()
+                    except Exception:
+                        log.exception("write-behind cleanup failed")
+
+        done_at = time.time()
+        for batch_id, (state, outcome) in outcomes.items():
+            if state == "done":
+                self._update_status(batch_id, state=state, result=outcome,
+                                    group_size=len(jobs), done_at=done_at)
+            else:
+                self._update_status(batch_id, state=state, error=outcome, done_at=done_at)
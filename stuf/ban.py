@@ -1,26 +1,60 @@
-import socket
+import argparse, asyncio, json
+
+# banner_grab / find_oracle_listener as before, on the scanengine banner stage
+from scanengine import BannerScanner, parse_targets, parse_ports, count_hosts, grab_banners, as_dict, fd_budget
 
 def banner_grab(host, port):
-    try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.settimeout(2)  # Timeout for the connection
-            sock.connect((host, port))
-            sock.sendall(b'\n')  # Send a newline to trigger a response
-            banner = sock.recv(1024).decode('utf-8', errors='ignore')
-            return banner
-    except Exception as e:
-        return None
+    """Banner text of host:port (or the TNS listener's reply), or None."""
+    found = grab_banners(host, (port, port))
+    return found[0][1]['banner'] if found else None
+
+def is_oracle(d):
+    return d['service'] == 'oracle-tns' or 'Oracle' in (d.get('banner') or '')
 
 def find_oracle_listener(host, port_range):
-    for port in range(port_range[0], port_range[1] + 1):
-        banner = banner_grab(host, port)
-        if banner and "Oracle" in banner:
-            print(f"Oracle listener detected on port {port}: {banner.strip()}")
-            return port
-    print("Oracle listener not found in the specified port range.")
-    return None
+    """Grab every port of port_range at once; print each Oracle banner found
+    and return the lowest such port (None when there is none)."""
+    found = [(port, d) for port, d in grab_banners(host, port_range) if is_oracle(d)]
+    for port, d in found:
+        print(f"Oracle listener detected on port {port}: {d.get('version') or d['banner']}")
+    if not found:
+        print("Oracle listener not found in the specified port range.")
+        return None
+    return found[0][0]
+
+async def sweep(targets, ports, as_json=False, **options):
+    """Print each banner as soon as it is read (or one JSON line per Result), then a summary."""
+    scanner = BannerScanner(states={'open'}, **options)
+    async for r in scanner.scan(targets, ports):
+        if as_json:
+            print(json.dumps(as_dict(r)), flush=True)
+        elif r.detail is not None:
+            name = r.host if r.host == r.addr else f"{r.host} ({r.addr})"
+            d = r.detail
+            first_line = (d['banner'] or '').split('\n', 1)[0][:120]
+            print(f"{name}:{r.port} {d['service'] or '?'} [{d['trigger']}] {first_line}", flush=True)
+    st = scanner.stats
+    if not as_json:
+        print(f"{st['probes']} probes in {st['seconds']:.2f}s: {st['open']} open, "
+              f"{st['open'] - st['no banner']} with a banner")
 
 if __name__ == "__main__":
-    server = "localhost"  # Replace with the server IP
-    port_range = (1521, 1530)  # Typical Oracle listener port range
-    find_oracle_listener(server, port_range)
+    p = argparse.ArgumentParser(description="Concurrent banner grab (greeting, TNS, TLS, newline probes).")
+    p.add_argument('targets', nargs='*', default=['localhost'], help="e.g. 10.0.0.0/24 db01.example.com @hosts.txt")
+    p.add_argument('--ports', default='1521-1530', help="e.g. 22,80,443,1521-1530,2484")
+    p.add_argument('--concurrency', type=int, default=1000, help="connects in flight overall")
+    p.add_argument('--per-host', type=int, default=16, help="connects in flight per address")
+    p.add_argument('--timeout', type=float, default=1.0, help="connect timeout before a host has answered")
+    p.add_argument('--probe-timeout', type=float, default=1.0, help="wait for the first byte of a reply")
+    p.add_argument('--max-bytes', type=int, default=1024, help="read at most this much per reply")
+    p.add_argument('--json', action='store_true', help="one JSON Result per line")
+    args = p.parse_args()
+    args.concurrency = min(args.concurrency, fd_budget())    # raises the open-files limit once
+
+    targets = parse_targets(args.targets)
+    ports = parse_ports(args.ports)
+    if not args.json:
+        print(f"Grabbing banners from {count_hosts(targets)} hosts x {len(ports)} ports...")
+    asyncio.run(sweep(targets, ports, as_json=args.json, concurrency=args.concurrency,
+                      per_host=args.per_host, timeout=args.timeout,
+                      probe_timeout=args.probe_timeout, max_bytes=args.max_bytes))
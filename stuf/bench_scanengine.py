@@ -0,0 +1,883 @@
+#!/usr/bin/env python3
+"""
+bench_scanengine.py
+
+Local harness for the scanengine package. A child process plays the
+network: many loopback addresses (127.1.x.y, all routed to lo on Linux),
+each with listeners on some ports of a range; the scanner sweeps them and
+must find exactly the open ones.
+
+Loopback answers in microseconds, so it shows the per-probe CPU cost and
+none of the latency a real sweep waits on. What a real sweep does wait on
+are filtered ports, and those can be played here: a listener whose accept
+queue is full drops incoming SYNs, so a connect to it times out exactly like
+one to a firewalled port.
+
+  portscan  probes/sec of the asyncio scanner over hosts x ports, against
+            the old one-connect_ex-at-a-time loop (stuf/soc.py) on a sample
+  tns       hosts/sec of the TNS fingerprinting sweep against fake listeners
+            (REFUSE, ACCEPT + banner, REDIRECT, RESEND, TCPS with and without
+            client certificates, and a non-TNS service), each of which must
+            be identified exactly; the old stuf/tns.py loop on a sample
+  banner    hosts/sec of the banner stage against fake services (TNS, TCPS,
+            SSH, SMTP, MySQL, HTTP and a silent one), each of which must get
+            the right service from the right probe; then the same banners
+            as a stage fed by a port scan's Results, duplicates included;
+            the old stuf/ban.py loop on a sample
+  nmap      the batched nmap sweep (scan1.py) over an inventory, with a fake
+            nmap standing in for the real one: three runs (first, unchanged,
+            a share of hosts changed), checking every service reported and
+            that -sV ran only on the changed hosts; one nmap -sV per host,
+            as the old scan1.py did, on a sample
+  engine    tcp, tns, banner and ss probes in one Engine run over the fake
+            banner network, every probe's Results checked, against the same
+            three scanner sweeps run one after another
+  ssh       the SSH fleet (remote.py) over fake SSH servers (a paramiko
+            server stub per loopback address, answering ss, lsnrctl status
+            and oratab with a delay): a first sweep, a second on the kept
+            connections, and the engine's ssh probe, every host checked;
+            the old one-connection-per-host remote.py loop on a sample
+
+Usage:
+  python bench_scanengine.py portscan --hosts 2000 --ports 10
+  python bench_scanengine.py portscan --filtered-ratio 0   # CPU cost only
+  python bench_scanengine.py tns --hosts 2000
+  python bench_scanengine.py banner --hosts 2000
+  python bench_scanengine.py nmap --hosts 2000
+  python bench_scanengine.py engine --hosts 2000
+  python bench_scanengine.py ssh --hosts 2000      # needs paramiko
+"""
+
+import os, sys, argparse, asyncio, logging, multiprocessing, random, selectors, socket, ssl, struct, \
+    subprocess, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from scanengine import PortScanner, TnsScanner, BannerScanner, NmapSweep, nmap_scan, parse_targets, parse_ports
+from scanengine import Engine, TcpProbe, TnsProbe, BannerProbe, SsProbe, SshProbe, SshFleet, host_info, fd_budget
+from scanengine import tns
+
+BASE_PORT = 21521
+
+
+def loopback_hosts(n):
+    return [f"127.1.{i // 250}.{i % 250 + 1}" for i in range(n)]
+
+
+# ------------------------
+# Fake network
+# ------------------------
+def serve(listen_on, drop_on, ready):
+    """Accept and drop connections on every (addr, port) in listen_on, and
+    drop SYNs to every one in drop_on, until killed."""
+    sel = selectors.DefaultSelector()
+    for addr, port in listen_on:
+        s = socket.socket()
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind((addr, port))
+        s.listen(4096)
+        s.setblocking(False)
+        sel.register(s, selectors.EVENT_READ)
+    held = []
+    for addr, port in drop_on:
+        # backlog 0, filled by one connection that is never accepted
+        s = socket.socket()
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind((addr, port))
+        s.listen(0)
+        filler = socket.create_connection((addr, port))
+        held += [s, filler]
+    ready.set()
+    while True:
+        for key, _ in sel.select():
+            try:
+                while True:
+                    conn, _ = key.fileobj.accept()
+                    conn.close()
+            except (BlockingIOError, ConnectionError):
+                pass
+
+
+def start_network(hosts, ports, open_ratio, filtered_ratio=0.0, seed=0):
+    """Listener process for a random open_ratio of hosts x ports, and a
+    filtered_ratio that drops SYNs; returns (process, open set, filtered set)."""
+    rnd = random.Random(seed)
+    open_set, filtered_set = set(), set()
+    for pair in ((h, p) for h in hosts for p in ports):
+        x = rnd.random()
+        if x < open_ratio:
+            open_set.add(pair)
+        elif x < open_ratio + filtered_ratio:
+            filtered_set.add(pair)
+    ready = multiprocessing.Event()
+    proc = multiprocessing.Process(target=serve, args=(sorted(open_set), sorted(filtered_set), ready),
+                                   daemon=True)
+    proc.start()
+    if not ready.wait(60):
+        sys.exit("listener process did not start")
+    return proc, open_set, filtered_set
+
+
+# ------------------------
+# Fake services
+# ------------------------
+def tns_packet(ptype, body):
+    return struct.pack('>HHBBH', 8 + len(body), 0, ptype, 0, 0) + body
+
+def refuse(text):
+    text = text.encode()
+    return tns_packet(tns.REFUSE, struct.pack('>BBH', 34, 0, len(text)) + text)
+
+def nv_refuse(vsnnum, err):
+    return refuse(f"(DESCRIPTION=(TMP=)(VSNNUM={vsnnum})(ERR={err})"
+                  f"(ERROR_STACK=(ERROR=(CODE={err})(EMFI=4))))")
+
+def accept_with_banner(banner):
+    text = banner.encode()
+    return (tns_packet(tns.ACCEPT, struct.pack('>HHHHHHHBB', 0x013A, 0, 0x0800, 0x7FFF, 0x0100, 0, 0, 1, 1))
+            + tns_packet(tns.DATA, b"\0\0" + text))
+
+def redirect(address):
+    text = address.encode()
+    return tns_packet(tns.REDIRECT, struct.pack('>H', len(text)) + text)
+
+# kind -> (share of listeners, reply, expected detail fields)
+TNS_KINDS = {
+    'refuse':   (0.50, nv_refuse(318767104, 1189), {'service': 'oracle-tns', 'packet': 'REFUSE',
+                                                     'version': '19.0.0.0.0', 'err': 1189, 'tls': False}),
+    'accept':   (0.10, accept_with_banner("TNSLSNR for Linux: Version 11.2.0.4.0 - Production"),
+                 {'service': 'oracle-tns', 'packet': 'ACCEPT', 'version': '11.2.0.4.0', 'tls': False}),
+    'redirect': (0.05, redirect("(ADDRESS=(PROTOCOL=tcp)(HOST=10.0.0.9)(PORT=1522))"),
+                 {'service': 'oracle-tns', 'packet': 'REDIRECT', 'redirect': '10.0.0.9:1522'}),
+    'resend':   (0.05, nv_refuse(0x0C200100, 12514), {'service': 'oracle-tns', 'packet': 'REFUSE',
+                                                      'version': '12.2.0.1.0', 'err': 12514}),
+    'tcps':     (0.15, nv_refuse(318767104, 1189), {'service': 'oracle-tns', 'packet': 'REFUSE',
+                                                     'version': '19.0.0.0.0', 'tls': True}),
+    'mtls':     (0.05, b"", {'service': 'tls', 'tls': True}),
+    'other':    (0.10, b"SSH-2.0-OpenSSH_8.0\r\n", None),
+}
+
+# more services for the banner stage: kind -> (share, expected service, probe that gets it)
+BANNER_KINDS = {
+    'refuse': (0.30, 'oracle-tns', 'tns'),
+    'tcps':   (0.10, 'tls', 'tls'),
+    'other':  (0.15, 'ssh', 'greeting'),
+    'smtp':   (0.10, 'smtp', 'greeting'),
+    'http':   (0.20, 'http', 'newline'),
+    'mysql':  (0.05, 'mysql', 'greeting'),
+    'silent': (0.10, None, None),
+}
+SMTP_GREETING = b"220 mail.example.com ESMTP Postfix\r\n"
+MYSQL_GREETING = b"\x4a\x00\x00\x00\x0a8.0.36\x00" + b"\x00" * 60
+HTTP_REPLY = b"HTTP/1.1 400 Bad Request\r\nServer: Oracle-HTTP-Server\r\nContent-Length: 0\r\n\r\n"
+
+async def fake_service(kind, reader, writer):
+    try:
+        if kind in ('smtp', 'mysql'):
+            # speak first, then wait for the client to give up
+            writer.write(SMTP_GREETING if kind == 'smtp' else MYSQL_GREETING)
+            await reader.read()
+            return
+        if kind == 'http':
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(HTTP_REPLY)
+            await writer.drain()
+            return
+        if kind == 'silent':
+            await reader.read()
+            return
+        reply = TNS_KINDS[kind][1]
+        if kind != 'other':
+            for _ in range(2 if kind == 'resend' else 1):
+                hdr = await reader.readexactly(8)
+                await reader.readexactly(struct.unpack('>H', hdr[:2])[0] - 8)
+                if kind == 'resend' and _ == 0:
+                    writer.write(tns_packet(tns.RESEND, b""))
+        writer.write(reply)
+        await writer.drain()
+    except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        pass
+    finally:
+        writer.close()
+
+def serve_fake(listeners, certfile, ready):
+    """One asyncio server per (addr, port, kind) until killed."""
+    async def main():
+        tls = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        tls.load_cert_chain(certfile)
+        mtls = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        mtls.load_cert_chain(certfile)
+        mtls.load_verify_locations(certfile)
+        mtls.verify_mode = ssl.CERT_REQUIRED
+        contexts = {'tcps': tls, 'mtls': mtls}
+        for addr, port, kind in listeners:
+            await asyncio.start_server(lambda r, w, kind=kind: fake_service(kind, r, w), addr, port,
+                                       ssl=contexts.get(kind), backlog=1024, reuse_address=True)
+        ready.set()
+        await asyncio.Event().wait()
+    asyncio.run(main())
+
+def self_signed_cert(directory):
+    path = os.path.join(directory, 'listener.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-subj', '/CN=fake-listener', '-keyout', path, '-out', path],
+                   check=True, capture_output=True)
+    return path
+
+def start_fake_network(hosts, ports, certfile, kinds, seed=0):
+    """One service on a random port of every host, of a kind drawn by the
+    shares in kinds; returns (process, {(host, port): kind})."""
+    rnd = random.Random(seed)
+    weights = [kinds[k][0] for k in kinds]
+    kinds = list(kinds)
+    layout = {(h, rnd.choice(ports)): rnd.choices(kinds, weights)[0] for h in hosts}
+    ready = multiprocessing.Event()
+    proc = multiprocessing.Process(target=serve_fake, daemon=True,
+                                   args=(sorted((h, p, k) for (h, p), k in layout.items()), certfile, ready))
+    proc.start()
+    if not ready.wait(120):
+        sys.exit("listener process did not start")
+    return proc, layout
+
+
+# ------------------------
+# Fake nmap
+# ------------------------
+# the inventory's services, as nmap -sV would name them
+NMAP_SERVICES = {
+    22:   {'service': 'ssh', 'product': 'OpenSSH', 'version': '8.0', 'tunnel': None},
+    1521: {'service': 'oracle-tns', 'product': 'Oracle TNS listener', 'version': '19.0.0.0.0', 'tunnel': None},
+    1522: {'service': 'oracle-tns', 'product': 'Oracle TNS listener', 'version': '12.2.0.1.0', 'tunnel': None},
+    1523: {'service': 'oracle-tns', 'product': 'Oracle TNS listener', 'version': '19.0.0.0.0', 'tunnel': None},
+    2484: {'service': 'oracle-tns', 'product': 'Oracle TNS listener', 'version': '19.0.0.0.0', 'tunnel': 'ssl'},
+}
+FAKE_NMAP_STARTUP = 0.25      # seconds per nmap process
+FAKE_NMAP_GROUP = {False: (64, 0.05), True: (16, 0.5)}   # -sV?: (hosts per group, seconds per group)
+
+def fake_nmap_open(host, generation, change):
+    """Open ports of host in run `generation`: from generation 1 on, a share
+    `change` of hosts has one port flipped."""
+    rnd = random.Random(host)
+    ports = {p for p in NMAP_SERVICES if rnd.random() < 0.35}
+    if generation and random.Random(f"{host}/{generation}").random() < change:
+        ports ^= {random.Random(f"{host}/{generation}/port").choice(sorted(NMAP_SERVICES))}
+    return sorted(ports)
+
+def fake_nmap(argv):
+    """Stand-in for nmap: -iL, -p, -sV and --open as nmap takes them, XML on
+    stdout one host group at a time; FAKE_NMAP_GEN / FAKE_NMAP_CHANGE pick the
+    layout, and each run is logged to FAKE_NMAP_LOG."""
+    from xml.sax.saxutils import quoteattr
+    opt = lambda name: argv[argv.index(name) + 1]
+    with open(opt('-iL')) as fh:
+        hosts = [line.strip() for line in fh if line.strip()]
+    wanted = set(parse_ports(opt('-p')))
+    version = '-sV' in argv
+    generation, change = int(os.environ.get('FAKE_NMAP_GEN', '0')), float(os.environ.get('FAKE_NMAP_CHANGE', '0'))
+    with open(os.environ['FAKE_NMAP_LOG'], 'a') as log:
+        log.write(f"{'version' if version else 'discovery'} {','.join(hosts)}\n")
+    time.sleep(FAKE_NMAP_STARTUP)
+    out = sys.stdout
+    out.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<nmaprun scanner="nmap" args={quoteattr(" ".join(argv))} '
+              f'version="7.94" xmloutputversion="1.05">\n')
+    out.flush()
+    size, seconds = FAKE_NMAP_GROUP[version]
+    for i in range(0, len(hosts), size):
+        time.sleep(seconds)
+        for host in hosts[i:i + size]:
+            out.write(f'<host><status state="up" reason="syn-ack"/><address addr="{host}" addrtype="ipv4"/>'
+                      f'<hostnames/><ports>')
+            for port in fake_nmap_open(host, generation, change):
+                if port not in wanted:
+                    continue
+                svc = NMAP_SERVICES[port]
+                attrs = f'name="{svc["service"]}" method="table" conf="3"'
+                if version:
+                    attrs = (f'name="{svc["service"]}" product="{svc["product"]}" version="{svc["version"]}"'
+                             + (f' tunnel="{svc["tunnel"]}"' if svc['tunnel'] else '') + ' method="probed" conf="10"')
+                out.write(f'<port protocol="tcp" portid="{port}"><state state="open" reason="syn-ack"/>'
+                          f'<service {attrs}/></port>')
+            out.write('</ports><times srtt="150" rttvar="50" to="100000"/></host>\n')
+        out.flush()
+    out.write(f'<runstats><hosts up="{len(hosts)}" down="0" total="{len(hosts)}"/></runstats></nmaprun>\n')
+    return 0
+
+# ------------------------
+# Fake SSH fleet
+# ------------------------
+SSH_PORT = 20022
+SSH_PASSWORD = 'bench'
+# seconds each command takes on a fake host: lsnrctl status is the slow one
+FAKE_SSH_DELAYS = {'ss': 0.05, 'lsnrctl': 0.5, 'oratab': 0.01}
+
+def fake_sid(host):
+    return "DB" + host.split('.', 2)[2].replace('.', '_')
+
+def fake_ssh_output(host, name):
+    sid = fake_sid(host)
+    if name == 'ss':
+        return ("State  Recv-Q Send-Q Local Address:Port Peer Address:Port Process\n"
+                'LISTEN 0      128          0.0.0.0:22        0.0.0.0:*     users:(("sshd",pid=900,fd=3))\n'
+                'LISTEN 0      511                *:1521            *:*     users:(("tnslsnr",pid=4242,fd=8))\n')
+    if name == 'lsnrctl':
+        return ("STATUS of the LISTENER\n------------------------\n"
+                "Alias                     LISTENER\n"
+                "Version                   TNSLSNR for Linux: Version 19.0.0.0.0 - Production\n"
+                "Listening Endpoints Summary...\n"
+                f"  (DESCRIPTION=(ADDRESS=(PROTOCOL=tcp)(HOST={host})(PORT=1521)))\n"
+                "Services Summary...\n"
+                f'Service "{sid}" has 1 instance(s).\n'
+                f'  Instance "{sid}", status READY, has 1 handler(s) for this service...\n'
+                "The command completed successfully\n")
+    return f"# oratab\n{sid}:/u01/app/oracle/product/19.0.0/dbhome_1:Y\n"
+
+def serve_ssh(hosts, deny, ready):
+    """A paramiko SSH server on SSH_PORT of every host, answering ss, lsnrctl
+    status and cat /etc/oratab after FAKE_SSH_DELAYS, until killed; password
+    logins to the hosts in deny fail."""
+    import paramiko, threading
+    logging.getLogger('paramiko').setLevel(logging.CRITICAL)    # clients hanging up are no news
+    key = paramiko.RSAKey.generate(2048)
+
+    def run_command(chan, host, command):
+        name = ('ss' if command.startswith('ss') else 'lsnrctl' if 'lsnrctl' in command
+                else 'oratab' if 'oratab' in command else None)
+        # exit status and EOF, but the client closes: paramiko answers the exec
+        # request only after this thread has started, and a close before that
+        # answer fails the client's exec_command
+        try:
+            time.sleep(FAKE_SSH_DELAYS.get(name, 0))
+            if name:
+                chan.sendall(fake_ssh_output(host, name).encode())
+                chan.send_exit_status(0)
+            else:
+                chan.sendall_stderr(b"sh: command not found\n")
+                chan.send_exit_status(127)
+            chan.shutdown_write()
+        except (OSError, EOFError, paramiko.SSHException):
+            pass        # the client has gone
+
+    class Stub(paramiko.ServerInterface):
+        def __init__(self, host):
+            self.host = host
+
+        def get_allowed_auths(self, username):
+            return 'password'
+
+        def check_auth_password(self, username, password):
+            ok = password == SSH_PASSWORD and self.host not in deny
+            return paramiko.AUTH_SUCCESSFUL if ok else paramiko.AUTH_FAILED
+
+        def check_channel_request(self, kind, chanid):
+            if kind == 'session':
+                return paramiko.OPEN_SUCCEEDED
+            return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+        def check_channel_exec_request(self, channel, command):
+            threading.Thread(target=run_command, args=(channel, self.host, command.decode()), daemon=True).start()
+            return True
+
+    sel = selectors.DefaultSelector()
+    for host in hosts:
+        s = socket.socket()
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind((host, SSH_PORT))
+        s.listen(1024)
+        s.setblocking(False)
+        sel.register(s, selectors.EVENT_READ, host)
+    ready.set()
+    while True:
+        for key_, _ in sel.select():
+            try:
+                while True:
+                    conn, _ = key_.fileobj.accept()
+                    conn.setblocking(True)
+                    t = paramiko.Transport(conn)
+                    t.add_server_key(key)
+                    t.start_server(event=threading.Event(), server=Stub(key_.data))
+            except (BlockingIOError, ConnectionError):
+                pass
+
+def start_fake_fleet(hosts, deny):
+    ready = multiprocessing.Event()
+    proc = multiprocessing.Process(target=serve_ssh, args=(hosts, set(deny), ready), daemon=True)
+    proc.start()
+    if not ready.wait(60):
+        sys.exit("ssh server process did not start")
+    return proc
+
+# ------------------------
+# Benchmarks
+# ------------------------
+def sequential_scan(pairs, timeout=1.0):
+    """The old stuf/soc.py loop: one blocking connect_ex at a time."""
+    found = set()
+    for host, port in pairs:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            if sock.connect_ex((host, port)) == 0:
+                found.add((host, port))
+    return found
+
+
+def bench_portscan(args):
+    hosts = loopback_hosts(args.hosts)
+    ports = list(range(BASE_PORT, BASE_PORT + args.ports))
+    proc, open_set, filtered_set = start_network(hosts, ports, args.open_ratio, args.filtered_ratio)
+    total = len(hosts) * len(ports)
+    print(f"{len(hosts)} hosts x {len(ports)} ports = {total} probes, {len(open_set)} open, "
+          f"{len(filtered_set)} filtered, timeout {args.timeout:g}s")
+    failures = 0
+    try:
+        rnd = random.Random(1)
+        sample = [(rnd.choice(hosts), rnd.choice(ports)) for _ in range(args.baseline)]
+        t0 = time.perf_counter()
+        found = sequential_scan(sample, args.timeout)
+        seq_rate = len(sample) / (time.perf_counter() - t0)
+        ok = found == {pr for pr in sample if pr in open_set}
+        failures += not ok
+        print(f"  sequential connect_ex     {seq_rate:9.0f} probes/s  (sample of {len(sample)}, "
+              f"whole sweep ~{total / seq_rate:.0f}s){'' if ok else '  WRONG'}")
+
+        for concurrency in [int(c) for c in args.concurrency.split(',')]:
+            async def run():
+                scanner = PortScanner(concurrency=concurrency, per_host=args.per_host,
+                                      timeout=args.timeout, states={'open'})
+                first = None
+                got = set()
+                async for r in scanner.scan(parse_targets(hosts), ports):
+                    if first is None:
+                        first = scanner_clock() - t0
+                    got.add((r.host, r.port))
+                return scanner, got, first
+            scanner_clock = time.perf_counter
+            t0 = scanner_clock()
+            scanner, got, first = asyncio.run(run())
+            wall = time.perf_counter() - t0
+            st = scanner.stats
+            ok = (got == open_set and st['probes'] == total and st['filtered'] == len(filtered_set)
+                  and st['open'] + st['closed'] + st['filtered'] == total)
+            failures += not ok
+            print(f"  asyncio --concurrency {concurrency:<5d}{total / wall:9.0f} probes/s  {wall:6.2f}s  "
+                  f"speedup {total / wall / seq_rate:6.1f}x  first result after {1000 * (first or 0):.0f} ms  "
+                  f"open {len(got)}/{len(open_set)}  filtered {st['filtered']}/{len(filtered_set)}"
+                  f"{'' if ok else '  WRONG'}")
+    finally:
+        proc.kill()
+        proc.join()
+    return 1 if failures else 0
+
+
+OLD_TNS_PROBE = (b"\x00\x3a\x00\x00\x01\x00\x00\x00\x01\x00\x00\x00\x01\x35\x00\x00\x0c\x01\x2c\x00\x00"
+                 b"\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00")
+
+def sequential_tns(host, ports):
+    """The old stuf/tns.py loop: one blocking probe per port, first hit wins."""
+    for port in ports:
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.settimeout(2)
+                sock.connect((host, port))
+                sock.sendall(OLD_TNS_PROBE)
+                response = sock.recv(1024)
+                if b"ERROR" in response and b"Oracle" in response:
+                    return port
+        except Exception:
+            pass
+    return None
+
+def bench_tns(args):
+    hosts = loopback_hosts(args.hosts)
+    ports = list(range(BASE_PORT, BASE_PORT + args.ports))
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        proc, layout = start_fake_network(hosts, ports, self_signed_cert(tmp), TNS_KINDS)
+        try:
+            tally = {}
+            for kind in layout.values():
+                tally[kind] = tally.get(kind, 0) + 1
+            print(f"{len(hosts)} hosts x {len(ports)} ports, one listener each: "
+                  + ", ".join(f"{k} {tally.get(k, 0)}" for k in TNS_KINDS))
+
+            sample = hosts[:args.baseline]
+            t0 = time.perf_counter()
+            hits = sum(sequential_tns(h, ports) is not None for h in sample)
+            seq_rate = len(sample) / (time.perf_counter() - t0)
+            print(f"  old stuf/tns.py loop      {seq_rate:9.1f} hosts/s  (sample of {len(sample)}, "
+                  f"{hits} listeners recognised)")
+
+            for concurrency in [int(c) for c in args.concurrency.split(',')]:
+                async def run():
+                    scanner = TnsScanner(concurrency=concurrency, per_host=args.per_host,
+                                         reply_timeout=args.reply_timeout, states={'open'})
+                    return scanner, [r async for r in scanner.scan(parse_targets(hosts), ports)]
+                t0 = time.perf_counter()
+                scanner, results = asyncio.run(run())
+                wall = time.perf_counter() - t0
+                wrong = []
+                got = {(r.host, r.port): r.detail for r in results}
+                if set(got) != set(layout):
+                    wrong.append(f"open ports {len(got)} != {len(layout)}")
+                for pair, kind in layout.items():
+                    want, d = TNS_KINDS[kind][2], got.get(pair)
+                    if (want is None) != (d is None) or (
+                            want and any(d.get(k) != v for k, v in want.items())):
+                        wrong.append(f"{pair[0]}:{pair[1]} {kind}: {d}")
+                failures += bool(wrong)
+                st = scanner.stats
+                print(f"  asyncio --concurrency {concurrency:<5d}{len(hosts) / wall:9.1f} hosts/s  {wall:6.2f}s  "
+                      f"speedup {len(hosts) / wall / seq_rate:6.1f}x  TNS {st['oracle-tns']}, "
+                      f"TLS-only {st['tls']}, TLS retries {st['tls_attempts']}"
+                      f"{'' if not wrong else '  WRONG: ' + '; '.join(wrong[:3])}")
+        finally:
+            proc.kill()
+            proc.join()
+    return 1 if failures else 0
+
+
+def old_banner_grab(host, port):
+    """The old stuf/ban.py banner_grab."""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.settimeout(2)
+            sock.connect((host, port))
+            sock.sendall(b'\n')
+            return sock.recv(1024).decode('utf-8', errors='ignore')
+    except Exception:
+        return None
+
+def check_banners(results, layout):
+    """Mismatches between banner Results and the fake services' layout."""
+    wrong = []
+    got = {}
+    for r in results:
+        if (r.host, r.port) in got:
+            wrong.append(f"{r.host}:{r.port} twice")
+        got[(r.host, r.port)] = r.detail
+    if set(got) != set(layout):
+        wrong.append(f"open ports {len(got)} != {len(layout)}")
+    for pair, kind in layout.items():
+        _, service, trigger = BANNER_KINDS[kind]
+        d = got.get(pair)
+        if (d is None) != (service is None) or (
+                d is not None and (d['service'], d['trigger']) != (service, trigger)):
+            wrong.append(f"{pair[0]}:{pair[1]} {kind}: {d}")
+    return wrong
+
+def bench_banner(args):
+    hosts = loopback_hosts(args.hosts)
+    ports = list(range(BASE_PORT, BASE_PORT + args.ports))
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        proc, layout = start_fake_network(hosts, ports, self_signed_cert(tmp), BANNER_KINDS)
+        try:
+            tally = {}
+            for kind in layout.values():
+                tally[kind] = tally.get(kind, 0) + 1
+            print(f"{len(hosts)} hosts x {len(ports)} ports, one service each: "
+                  + ", ".join(f"{k} {tally.get(k, 0)}" for k in BANNER_KINDS))
+
+            sample = hosts[:args.baseline]
+            t0 = time.perf_counter()
+            for h in sample:
+                for port in ports:
+                    old_banner_grab(h, port)
+            seq_rate = len(sample) / (time.perf_counter() - t0)
+            print(f"  old stuf/ban.py loop      {seq_rate:9.1f} hosts/s  (sample of {len(sample)})")
+
+            for concurrency in [int(c) for c in args.concurrency.split(',')]:
+                async def run():
+                    scanner = BannerScanner(concurrency=concurrency, per_host=args.per_host,
+                                            probe_timeout=args.probe_timeout, states={'open'})
+                    return scanner, [r async for r in scanner.scan(parse_targets(hosts), ports)]
+                t0 = time.perf_counter()
+                scanner, results = asyncio.run(run())
+                wall = time.perf_counter() - t0
+                wrong = check_banners(results, layout)
+                failures += bool(wrong)
+                print(f"  asyncio --concurrency {concurrency:<5d}{len(hosts) / wall:9.1f} hosts/s  {wall:6.2f}s  "
+                      f"speedup {len(hosts) / wall / seq_rate:6.1f}x  banners {len(results) - scanner.stats['no banner']}"
+                      f"/{len(results)}{'' if not wrong else '  WRONG: ' + '; '.join(wrong[:3])}")
+
+            # as a pipeline stage: a port scan, every host listed twice, feeds the banner stage
+            async def pipeline():
+                ports_scan = PortScanner(concurrency=1000, per_host=args.per_host, states={'open'})
+                stage = BannerScanner(concurrency=1000, per_host=args.per_host,
+                                      probe_timeout=args.probe_timeout)
+                return [r async for r in stage.stage(ports_scan.scan(parse_targets(hosts + hosts), ports))]
+            t0 = time.perf_counter()
+            results = asyncio.run(pipeline())
+            wall = time.perf_counter() - t0
+            wrong = check_banners(results, layout)
+            failures += bool(wrong)
+            print(f"  port scan -> banner stage {len(hosts) / wall:9.1f} hosts/s  {wall:6.2f}s  "
+                  f"(targets listed twice, {len(results)} Results){'' if not wrong else '  WRONG: ' + '; '.join(wrong[:3])}")
+        finally:
+            proc.kill()
+            proc.join()
+    return 1 if failures else 0
+
+
+def bench_nmap(args):
+    hosts = loopback_hosts(args.hosts)
+    ports = sorted(NMAP_SERVICES)
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        nmap = os.path.join(tmp, 'nmap')
+        with open(nmap, 'w') as fh:
+            fh.write(f"#!/bin/sh\nexec {sys.executable} {os.path.abspath(__file__)} _fake_nmap \"$@\"\n")
+        os.chmod(nmap, 0o755)
+        log = os.path.join(tmp, 'nmap.log')
+        env = {'FAKE_NMAP_LOG': log, 'FAKE_NMAP_CHANGE': str(args.change)}
+        os.environ.update(env)
+        print(f"{len(hosts)} hosts x {len(ports)} ports; fake nmap: {FAKE_NMAP_STARTUP}s per process, "
+              f"{FAKE_NMAP_GROUP[False][1]}s per {FAKE_NMAP_GROUP[False][0]} hosts, "
+              f"-sV {FAKE_NMAP_GROUP[True][1]}s per {FAKE_NMAP_GROUP[True][0]} hosts")
+
+        # the old scan1.py: one nmap -sV per host, one host after another
+        os.environ['FAKE_NMAP_GEN'] = '0'
+        sample = hosts[:args.baseline]
+        t0 = time.perf_counter()
+        for h in sample:
+            nmap_scan(h, ",".join(map(str, ports)), nmap=nmap)
+        seq_rate = len(sample) / (time.perf_counter() - t0)
+        print(f"  one nmap -sV per host     {seq_rate:9.1f} hosts/s  (sample of {len(sample)}, "
+              f"whole inventory ~{len(hosts) / seq_rate:.0f}s)")
+
+        state = os.path.join(tmp, 'nmap_state.json')
+        previous = None
+        for run, generation in (('first run', 0), ('unchanged', 0), (f'{args.change:.0%} changed', 1)):
+            os.environ['FAKE_NMAP_GEN'] = str(generation)
+            open(log, 'w').close()
+            sweep = NmapSweep(ports, batch_size=args.batch_size, parallel=args.parallel, nmap=nmap,
+                              state_path=state)
+
+            async def collect():
+                first = None
+                out = []
+                async for r in sweep.scan(parse_targets(hosts)):
+                    if first is None:
+                        first = time.perf_counter() - t0
+                    out.append(r)
+                return out, first
+            t0 = time.perf_counter()
+            results, first = asyncio.run(collect())
+            wall = time.perf_counter() - t0
+
+            layout = {h: fake_nmap_open(h, generation, args.change) for h in hosts}
+            expect = {(h, p, NMAP_SERVICES[p]['version'], NMAP_SERVICES[p]['tunnel'] == 'ssl')
+                      for h, ps in layout.items() for p in ps}
+            got = {(r.host, r.port, r.detail['version'], r.detail['encrypted']) for r in results}
+            should_rescan = {h for h, ps in layout.items() if ps and (previous is None or previous[h] != ps)}
+            with open(log) as fh:
+                rescanned = {h for line in fh if line.startswith('version ')
+                             for h in line.split()[1].split(',')}
+            cached = sum(bool(r.detail.get('cached')) for r in results)
+            wrong = []
+            if got != expect:
+                wrong.append(f"{len(got ^ expect)} services differ")
+            if rescanned != should_rescan:
+                wrong.append(f"-sV on {len(rescanned)} hosts, expected {len(should_rescan)}")
+            if sweep.errors:
+                wrong.append(sweep.errors[0])
+            failures += bool(wrong)
+            print(f"  {run:<24s}{len(hosts) / wall:9.1f} hosts/s  {wall:6.2f}s  speedup {len(hosts) / wall / seq_rate:6.1f}x  "
+                  f"first result after {first or 0:.2f}s  -sV on {len(rescanned)} hosts, {cached} ports from state, "
+                  f"{sweep.stats['nmap_runs']} nmap runs{'' if not wrong else '  WRONG: ' + '; '.join(wrong)}")
+            previous = layout
+        for k in env:
+            os.environ.pop(k, None)
+    return 1 if failures else 0
+
+
+def bench_engine(args):
+    hosts = loopback_hosts(args.hosts)
+    ports = list(range(BASE_PORT, BASE_PORT + args.ports))
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        proc, layout = start_fake_network(hosts, ports, self_signed_cert(tmp), BANNER_KINDS)
+        try:
+            print(f"{len(hosts)} hosts x {len(ports)} ports, {len(layout)} services")
+
+            # the three sweeps one after another, as separate scripts would run them
+            async def one_by_one():
+                found = []
+                for cls, extra in ((PortScanner, {}), (TnsScanner, {'reply_timeout': args.reply_timeout}),
+                                   (BannerScanner, {'probe_timeout': args.reply_timeout})):
+                    scanner = cls(concurrency=args.concurrency, per_host=args.per_host, states={'open'}, **extra)
+                    found += [r async for r in scanner.scan(parse_targets(hosts), ports)]
+                return found
+            t0 = time.perf_counter()
+            asyncio.run(one_by_one())
+            seq_wall = time.perf_counter() - t0
+            print(f"  tcp, tns, banner sweeps one after another  {seq_wall:6.2f}s")
+
+            async def run():
+                engine = Engine([TcpProbe(), TnsProbe(reply_timeout=args.reply_timeout),
+                                 BannerProbe(probe_timeout=args.reply_timeout), SsProbe()],
+                                concurrency=args.concurrency, per_host=args.per_host, states={'open'})
+                return engine, [r async for r in engine.run(parse_targets(hosts), ports)]
+            t0 = time.perf_counter()
+            engine, results = asyncio.run(run())
+            wall = time.perf_counter() - t0
+            by_probe = {}
+            for r in results:
+                by_probe.setdefault(r.probe, []).append(r)
+            wrong = []
+            if {(r.host, r.port) for r in by_probe.get('tcp', [])} != set(layout):
+                wrong.append(f"tcp: {len(by_probe.get('tcp', []))} open != {len(layout)}")
+            tns_found = {(r.host, r.port) for r in by_probe.get('tns', [])
+                         if r.detail and r.detail['service'] == 'oracle-tns'}
+            if tns_found != {pair for pair, kind in layout.items() if kind in ('refuse', 'tcps')}:
+                wrong.append(f"tns: {len(tns_found)} listeners")
+            wrong += check_banners(by_probe.get('banner', []), layout)
+            listening = {(r.addr, r.port) for r in by_probe.get('ss', [])}
+            if not set(layout) <= listening:
+                wrong.append(f"ss: {len(set(layout) - listening)} listeners missing")
+            failures += bool(wrong)
+            st = engine.stats
+            print(f"  one Engine run, all four probes            {wall:6.2f}s  speedup {seq_wall / wall:4.1f}x  "
+                  f"{len(hosts) / wall:.0f} hosts/s  "
+                  + ", ".join(f"{n} {st[n]}" for n in ('tcp', 'tns', 'banner', 'ss'))
+                  + ('' if not wrong else '  WRONG: ' + '; '.join(wrong[:3])))
+        finally:
+            proc.kill()
+            proc.join()
+    return 1 if failures else 0
+
+
+def old_sniff_remote_ports(host):
+    """The old stuf/remote.py: a new connection per host, one ss, closed."""
+    import paramiko
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        client.connect(host, port=SSH_PORT, username='oracle', password=SSH_PASSWORD,
+                       allow_agent=False, look_for_keys=False)
+        _, stdout, _ = client.exec_command("ss -lt")
+        return stdout.read().decode()
+    finally:
+        client.close()
+
+def check_fleet(records, hosts, deny):
+    wrong = []
+    got = {}
+    for rec in records:
+        got[rec['host']] = host_info(rec)
+    if set(got) != set(hosts):
+        wrong.append(f"{len(got)} hosts reported of {len(hosts)}")
+    for host, info in got.items():
+        sid = fake_sid(host)
+        if host in deny:
+            if not info['error']:
+                wrong.append(f"{host}: denied login reported no error")
+        elif (info['error'] or info['errors'] or {l['port'] for l in info['listeners']} != {22, 1521}
+              or info['lsnrctl']['alias'] != 'LISTENER' or info['lsnrctl']['services'][0]['service'] != sid
+              or [e['sid'] for e in info['oratab']] != [sid]):
+            wrong.append(f"{host}: {info}")
+    return wrong
+
+def bench_ssh(args):
+    hosts = loopback_hosts(args.hosts)
+    rnd = random.Random(0)
+    deny = set(rnd.sample(hosts, int(len(hosts) * args.deny_ratio)))
+    failures = 0
+    logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+    proc = start_fake_fleet(hosts, deny)
+    try:
+        print(f"{len(hosts)} fake SSH hosts ({len(deny)} refusing the login), commands taking "
+              + ", ".join(f"{n} {d}s" for n, d in FAKE_SSH_DELAYS.items()))
+        sample = [h for h in hosts if h not in deny][:args.baseline]
+        t0 = time.perf_counter()
+        for h in sample:
+            old_sniff_remote_ports(h)
+        seq_rate = len(sample) / (time.perf_counter() - t0)
+        print(f"  old stuf/remote.py loop (ss only)   {seq_rate:7.1f} hosts/s  (sample of {len(sample)})")
+
+        with SshFleet(user='oracle', password=SSH_PASSWORD, port=SSH_PORT, concurrency=args.concurrency,
+                      max_connections=args.keep) as fleet:
+            for label in ("fleet, first sweep", "fleet, second sweep"):
+                before = dict(fleet.stats)
+                t0 = time.perf_counter()
+                records = list(fleet.sweep(hosts))
+                wall = time.perf_counter() - t0
+                wrong = check_fleet(records, hosts, deny)
+                failures += bool(wrong)
+                st = fleet.stats
+                print(f"  {label:<24} --concurrency {args.concurrency:<4d}{len(hosts) / wall:7.1f} hosts/s  "
+                      f"{wall:6.2f}s  speedup {len(hosts) / wall / seq_rate:6.1f}x  "
+                      f"connects {st['connects'] - before.get('connects', 0)}, "
+                      f"reused {st['reused'] - before.get('reused', 0)}, failed {st['failed'] - before.get('failed', 0)}"
+                      + ('' if not wrong else '  WRONG: ' + '; '.join(wrong[:3])))
+
+            # the same fleet behind the engine's ssh probe
+            async def run():
+                engine = Engine([SshProbe(fleet=fleet)])
+                return engine, [r async for r in engine.run(parse_targets(hosts), [1521])]
+            t0 = time.perf_counter()
+            engine, results = asyncio.run(run())
+            wall = time.perf_counter() - t0
+            tns_found = {r.host for r in results if r.port == 1521 and r.detail.get('listener') == 'LISTENER'}
+            errors = {r.host for r in results if r.state == 'error'}
+            wrong = tns_found != set(hosts) - deny or errors != deny
+            failures += wrong
+            print(f"  engine --probes ssh                 {len(hosts) / wall:7.1f} hosts/s  {wall:6.2f}s  "
+                  f"listeners {len(tns_found)}, errors {len(errors)}{'  WRONG' if wrong else ''}")
+    finally:
+        proc.kill()
+        proc.join()
+    return 1 if failures else 0
+
+
+def main():
+    if sys.argv[1:2] == ['_fake_nmap']:
+        return fake_nmap(sys.argv[2:])
+    p = argparse.ArgumentParser(description="Loopback benchmarks for the scanengine package.")
+    sub = p.add_subparsers(dest='bench', required=True)
+    ps = sub.add_parser('portscan', help="probes/sec of the asyncio port scanner")
+    ps.add_argument('--hosts', type=int, default=2000, help="loopback addresses")
+    ps.add_argument('--ports', type=int, default=10, help=f"ports per host, from {BASE_PORT}")
+    ps.add_argument('--open-ratio', type=float, default=0.1, help="share of host:port pairs listening")
+    ps.add_argument('--filtered-ratio', type=float, default=0.01, help="share of host:port pairs dropping SYNs")
+    ps.add_argument('--timeout', type=float, default=1.0, help="connect timeout, as in stuf/soc.py")
+    ps.add_argument('--concurrency', default='100,500,2000', help="comma-separated --concurrency values")
+    ps.add_argument('--per-host', type=int, default=16)
+    ps.add_argument('--baseline', type=int, default=500, help="probes for the sequential baseline")
+    ts = sub.add_parser('tns', help="hosts/sec of the TNS fingerprinting sweep")
+    ts.add_argument('--hosts', type=int, default=2000, help="loopback addresses, one listener each")
+    ts.add_argument('--ports', type=int, default=10, help=f"ports per host, from {BASE_PORT}")
+    ts.add_argument('--concurrency', default='100,500,2000', help="comma-separated --concurrency values")
+    ts.add_argument('--per-host', type=int, default=16)
+    ts.add_argument('--reply-timeout', type=float, default=2.0)
+    ts.add_argument('--baseline', type=int, default=20, help="hosts for the old sequential loop")
+    bs = sub.add_parser('banner', help="hosts/sec of the banner stage")
+    bs.add_argument('--hosts', type=int, default=2000, help="loopback addresses, one service each")
+    bs.add_argument('--ports', type=int, default=10, help=f"ports per host, from {BASE_PORT}")
+    bs.add_argument('--concurrency', default='100,500,2000', help="comma-separated --concurrency values")
+    bs.add_argument('--per-host', type=int, default=16)
+    bs.add_argument('--probe-timeout', type=float, default=1.0)
+    bs.add_argument('--baseline', type=int, default=10, help="hosts for the old sequential loop")
+    ns = sub.add_parser('nmap', help="the batched nmap sweep, against a fake nmap")
+    ns.add_argument('--hosts', type=int, default=2000, help="inventory size")
+    ns.add_argument('--batch-size', type=int, default=256, help="hosts per nmap process")
+    ns.add_argument('--parallel', type=int, default=4, help="nmap processes at once")
+    ns.add_argument('--change', type=float, default=0.05, help="share of hosts whose open ports change")
+    ns.add_argument('--baseline', type=int, default=5, help="hosts for the one-nmap-per-host baseline")
+    es = sub.add_parser('engine', help="tcp, tns, banner and ss probes in one Engine run")
+    es.add_argument('--hosts', type=int, default=2000, help="loopback addresses, one service each")
+    es.add_argument('--ports', type=int, default=10, help=f"ports per host, from {BASE_PORT}")
+    es.add_argument('--concurrency', type=int, default=1000)
+    es.add_argument('--per-host', type=int, default=16)
+    es.add_argument('--reply-timeout', type=float, default=1.0)
+    hs = sub.add_parser('ssh', help="hosts/sec of the SSH fleet, against a paramiko server stub")
+    hs.add_argument('--hosts', type=int, default=2000, help="fake SSH servers on loopback")
+    hs.add_argument('--concurrency', type=int, default=64, help="hosts in flight")
+    hs.add_argument('--keep', type=int, default=256, help="connections the fleet keeps open")
+    hs.add_argument('--deny-ratio', type=float, default=0.01, help="share of hosts refusing the login")
+    hs.add_argument('--baseline', type=int, default=20, help="hosts for the old remote.py loop")
+    args = p.parse_args()
+    fd_budget()     # the fake servers and the scanners share one open-files limit
+    return {'portscan': bench_portscan, 'tns': bench_tns, 'banner': bench_banner,
+            'nmap': bench_nmap, 'engine': bench_engine, 'ssh': bench_ssh}[args.bench](args)
+
+if __name__ == '__main__':
+    sys.exit(main())
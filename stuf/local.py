@@ -1,5 +1,6 @@
 import subprocess
-import re
+
+from scanengine import parse_lsnrctl
 
 def get_listening_ports():
     print("Listening Ports and Processes:")
@@ -10,10 +11,9 @@ def get_listening_ports():
 def get_oracle_services():
     print("\nOracle Listener Services:")
     result = subprocess.run(['lsnrctl', 'status'], capture_output=True, text=True)
-    services = re.findall(r'Service\s+"(.+?)".*?Instance\s+"(.+?)"', result.stdout)
-    for service, instance in services:
-        print(f"Service: {service}, Instance: {instance}")
+    for s in parse_lsnrctl(result.stdout)['services']:
+        print(f"Service: {s['service']}, Instance: {s['instance']}")
 
 if __name__ == "__main__":
     get_listening_ports()
-    get_oracle_services()
\ No newline at end of file
+    get_oracle_services()
@@ -1,17 +1,17 @@
-import psutil
+from scanengine import psutil_listeners
+
 
 def sniff_listening_ports():
     listening_ports = []
-    for conn in psutil.net_connections(kind='inet'):
-        if conn.status == 'LISTEN':
-            proto = 'TCP'
-            if conn.laddr.port == 443:  # Example condition for TCPS
-                proto = 'TCPS'
-            listening_ports.append({
-                'protocol': proto,
-                'local_address': conn.laddr.ip,
-                'port': conn.laddr.port
-            })
+    for rec in psutil_listeners():
+        proto = 'TCP'
+        if rec['port'] == 443:  # Example condition for TCPS
+            proto = 'TCPS'
+        listening_ports.append({
+            'protocol': proto,
+            'local_address': rec['address'],
+            'port': rec['port']
+        })
 
     return listening_ports
 
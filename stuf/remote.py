@@ -1,9 +1,12 @@
-import paramiko
+import argparse, json, logging
+
+from scanengine import SshFleet, host_info, parse_targets, iter_hosts, count_hosts
+from scanengine.fleet import COMMANDS, SCAN_SSH_USER, SCAN_SSH_KEY, SCAN_SSH_CONCURRENCY
 
 
 def sniff_remote_ports(host, username, password=None, key_file=None):
     """
-    Connects to a remote server via SSH and retrieves listening TCP and TCPS ports.
+    Connects to a remote server via SSH and retrieves listening TCP ports.
 
     Args:
         host (str): Remote server IP or hostname.
@@ -14,59 +17,55 @@ def sniff_remote_ports(host, username, password=None, key_file=None):
     Returns:
         list: A list of dictionaries containing protocol, address, and port details.
     """
-    try:
-        # Initialize the SSH client
-        ssh_client = paramiko.SSHClient()
-        ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-        # Connect to the remote server
-        if key_file:
-            ssh_client.connect(host, username=username, key_filename=key_file)
-        else:
-            ssh_client.connect(host, username=username, password=password)
-
-        # Execute the command to list listening ports
-        command = "ss -lt"
-        stdin, stdout, stderr = ssh_client.exec_command(command)
-        output = stdout.read().decode()
-        error = stderr.read().decode()
-
-        if error:
-            raise Exception(f"Error executing command: {error}")
-
-        # Parse the output
-        listening_ports = []
-        lines = output.splitlines()
-        for line in lines[1:]:  # Skip the header
-            parts = line.split()
-            if len(parts) >= 5:
-                proto = parts[0]  # Protocol (e.g., tcp)
-                local_address = parts[3]  # Local address and port
-                address, port = local_address.rsplit(':', 1)
-                listening_ports.append({
-                    'protocol': proto.upper(),
-                    'local_address': address,
-                    'port': port
-                })
-
-        return listening_ports
-
-    except Exception as e:
-        print(f"Failed to sniff ports on {host}: {e}")
+    with SshFleet(user=username, password=password, key_file=key_file, concurrency=1,
+                  commands={'ss': 'ss -ltn'}) as fleet:
+        info = host_info(fleet.run(host))
+    error = info['error'] or info['errors'].get('ss')
+    if error:
+        print(f"Failed to sniff ports on {host}: {error}")
         return []
+    return [{'protocol': sock['proto'].upper(),
+             'local_address': sock['address'],
+             'port': sock['port']} for sock in info['listeners']]
+
 
-    finally:
-        ssh_client.close()
+def describe(info):
+    """One line for a host's fleet record."""
+    if info['error']:
+        return f"{info['host']}: FAILED {info['error']}"
+    line = f"{info['host']}: {len(info['listeners'])} listening ports"
+    lsnr = info['lsnrctl']
+    if lsnr and lsnr['alias']:
+        services = sorted({s['service'] for s in lsnr['services']})
+        line += f", {lsnr['alias']} {lsnr['version'] or '?'} services {','.join(services) or '-'}"
+    if info['oratab']:
+        line += f", oratab {','.join(e['sid'] for e in info['oratab'])}"
+    for name, err in sorted(info['errors'].items()):
+        line += f", {name}: {err}"
+    return line
 
 
 if __name__ == "__main__":
-    # Example usage
-    remote_host = "localhost"  # Replace with the remote server's IP or hostname
-    username = "your_username"
-    password = "your_password"  # Use None if using key-based authentication
-    key_file = None  # Provide the path to your SSH private key if applicable
+    p = argparse.ArgumentParser(description="Collect listening ports, listener status and oratab from many "
+                                            "hosts over SSH, several hosts at once.")
+    p.add_argument('targets', nargs='*', default=['localhost'], help="e.g. db01.example.com 10.0.0.0/24 @dbhosts.txt")
+    p.add_argument('--user', default=SCAN_SSH_USER, help="SSH user (default SCAN_SSH_USER or the local user); "
+                                                       "a password comes from SCAN_SSH_PASSWORD")
+    p.add_argument('--key', default=SCAN_SSH_KEY, help="private key file (default SCAN_SSH_KEY, agent, ~/.ssh)")
+    p.add_argument('--concurrency', type=int, default=SCAN_SSH_CONCURRENCY, help="hosts in flight")
+    p.add_argument('--commands', default=','.join(COMMANDS), help=f"comma-separated, from {','.join(COMMANDS)}")
+    p.add_argument('--json', action='store_true', help="one JSON object per host")
+    args = p.parse_args()
 
-    ports = sniff_remote_ports(remote_host, username, password, key_file)
-    print("Listening Ports on Remote Server:")
-    for port_info in ports:
-        print(f"Protocol: {port_info['protocol']}, Address: {port_info['local_address']}, Port: {port_info['port']}")
+    logging.getLogger('paramiko').setLevel(logging.CRITICAL)     # failures are in each host's record
+    commands = {n: COMMANDS[n] for n in args.commands.split(',') if n in COMMANDS}
+    targets = parse_targets(args.targets)
+    if not args.json:
+        print(f"Collecting from {count_hosts(targets)} hosts, {args.concurrency} at a time...", flush=True)
+    with SshFleet(user=args.user, key_file=args.key, concurrency=args.concurrency, commands=commands) as fleet:
+        for rec in fleet.sweep(iter_hosts(targets)):
+            info = host_info(rec)
+            print(json.dumps(dict(info, seconds=rec['seconds'])) if args.json else describe(info), flush=True)
+        st = fleet.stats
+    print(f"{st['hosts']} hosts in {st['seconds']:.2f}s ({st['hosts'] / max(st['seconds'], 1e-6):.1f}/s): "
+          f"{st['failed']} failed, {st['connects']} connections")
@@ -0,0 +1,77 @@
+import argparse, asyncio, json, logging, sys
+
+from scanengine import Engine, PROBES, parse_targets, parse_ports, count_hosts, as_dict, fd_budget
+
+# detail keys worth a place on a text line, in order
+BRIEF_KEYS = ('service', 'product', 'version', 'listener', 'process', 'pid', 'redirect', 'error')
+
+
+def brief(r):
+    """One text line for a Result."""
+    name = r.host if r.addr in (None, r.host) else f"{r.host} ({r.addr})"
+    line = f"{name}:{r.port if r.port is not None else '-'} {r.probe} {r.state}"
+    d = r.detail or {}
+    line += "".join(f" {k}={d[k]}" for k in BRIEF_KEYS if d.get(k) not in (None, ''))
+    if d.get('services'):
+        line += " services=" + ",".join(sorted({s['service'] for s in d['services']}))
+    if d.get('banner') and not d.get('product'):
+        line += f" | {d['banner'].splitlines()[0][:80]}"
+    return line
+
+
+def make_probes(names, args):
+    connect = {'timeout': args.timeout, 'retries': args.retries}
+    options = {'tcp': connect,
+               'tns': dict(connect, reply_timeout=args.reply_timeout),
+               'banner': dict(connect, probe_timeout=args.reply_timeout),
+               'nmap': {'state_path': args.nmap_state} if args.nmap_state else {}}
+    return [PROBES[name](**options.get(name, {})) for name in names]
+
+
+async def main(args):
+    targets = parse_targets(args.targets)
+    ports = parse_ports(args.ports)
+    names = [n.strip() for n in args.probes.split(',') if n.strip()]
+    unknown = [n for n in names if n not in PROBES]
+    if unknown:
+        sys.exit(f"unknown probe(s): {', '.join(unknown)} (choose from {', '.join(PROBES)})")
+    try:
+        probes = make_probes(names, args)
+    except ImportError as e:
+        sys.exit(str(e))
+    engine = Engine(probes, concurrency=args.concurrency, per_host=args.per_host,
+                    states=None if args.all_states else {'open', 'error'})
+    if not args.json:
+        print(f"Probing {count_hosts(targets)} hosts x {len(ports)} ports with {', '.join(names)}...", flush=True)
+    async for r in engine.run(targets, ports):
+        if args.json:
+            print(json.dumps(as_dict(r), default=str), flush=True)
+        else:
+            print(brief(r), flush=True)
+    st = engine.stats
+    per_probe = ", ".join(f"{n} {st[n]}" for n in names)
+    print(f"{sum(st[n] for n in names)} results in {st['seconds']:.2f}s ({per_probe}): "
+          f"{st['open']} open, {st['closed']} closed, {st['filtered']} filtered, {st['error']} error",
+          file=sys.stderr if args.json else sys.stdout)
+    for e in engine.errors:
+        print(f"error: {e}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Run any combination of discovery probes over an inventory, "
+                                            "all through one concurrent scheduler.")
+    p.add_argument('targets', nargs='*', default=['localhost'], help="e.g. 10.0.0.0/24 db01.example.com @hosts.txt")
+    p.add_argument('--probes', default='tcp', help=f"comma-separated, from {','.join(PROBES)}")
+    p.add_argument('--ports', default='1521-1530,2484', help="e.g. 1521-1530,2484")
+    p.add_argument('--concurrency', type=int, default=1000, help="jobs in flight overall")
+    p.add_argument('--per-host', type=int, default=16, help="connects in flight per address")
+    p.add_argument('--timeout', type=float, default=1.0, help="connect timeout before a host has answered")
+    p.add_argument('--retries', type=int, default=1, help="retries of a timed-out connect")
+    p.add_argument('--reply-timeout', type=float, default=2.0, help="wait for a TNS reply or banner")
+    p.add_argument('--nmap-state', default=None, help="nmap state file (default NMAP_STATE)")
+    p.add_argument('--all-states', action='store_true', help="also print closed, filtered, ... results")
+    p.add_argument('--json', action='store_true', help="one JSON object per result")
+    args = p.parse_args()
+    args.concurrency = min(args.concurrency, fd_budget())    # raises the open-files limit once
+    logging.getLogger('paramiko').setLevel(logging.CRITICAL)     # ssh failures are error Results
+    asyncio.run(main(args))
@@ -1,4 +1,6 @@
-from nmap import nmap
+import argparse, asyncio
+
+from scanengine import NmapSweep, NmapError, nmap_scan, parse_targets, parse_ports, count_hosts
 
 def scan_ports_with_tls_detection(host, port_range):
     """
@@ -11,46 +13,53 @@ def scan_ports_with_tls_detection(host, port_range):
     Returns:
         list: List of dictionaries containing port, service name, and whether it's encrypted (TCPS).
     """
-    scanner = nmap.PortScanner()
-
     try:
-        # Run the Nmap scan with service detection and SSL/TLS script
         print(f"Scanning {host} for open ports in range {port_range}...")
-        scanner.scan(
-            hosts=host,
-            ports=port_range,
-            arguments='-sV --script ssl-cert'  # Enables service detection and SSL/TLS identification
-        )
-
-        open_ports = []
-        for host in scanner.all_hosts():
-            for proto in scanner[host].all_protocols():
-                ports = scanner[host][proto]
-                for port, details in ports.items():
-                    if details['state'] == 'open':
-                        is_encrypted = 'ssl' in details.get('product', '').lower() or 'tls' in details.get('product',
-                                                                                                           '').lower()
-                        open_ports.append({
-                            'port': port,
-                            'service': details.get('name', 'unknown'),
-                            'product': details.get('product', 'unknown'),
-                            'encrypted': is_encrypted
-                        })
-
-        return open_ports
-
-    except Exception as e:
+        found = nmap_scan(host, port_range, '-sV --script ssl-cert')
+    except NmapError as e:
         print(f"Error scanning ports: {e}")
         return []
+    return [{'port': port, 'service': d['service'] or 'unknown', 'product': d['product'] or 'unknown',
+             'encrypted': d['encrypted']} for port, d in sorted(found.items())]
+
+async def sweep(targets, ports, **options):
+    """Print each open port of the inventory as nmap reports it, then a summary."""
+    nmap = NmapSweep(ports, **options)
+    async for r in nmap.scan(targets):
+        d = r.detail
+        encryption_status = "TCPS (encrypted)" if d['encrypted'] else "TCP (unencrypted)"
+        print(f"{r.host}:{r.port} {d['service'] or 'unknown'} {d['product'] or ''} {d['version'] or ''} "
+              f"{encryption_status}{' (unchanged)' if d.get('cached') else ''}", flush=True)
+    st = nmap.stats
+    print(f"{st['hosts']} hosts up, {st['changed']} with changed open ports, {st['rescanned']} re-scanned with -sV, "
+          f"{st['nmap_runs']} nmap runs in {st['seconds']:.1f}s")
+    for e in nmap.errors:
+        print(f"Error: {e}")
 
 if __name__ == "__main__":
-    # User-defined input
-    target_host = input("Enter the target server (IP or hostname): ")
-    port_range = input("Enter the port range to scan (e.g., 1521-1530): ")
+    p = argparse.ArgumentParser(
+        description="Batched, parallel nmap service scan of an inventory; -sV only where open ports changed. "
+                    "nmap settings come from NMAP_* environment variables, overridden by the options below.")
+    p.add_argument('targets', nargs='*', help="e.g. 10.0.0.0/24 db01.example.com @hosts.txt (prompted when empty)")
+    p.add_argument('--ports', help="e.g. 1521-1530,2484 (prompted when no targets are given)")
+    p.add_argument('--batch-size', type=int, help="hosts per nmap process (NMAP_BATCH_SIZE)")
+    p.add_argument('--parallel', type=int, help="nmap processes at once (NMAP_PARALLEL)")
+    p.add_argument('--timing', help="nmap timing template 0-5 (NMAP_TIMING)")
+    p.add_argument('--state', help="state file of the last run (NMAP_STATE)")
+    p.add_argument('--full', action='store_true', help="-sV every host, ignoring and not writing the state file")
+    args = p.parse_args()
 
-    results = scan_ports_with_tls_detection(target_host, port_range)
-    print("Detected Open Ports:")
-    for result in results:
-        encryption_status = "TCPS (encrypted)" if result['encrypted'] else "TCP (unencrypted)"
-        print(
-            f"Port: {result['port']}, Service: {result['service']}, Product: {result['product']}, Encryption: {encryption_status}")
+    if not args.targets:
+        args.targets = [input("Enter the target server (IP or hostname): ")]
+        args.ports = args.ports or input("Enter the port range to scan (e.g., 1521-1530): ")
+    options = {k: v for k, v in (('batch_size', args.batch_size), ('parallel', args.parallel),
+                                 ('timing', args.timing), ('state_path', args.state)) if v is not None}
+    if args.full:
+        options['state_path'] = None
+    targets = parse_targets(args.targets)
+    ports = parse_ports(args.ports or '1521-1530,2484')
+    print(f"Scanning {count_hosts(targets)} hosts x {len(ports)} ports with nmap...")
+    try:
+        asyncio.run(sweep(targets, ports, **options))
+    except NmapError as e:
+        raise SystemExit(f"Error: {e}")
@@ -1,4 +1,4 @@
-import nmap
+from scanengine import NmapError, nmap_scan
 
 def scan_ports_for_oracle(host, port_range):
     """
@@ -11,24 +11,10 @@ def scan_ports_for_oracle(host, port_range):
     Returns:
         dict: Dictionary of open ports with their service details.
     """
-    scanner = nmap.PortScanner()
-
     try:
-        # Run the Nmap scan
         print(f"Scanning {host} for open ports in range {port_range}...")
-        scanner.scan(hosts=host, ports=port_range, arguments='-sV')  # -sV: Service/version detection
-
-        open_ports = {}
-        for host in scanner.all_hosts():
-            for proto in scanner[host].all_protocols():
-                ports = scanner[host][proto]
-                for port, details in ports.items():
-                    if details['state'] == 'open':
-                        open_ports[port] = details
-
-        return open_ports
-
-    except Exception as e:
+        return nmap_scan(host, port_range, '-sV')  # -sV: Service/version detection
+    except NmapError as e:
         print(f"Error scanning ports: {e}")
         return {}
 
@@ -45,8 +31,8 @@ def find_oracle_listener(host, port_range):
         int: Port number where Oracle listener is detected, or None if not found.
     """
     open_ports = scan_ports_for_oracle(host, port_range)
-    for port, details in open_ports.items():
-        service_name = details.get('name', '').lower()
+    for port, details in sorted(open_ports.items()):
+        service_name = (details.get('service') or '').lower()
         if 'oracle' in service_name:
             print(f"Oracle listener detected on port {port}: {details}")
             return port
@@ -55,7 +41,7 @@ def find_oracle_listener(host, port_range):
 
 
 if __name__ == "__main__":
-    # User-defined input
+    # User-defined input; for many hosts use scan1.py with an inventory
     target_host = input("Enter the target server (IP or hostname): ")
     port_range = input("Enter the port range to scan (e.g., 1521-1530): ")
 
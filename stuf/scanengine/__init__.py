@@ -0,0 +1,28 @@
+"""
+scanengine
+
+Concurrent discovery for the stuf/ scripts: target/port parsing, one Result
+record, an asyncio TCP port scanner, the TNS listener and banner probes
+built on it, batched nmap runs, what hosts say they listen on (ss, psutil,
+lsnrctl, oratab; over SSH for a whole fleet), and the Engine that runs any
+mix of these as Probes.
+"""
+
+from .results import Result, as_dict
+from .targets import parse_targets, parse_ports, iter_hosts, count_hosts
+from .portscan import PortScanner, scan_ports, fd_budget
+from .tns import TnsScanner, find_listeners
+from .banner import BannerScanner, grab_banners
+from .nmapscan import NmapSweep, NmapError, nmap_scan
+from .listeners import parse_ss, parse_lsnrctl, parse_oratab, psutil_listeners, lsnrctl_status
+from .fleet import SshFleet, host_info
+from .engine import (Engine, Probe, PROBES, TcpProbe, TnsProbe, BannerProbe, NmapProbe,
+                     SshProbe, SsProbe, LocalProbe)
+
+__all__ = ["Result", "as_dict", "parse_targets", "parse_ports", "iter_hosts", "count_hosts",
+           "PortScanner", "scan_ports", "fd_budget", "TnsScanner", "find_listeners",
+           "BannerScanner", "grab_banners", "NmapSweep", "NmapError", "nmap_scan",
+           "parse_ss", "parse_lsnrctl", "parse_oratab", "psutil_listeners", "lsnrctl_status",
+           "SshFleet", "host_info",
+           "Engine", "Probe", "PROBES", "TcpProbe", "TnsProbe", "BannerProbe", "NmapProbe",
+           "SshProbe", "SsProbe", "LocalProbe"]
@@ -0,0 +1,247 @@
+"""
+scanengine.banner
+
+Banner grabbing as a scanner stage. Each open port gets a short sequence of
+protocol probes, every read bounded in bytes and time, and stops at the
+first reply that identifies the service:
+
+  greeting  send nothing: SSH, FTP, SMTP, POP3, IMAP, MySQL speak first
+  tns       a TNS CONNECT (version command), fingerprinted by scanengine.tns
+  tls       a TLS ClientHello: any TLS record back means a TLS service
+  newline   CRLF CRLF: enough for HTTP and most line protocols to answer
+
+Known Oracle and TLS ports get their probe first; other ports wait briefly
+for a greeting, then go through the rest. The first probe runs on the
+connection the port scan opened, later ones on fresh connections. A port
+that stays silent on a probe is not sent the ClientHello: a TLS server
+answers garbage with an alert at once.
+
+Used two ways, yielding Results with probe='banner' and detail
+{'service', 'banner', 'trigger', ...} (None when nothing answered):
+
+  BannerScanner().scan(targets, ports)   connect scan + banners in one pass
+  BannerScanner().stage(results)         banners for the open ports among
+                                         another scanner's Results
+"""
+
+import asyncio, re, socket, ssl
+from functools import lru_cache
+from . import tns
+from .portscan import PortScanner, _LINGER_RST
+from .targets import iter_hosts, parse_targets
+
+TNS_PORTS = {*range(1521, 1531), 1575, 1630, 2483, 3938}
+TLS_PORTS = {443, 465, 636, 989, 990, 993, 995, 2484, 5986, 8443}
+PROBES = ('tns', 'tls', 'newline')
+
+# first match wins; each pattern ends where the service has said enough
+PATTERNS = [
+    (re.compile(rb"^SSH-\d[\d.]*-[^\r\n]*\r?\n"), 'ssh'),
+    (re.compile(rb"^220[ -][^\r\n]*(?:SMTP|Postfix|Exim|Sendmail)[^\r\n]*\r?\n", re.I), 'smtp'),
+    (re.compile(rb"^220[ -][^\r\n]*\r?\n"), 'ftp'),
+    (re.compile(rb"^HTTP/\d\.\d \d{3}.*?\r?\n\r?\n", re.S), 'http'),
+    (re.compile(rb"^\+OK[^\r\n]*\r?\n"), 'pop3'),
+    (re.compile(rb"^\* OK[^\r\n]*\r?\n"), 'imap'),
+    (re.compile(rb"^RFB \d{3}\.\d{3}\n"), 'vnc'),
+    (re.compile(rb"^.\x00\x00\x00\x0a(\d[\x20-\x7e]*)\x00", re.S), 'mysql'),   # protocol 10 handshake
+]
+
+def match_banner(data):
+    for pattern, service in PATTERNS:
+        if pattern.match(data):
+            return service
+    return None
+
+def match_tls(data):
+    # a record header: alert or handshake, major version 3
+    if len(data) >= 5 and data[0] in (0x15, 0x16) and data[1] == 3:
+        return 'tls'
+    return match_banner(data)
+
+@lru_cache(maxsize=None)
+def client_hello():
+    """The bytes of a ClientHello, from an SSL object that is never connected."""
+    out = ssl.MemoryBIO()
+    obj = tns._tls_context().wrap_bio(ssl.MemoryBIO(), out)
+    try:
+        obj.do_handshake()
+    except ssl.SSLWantReadError:
+        pass
+    return out.read()
+
+async def read_reply(reader, match, limit, timeout, idle):
+    """
+    (data, service, closed): bytes read until match(data) names a service
+    (early close), limit bytes, EOF, timeout without a first byte or idle
+    seconds without more. closed is set when the peer closed or reset.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    data = b""
+    while len(data) < limit:
+        wait = deadline - loop.time()
+        if data:
+            wait = min(wait, idle)
+        if wait <= 0:
+            break
+        try:
+            chunk = await asyncio.wait_for(reader.read(limit - len(data)), wait)
+        except asyncio.TimeoutError:
+            break
+        except OSError:      # reset, or a TLS peer's error
+            return data, data and match(data), True
+        if not chunk:
+            return data, data and match(data), True
+        data += chunk
+        service = match(data)
+        if service:
+            return data, service, False
+    return data, data and match(data), False
+
+def banner_text(data, limit=512):
+    text = data.decode('utf-8', errors='ignore').strip()
+    return text[:limit] or None
+
+class BannerScanner(PortScanner):
+    """
+    PortScanner that grabs a banner from each open port. max_bytes bounds
+    every read, probe_timeout the wait for a first byte, idle the wait for
+    more, greeting the wait for a server-first banner; probes is the order
+    for ports with no hint (see TNS_PORTS, TLS_PORTS).
+    """
+    probe_name = 'banner'
+
+    def __init__(self, *args, max_bytes=1024, probe_timeout=1.0, idle=0.1, greeting=0.25,
+                 probes=PROBES, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_bytes = max_bytes
+        self.probe_timeout = probe_timeout
+        self.idle = idle
+        self.greeting = greeting
+        self.probes = tuple(probes)
+
+    def probe_order(self, port):
+        """(wait for a greeting first?, probes in order) for a port."""
+        for hinted, first in ((TNS_PORTS, 'tns'), (TLS_PORTS, 'tls')):
+            if port in hinted and first in self.probes:
+                return False, (first,) + tuple(p for p in self.probes if p != first)
+        return True, self.probes
+
+    # -------------------- the sweep --------------------
+    async def scan(self, targets, ports):
+        """Banner Results for every (host, port) of targets x ports, each pair once."""
+        async for r in self.run(_unique((host, port) for port in ports for host in iter_hosts(targets))):
+            yield r
+
+    async def stage(self, results):
+        """Banner Results for the open ports among results (an iterable or
+        async iterable of Results from any scanner), each (host, port) once."""
+        async def open_ports():
+            seen = set()
+            if hasattr(results, '__aiter__'):
+                async for r in results:
+                    if r.state == 'open' and (r.host, r.port) not in seen:
+                        seen.add((r.host, r.port))
+                        yield r.host, r.port
+            else:
+                for r in results:
+                    if r.state == 'open' and (r.host, r.port) not in seen:
+                        seen.add((r.host, r.port))
+                        yield r.host, r.port
+        async for r in self.run(open_ports()):
+            yield r
+
+    # -------------------- one port --------------------
+    async def on_open(self, sock, host, addr, port):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RST)
+            conn = await asyncio.open_connection(sock=sock)
+        except OSError:
+            sock.close()
+            return None
+        detail = await self.grab(conn, sock.family, addr, port)
+        self.stats[(detail or {}).get('service') or 'no banner'] += 1
+        return detail
+
+    async def grab(self, conn, family, addr, port):
+        greet, probes = self.probe_order(port)
+        silent = False
+        try:
+            if greet:
+                data, service, closed = await read_reply(conn[0], match_banner, self.max_bytes,
+                                                         self.greeting, self.idle)
+                if data:
+                    return {'service': service, 'banner': banner_text(data), 'trigger': 'greeting'}
+                if closed:
+                    conn[1].transport.abort()
+                    conn = None
+            for name in probes:
+                if name == 'tls' and silent:
+                    continue
+                if conn is None:
+                    conn = await self._reconnect(family, addr, port)
+                    if conn is None:
+                        return None
+                detail, closed = await getattr(self, '_probe_' + name)(*conn)
+                if detail is not None:
+                    detail['trigger'] = name
+                    return detail
+                silent = silent or not closed
+                conn[1].transport.abort()
+                conn = None
+            return None
+        finally:
+            if conn is not None:
+                conn[1].transport.abort()
+
+    async def _reconnect(self, family, addr, port):
+        state, _, sock = await self.connect_retrying(family, addr, port)
+        if state != 'open':
+            return None
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RST)
+            return await asyncio.open_connection(sock=sock)
+        except OSError:
+            sock.close()
+            return None
+
+    # -------------------- probes: (detail or None, peer closed?) --------------------
+    async def _probe_tns(self, reader, writer):
+        packets, tls_hint = await tns.exchange(reader, writer, self.probe_timeout)
+        return tns.fingerprint(packets), tls_hint
+
+    async def _probe_tls(self, reader, writer):
+        writer.write(client_hello())
+        data, service, closed = await read_reply(reader, match_tls, self.max_bytes,
+                                                 self.probe_timeout, self.idle)
+        if service == 'tls':
+            return {'service': 'tls', 'banner': None,
+                    'tls_record': 'alert' if data[0] == 0x15 else 'handshake'}, closed
+        if data:
+            return {'service': service, 'banner': banner_text(data)}, closed
+        return None, closed
+
+    async def _probe_newline(self, reader, writer):
+        writer.write(b"\r\n\r\n")
+        data, service, closed = await read_reply(reader, match_banner, self.max_bytes,
+                                                 self.probe_timeout, self.idle)
+        if data:
+            return {'service': service, 'banner': banner_text(data)}, closed
+        return None, closed
+
+def _unique(pairs):
+    seen = set()
+    for pair in pairs:
+        if pair not in seen:
+            seen.add(pair)
+            yield pair
+
+def grab_banners(host, port_range, **options):
+    """[(port, detail)] of every open port of one host in port_range (lo, hi)
+    that answered a probe, all ports probed at once."""
+    async def run():
+        scanner = BannerScanner(states={'open'}, **options)
+        ports = range(port_range[0], port_range[1] + 1)
+        return sorted([(r.port, r.detail) async for r in scanner.scan(parse_targets([host]), ports)
+                       if r.detail is not None])
+    return asyncio.run(run())
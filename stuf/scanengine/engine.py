@@ -0,0 +1,276 @@
+"""
+scanengine.engine
+
+One scheduler for every kind of discovery the stuf/ scripts did, each
+wrapped as a Probe:
+
+  probe   scope  what it reports
+  tcp     port   connect scan state of each host:port (PortScanner)
+  tns     port   TNS listener fingerprint of open ports (TnsScanner)
+  banner  port   service banner of open ports (BannerScanner)
+  nmap    once   nmap services of the whole inventory (NmapSweep)
+  ssh     host   listening sockets of each host over SSH (SshFleet: ss,
+                 lsnrctl status and oratab on one pooled connection)
+  ss      once   listening sockets of this machine, `ss -ltnp`
+  local   once   listening sockets of this machine from psutil, with
+                 `lsnrctl status` of every tnslsnr among them
+
+A probe's scope gives its jobs: one per (host, port) of the inventory, one
+per host, or one for the whole run. Each probe gets its own workers (up to
+its `limit`), and every job passes one shared gate of `concurrency` slots,
+so a slow probe never holds up another's jobs. The port probes also share
+one per-address connect limit (`per_host`), RTT estimates and DNS answers,
+and when tcp runs, tns and banner probe only the ports it found open.
+
+The host-side probes (ssh, ss, local) list every listening socket, whatever
+the port list; their Results have state 'open' and addr the bound address.
+"""
+
+import asyncio, socket, time
+from collections import Counter
+from .results import Result
+from .targets import iter_hosts
+from .portscan import PortScanner
+from .tns import TnsScanner
+from .banner import BannerScanner
+from .nmapscan import NmapSweep
+from .listeners import ss_listeners, psutil_listeners, lsnrctl_status, psutil
+from .fleet import SshFleet, host_info
+
+_DONE = object()
+
+class Probe:
+    """
+    One kind of discovery. scope decides its jobs: 'port' one per (host,
+    port), 'host' one per host (with the port list), 'once' one for the
+    whole run (with targets and ports). run(*job) is an async iterator of
+    Results; limit caps this probe's jobs in flight (None: the engine's
+    concurrency).
+    """
+    name = None
+    scope = 'port'
+    limit = None
+
+    def bind(self, engine):
+        self.engine = engine
+
+    def jobs(self, targets, ports):
+        if self.scope == 'once':
+            yield targets, ports
+        elif self.scope == 'host':
+            for host in iter_hosts(targets):
+                yield host, ports
+        else:
+            for port in ports:
+                for host in iter_hosts(targets):
+                    yield host, port
+
+    async def run(self, *job):
+        raise NotImplementedError
+        yield
+
+# -------------------- network probes --------------------
+class TcpProbe(Probe):
+    name = 'tcp'
+    scanner_class = PortScanner
+
+    def __init__(self, **options):
+        self.scanner = self.scanner_class(**options)
+
+    def bind(self, engine):
+        super().bind(engine)
+        s = self.scanner
+        s.per_host = engine.per_host
+        s._slots, s._rtt, s._resolved = engine._slots, engine._rtt, engine._resolved
+
+    async def run(self, host, port):
+        yield await self.scanner.probe(host, port)
+
+class TnsProbe(TcpProbe):
+    name = 'tns'
+    scanner_class = TnsScanner
+
+class BannerProbe(TcpProbe):
+    name = 'banner'
+    scanner_class = BannerScanner
+
+class NmapProbe(Probe):
+    name = 'nmap'
+    scope = 'once'
+
+    def __init__(self, **options):
+        self.options = options
+
+    async def run(self, targets, ports):
+        sweep = NmapSweep(ports, **self.options)
+        async for r in sweep.scan(targets):
+            yield r
+        self.engine.errors.extend(f"nmap: {e}" for e in sweep.errors)
+
+# -------------------- host-side probes --------------------
+class SshProbe(Probe):
+    """
+    Each host's listening sockets from an SshFleet (SCAN_SSH_* settings, or
+    the SshFleet arguments given here); the sockets of the host's TNS
+    listener also carry its alias, version and services from lsnrctl
+    status, and the host's oratab. Connections stay open for later runs.
+    """
+    name = 'ssh'
+    scope = 'host'
+
+    def __init__(self, fleet=None, **options):
+        self.fleet = fleet or SshFleet(**options)
+        self.limit = self.fleet.concurrency
+
+    async def run(self, host, ports):
+        rec = await self.fleet.collect(host)
+        if rec['error']:
+            raise RuntimeError(rec['error'])
+        info = host_info(rec)
+        if 'ss' in info['errors']:
+            raise RuntimeError(f"ss: {info['errors']['ss']}")
+        lsnr = info['lsnrctl'] or {}
+        tns_ports = {e['port'] for e in lsnr.get('endpoints', ()) if e['protocol'] in ('tcp', 'tcps')}
+        for sock in info['listeners']:
+            detail = {'process': sock['process'], 'pid': sock['pid']}
+            if sock['port'] in tns_ports:
+                detail.update(listener=lsnr['alias'], version=lsnr['version'], services=lsnr['services'],
+                              oratab=info['oratab'])
+            yield Result(host, sock['address'], sock['port'], self.name, 'open', None, detail)
+
+class SsProbe(Probe):
+    name = 'ss'
+    scope = 'once'
+
+    async def run(self, targets, ports):
+        host = socket.gethostname()
+        for rec in await ss_listeners():
+            yield Result(host, rec['address'], rec['port'], self.name, 'open', None,
+                         {'process': rec['process'], 'pid': rec['pid']})
+
+class LocalProbe(Probe):
+    name = 'local'
+    scope = 'once'
+
+    def __init__(self, lsnrctl=True):
+        if psutil is None:
+            raise ImportError("psutil is required for the local probe")
+        self.lsnrctl = lsnrctl
+
+    async def run(self, targets, ports):
+        host = socket.gethostname()
+        loop = asyncio.get_running_loop()
+        recs = await loop.run_in_executor(None, psutil_listeners)
+        # one lsnrctl status per listener, all at once
+        listeners = sorted({(r['listener'], r['exe']) for r in recs if r['listener']}, key=str)
+        status = {}
+        if self.lsnrctl and listeners:
+            found = await asyncio.gather(*(lsnrctl_status(alias, exe) for alias, exe in listeners))
+            status = dict(zip(listeners, found))
+        for r in recs:
+            detail = {'process': r['process'], 'pid': r['pid'], 'listener': r['listener']}
+            st = status.get((r['listener'], r['exe']))
+            if st:
+                detail.update(version=st['version'], services=st['services'], error=st.get('error'))
+            yield Result(host, r['address'], r['port'], self.name, 'open', None, detail)
+
+PROBES = {'tcp': TcpProbe, 'tns': TnsProbe, 'banner': BannerProbe, 'nmap': NmapProbe,
+          'ssh': SshProbe, 'ss': SsProbe, 'local': LocalProbe}
+
+# -------------------- the scheduler --------------------
+class Engine:
+    """
+    engine = Engine([TcpProbe(), TnsProbe(reply_timeout=2.0), SsProbe()], concurrency=2000)
+    async for r in engine.run(parse_targets(['10.0.0.0/24']), [1521, 2484]):
+        ...
+
+    states limits what run() yields (e.g. {'open'}); stats counts every
+    Result by probe and by state. Failures of 'once' probes are in .errors;
+    other probes report theirs as Results with state 'error'.
+    """
+    def __init__(self, probes, concurrency=1000, per_host=16, states=None):
+        self.probes = list(probes)
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.states = set(states) if states else None
+        self.stats = Counter()
+        self.errors = []
+        self._slots, self._rtt, self._resolved = {}, {}, {}
+        for p in self.probes:
+            p.bind(self)
+
+    async def run(self, targets, ports):
+        """Async iterator of every probe's Results, as they come."""
+        gate = asyncio.Semaphore(self.concurrency)
+        queue = asyncio.Queue(self.concurrency)
+        t0 = time.perf_counter()
+        # with a tcp probe in the mix, the other port probes only get the
+        # ports it found open: one connect per closed or filtered port, not one per probe
+        feeder = next((p for p in self.probes if p.name == 'tcp'), None)
+        staged = {p: asyncio.Queue() for p in self.probes
+                  if feeder is not None and p is not feeder and p.scope == 'port'}
+
+        async def worker(probe, take):
+            try:
+                while True:
+                    job = await take()
+                    if job is None:
+                        break
+                    async with gate:
+                        try:
+                            async for r in probe.run(*job):
+                                await queue.put(r)
+                        except Exception as e:
+                            if probe.scope == 'once':
+                                self.errors.append(f"{probe.name}: {e}")
+                            else:
+                                port = job[1] if probe.scope == 'port' else None
+                                await queue.put(Result(job[0], None, port, probe.name, 'error', None,
+                                                       {'error': str(e)}))
+            except Exception as e:
+                self.errors.append(f"{probe.name}: {e}")   # from the target list itself
+            await queue.put((_DONE, probe))
+
+        def from_iter(jobs):
+            async def take():
+                # shared by all the probe's workers: next() never awaits
+                return next(jobs, None)
+            return take
+
+        def from_queue(q):
+            async def take():
+                job = await q.get()
+                if job is None:
+                    q.put_nowait(None)      # for the next worker
+                return job
+            return take
+
+        workers, running = [], Counter()
+        for probe in self.probes:
+            take = from_queue(staged[probe]) if probe in staged else from_iter(probe.jobs(targets, ports))
+            n = 1 if probe.scope == 'once' else min(probe.limit or self.concurrency, self.concurrency)
+            workers += [asyncio.ensure_future(worker(probe, take)) for _ in range(n)]
+            running[probe] = n
+        try:
+            while running:
+                r = await queue.get()
+                if r[0] is _DONE:
+                    running[r[1]] -= 1
+                    if not running[r[1]]:
+                        del running[r[1]]
+                        if r[1] is feeder:
+                            for q in staged.values():
+                                q.put_nowait(None)
+                    continue
+                if r.state == 'open' and feeder is not None and r.probe == feeder.name:
+                    for q in staged.values():
+                        q.put_nowait((r.host, r.port))
+                self.stats[r.probe] += 1
+                self.stats[r.state] += 1
+                if self.states is None or r.state in self.states:
+                    yield r
+        finally:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.stats['seconds'] = time.perf_counter() - t0
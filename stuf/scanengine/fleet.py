@@ -0,0 +1,240 @@
+"""
+scanengine.fleet
+
+Commands over SSH on many hosts at once, for what only a host itself can
+say (its listening sockets, its listeners' services, its oratab):
+
+- one SSH connection per host, kept open and reused by later sweeps, for
+  the first max_connections hosts (each kept connection holds a paramiko
+  thread, so keep this in the hundreds); other hosts reconnect each time;
+- a host's commands all run at once, each on its own channel of that one
+  connection, instead of a connection per command;
+- `concurrency` hosts in flight, each in a worker thread (paramiko blocks);
+  a record comes back per host as soon as that host is done.
+
+Configured through environment variables (or the SshFleet arguments):
+
+  SCAN_SSH_USER         login (default: the local user)
+  SCAN_SSH_KEY          private key file (default: the agent and ~/.ssh keys)
+  SCAN_SSH_PASSWORD     password, where keys are not used
+  SCAN_SSH_PORT         default 22
+  SCAN_SSH_TIMEOUT      connect, auth and per-command timeout in seconds (default 10)
+  SCAN_SSH_CONCURRENCY  hosts in flight (default 64)
+  SCAN_SSH_CONNECTIONS  connections kept open between sweeps (default 256)
+"""
+
+import asyncio, getpass, os, socket, threading, time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .listeners import parse_ss, parse_lsnrctl, parse_oratab
+
+try:
+    import paramiko
+except ImportError:
+    paramiko = None
+
+SCAN_SSH_USER = os.environ.get("SCAN_SSH_USER") or None
+SCAN_SSH_KEY = os.environ.get("SCAN_SSH_KEY") or None
+SCAN_SSH_PASSWORD = os.environ.get("SCAN_SSH_PASSWORD") or None
+SCAN_SSH_PORT = int(os.environ.get("SCAN_SSH_PORT", "22"))
+SCAN_SSH_TIMEOUT = float(os.environ.get("SCAN_SSH_TIMEOUT", "10"))
+SCAN_SSH_CONCURRENCY = int(os.environ.get("SCAN_SSH_CONCURRENCY", "64"))
+SCAN_SSH_CONNECTIONS = int(os.environ.get("SCAN_SSH_CONNECTIONS", "256"))
+
+# lsnrctl is seldom on a non-interactive PATH: use the first oratab home that has one
+LSNRCTL = ('for h in $(grep -v "^#" /etc/oratab 2>/dev/null | cut -d: -f2 | sort -u); do '
+           '[ -x "$h/bin/lsnrctl" ] && export ORACLE_HOME="$h" PATH="$h/bin:$PATH" && break; done; '
+           'lsnrctl status')
+COMMANDS = {'ss': 'ss -ltnp', 'lsnrctl': LSNRCTL, 'oratab': 'cat /etc/oratab'}
+
+def read_channel(chan, limit=4 << 20):
+    """{'rc', 'stdout', 'stderr'} of a channel whose command was started; stderr
+    is drained alongside stdout so neither can stall the other. 'error' is
+    set (and rc None) when the command did not finish within the timeout."""
+    out, err = bytearray(), bytearray()
+    rec = {'rc': None, 'error': None}
+    try:
+        while True:
+            chunk = chan.recv(65536)
+            while chan.recv_stderr_ready():
+                err += chan.recv_stderr(65536)
+            if not chunk:
+                break
+            if len(out) < limit:
+                out += chunk
+        while True:
+            chunk = chan.recv_stderr(65536)
+            if not chunk:
+                break
+            err += chunk
+        rec['rc'] = chan.recv_exit_status()
+    except socket.timeout:
+        rec['error'] = "timed out"
+    finally:
+        chan.close()
+    rec['stdout'] = out.decode(errors='replace')
+    rec['stderr'] = err.decode(errors='replace')
+    return rec
+
+class SshFleet:
+    """
+    with SshFleet(user='oracle', concurrency=64) as fleet:
+        for rec in fleet.sweep(iter_hosts(parse_targets(['@dbhosts.txt']))):
+            info = host_info(rec)
+
+    A record per host: {'host', 'error', 'seconds', 'outputs': {name: {'rc',
+    'stdout', 'stderr', 'error'}}}; error is None when the host was reached
+    and every command started, whatever their exit status. commands maps
+    names to shell commands (default COMMANDS: ss, lsnrctl, oratab).
+    """
+    def __init__(self, user=SCAN_SSH_USER, key_file=SCAN_SSH_KEY, password=SCAN_SSH_PASSWORD,
+                 port=SCAN_SSH_PORT, timeout=SCAN_SSH_TIMEOUT, concurrency=SCAN_SSH_CONCURRENCY,
+                 max_connections=SCAN_SSH_CONNECTIONS, commands=None):
+        if paramiko is None:
+            raise ImportError("paramiko is required for SSH collection")
+        self.user = user or getpass.getuser()
+        self.key_file = key_file
+        self.password = password
+        self.port = port
+        self.timeout = timeout
+        self.concurrency = max(1, concurrency)
+        self.max_connections = max(0, max_connections)
+        self.commands = dict(commands or COMMANDS)
+        self.stats = Counter()
+        self._clients = {}      # host -> SSHClient kept open
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='ssh')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close every kept connection and stop the workers."""
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for c in clients:
+            c.close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # -------------------- connections --------------------
+    def _client(self, host):
+        """A connected SSHClient for host: the kept one while it is alive, else a new one."""
+        with self._lock:
+            client = self._clients.pop(host, None)
+        if client is not None:
+            transport = client.get_transport()
+            if transport is not None and transport.is_active():
+                self._count('reused')
+                return client
+            client.close()
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            client.connect(host, port=self.port, username=self.user, password=self.password,
+                           key_filename=self.key_file, timeout=self.timeout,
+                           banner_timeout=self.timeout, auth_timeout=self.timeout)
+        except BaseException:
+            client.close()
+            raise
+        client.get_transport().set_keepalive(30)
+        self._count('connects')
+        return client
+
+    def _keep(self, host, client):
+        """Keep client for host's next run while there is room, else close it."""
+        with self._lock:
+            if host not in self._clients and len(self._clients) < self.max_connections:
+                self._clients[host] = client
+                return
+        client.close()      # no room, or the same host run twice at once
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    # -------------------- one host --------------------
+    def run(self, host, commands=None):
+        """The record of one host (see the class doc); blocks."""
+        commands = commands or self.commands
+        t0 = time.perf_counter()
+        rec = {'host': host, 'error': None, 'outputs': {}}
+        client = None
+        try:
+            client = self._client(host)
+            transport = client.get_transport()
+            # every command on its own channel, all started before any is read
+            chans = {}
+            for name, cmd in commands.items():
+                chan = transport.open_session(timeout=self.timeout)
+                chan.settimeout(self.timeout)
+                chan.exec_command(cmd)
+                chans[name] = chan
+            for name, chan in chans.items():
+                rec['outputs'][name] = read_channel(chan)
+        except Exception as e:
+            rec['error'] = str(e) or type(e).__name__
+            if client is not None:
+                client.close()      # not kept: it may be half-broken
+                client = None
+        finally:
+            if client is not None:
+                self._keep(host, client)
+        rec['seconds'] = round(time.perf_counter() - t0, 3)
+        self._count('hosts')
+        if rec['error']:
+            self._count('failed')
+        return rec
+
+    async def collect(self, host, commands=None):
+        """run() on the fleet's workers, for the asyncio scanners."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, self.run, host, commands)
+
+    # -------------------- the sweep --------------------
+    def sweep(self, hosts, commands=None):
+        """Records of every host, in the order they finish, `concurrency`
+        hosts at a time; hosts is consumed lazily."""
+        t0 = time.perf_counter()
+        hosts = iter(hosts)
+        pending = set()
+        try:
+            while True:
+                while len(pending) < 2 * self.concurrency:
+                    host = next(hosts, None)
+                    if host is None:
+                        break
+                    pending.add(self._pool.submit(self.run, host, commands))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    yield f.result()
+        finally:
+            for f in pending:
+                f.cancel()
+            self.stats['seconds'] = time.perf_counter() - t0
+
+def host_info(rec):
+    """
+    A fleet record parsed: {'host', 'error', 'listeners': parse_ss(),
+    'lsnrctl': parse_lsnrctl() or None, 'oratab': parse_oratab() or None};
+    a command that failed gives None (or [] for ss) and its message in
+    'errors'.
+    """
+    out = rec['outputs']
+    info = {'host': rec['host'], 'error': rec['error'], 'listeners': [], 'lsnrctl': None, 'oratab': None,
+            'errors': {}}
+    for name, parse, key in (('ss', parse_ss, 'listeners'), ('lsnrctl', parse_lsnrctl, 'lsnrctl'),
+                             ('oratab', parse_oratab, 'oratab')):
+        o = out.get(name)
+        if o is None:
+            continue
+        if o['rc'] == 0:
+            info[key] = parse(o['stdout'])
+        else:
+            text = (o['error'] or o['stderr'] or o['stdout']).strip()
+            info['errors'][name] = text.splitlines()[-1] if text else f"exit {o['rc']}"
+    return info
@@ -0,0 +1,185 @@
+"""
+scanengine.listeners
+
+What a host itself says is listening, from the places the stuf/ scripts
+used to read it each their own way:
+
+  ss -ltnp        parse_ss(): one record per listening TCP socket, with
+                  the owning process when ss may show it
+  psutil          psutil_listeners(): the same from the kernel via psutil,
+                  with the process name and command line
+  lsnrctl status  parse_lsnrctl(): listener alias, version, endpoints and
+                  the service -> instance map
+  /etc/oratab     parse_oratab(): the databases installed and their homes
+
+tnslsnr processes are recognised by name and their listener alias read from
+the command line (tnslsnr LISTENER_X -inherit), so lsnrctl can be asked
+about each listener from its own ORACLE_HOME.
+"""
+
+import asyncio, os, re
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# users:(("tnslsnr",pid=4242,fd=8),...)
+_SS_USER = re.compile(r'\("([^"]*)",pid=(\d+)')
+
+def split_hostport(text):
+    """'0.0.0.0:1521', '[::]:1521', '*:1521', '[::ffff:10.0.0.5]:22' -> (address, port)."""
+    addr, _, port = text.rpartition(':')
+    addr = addr.strip('[]')
+    if '%' in addr:
+        addr = addr.split('%', 1)[0]       # fe80::1%eth0
+    return ('*' if addr in ('', '*') else addr), int(port)
+
+def parse_ss(text):
+    """
+    Output of `ss -ltn` / `ss -ltnp` (header optional) -> list of
+    {'proto': 'tcp', 'address', 'port', 'process', 'pid'}; process and pid
+    are None where ss did not show them.
+    """
+    out = []
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) < 5 or parts[0] in ('State', 'Netid'):
+            continue
+        # with -t the first column is the state; ss -a would add a Netid column first
+        i = 1 if parts[0] in ('tcp', 'udp') else 0
+        try:
+            addr, port = split_hostport(parts[i + 3])
+        except ValueError:
+            continue
+        m = _SS_USER.search(line)
+        out.append({'proto': 'tcp', 'address': addr, 'port': port,
+                    'process': m.group(1) if m else None, 'pid': int(m.group(2)) if m else None})
+    return out
+
+async def ss_listeners(cmd=('ss', '-ltnp')):
+    """parse_ss() of the local ss; [] when ss is not there."""
+    try:
+        proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.DEVNULL)
+    except OSError:
+        return []
+    out, _ = await proc.communicate()
+    return parse_ss(out.decode(errors='replace'))
+
+# -------------------- psutil --------------------
+def listener_alias(cmdline):
+    """Listener alias from a tnslsnr command line, or None."""
+    if len(cmdline) > 1 and not cmdline[1].startswith('-'):
+        return cmdline[1]
+    return None
+
+def psutil_listeners():
+    """
+    Listening TCP sockets from psutil -> list of {'proto', 'address', 'port',
+    'pid', 'process', 'exe', 'cmdline', 'listener'}; listener is the alias for
+    tnslsnr processes. Process fields are None where access is denied.
+    """
+    if psutil is None:
+        raise ImportError("psutil is not installed")
+    out = []
+    procs = {}
+    for conn in psutil.net_connections(kind='tcp'):
+        if conn.status != psutil.CONN_LISTEN:
+            continue
+        rec = {'proto': 'tcp', 'address': conn.laddr.ip, 'port': conn.laddr.port, 'pid': conn.pid,
+               'process': None, 'exe': None, 'cmdline': None, 'listener': None}
+        if conn.pid:
+            if conn.pid not in procs:
+                try:
+                    p = psutil.Process(conn.pid)
+                    procs[conn.pid] = (p.name(), p.exe(), p.cmdline())
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    procs[conn.pid] = (None, None, None)
+            rec['process'], rec['exe'], rec['cmdline'] = procs[conn.pid]
+            if (rec['process'] or '').lower() == 'tnslsnr' and rec['cmdline']:
+                rec['listener'] = listener_alias(rec['cmdline'])
+        out.append(rec)
+    return out
+
+# -------------------- lsnrctl --------------------
+_ENDPOINT = re.compile(r"\(PROTOCOL=(\w+)\)(?:\(HOST=([^)]*)\))?(?:\(PORT=(\d+)\))?", re.I)
+
+def parse_lsnrctl(text):
+    """
+    `lsnrctl status` output -> {'alias', 'version', 'endpoints': [{'protocol',
+    'host', 'port'}], 'services': [{'service', 'instance', 'status'}]}.
+    A service with no instance lines gets one entry with instance None.
+    """
+    info = {'alias': None, 'version': None, 'endpoints': [], 'services': []}
+    m = re.search(r"^Alias\s+(\S+)", text, re.M)
+    if m:
+        info['alias'] = m.group(1)
+    m = re.search(r"^Version\s+TNSLSNR.*?Version (\d+(?:\.\d+)+)", text, re.M)
+    if m:
+        info['version'] = m.group(1)
+    # only the endpoints section: the "Connecting to (DESCRIPTION=...)" line is ours
+    section = text.partition("Listening Endpoints Summary")[2].partition("Services Summary")[0]
+    for proto, host, port in _ENDPOINT.findall(section):
+        info['endpoints'].append({'protocol': proto.lower(), 'host': host or None,
+                                  'port': int(port) if port else None})
+    service, seen = None, False
+    for line in text.splitlines():
+        m = re.match(r'\s*Service "(.+?)" has', line)
+        if m:
+            if service is not None and not seen:
+                info['services'].append({'service': service, 'instance': None, 'status': None})
+            service, seen = m.group(1), False
+            continue
+        m = re.match(r'\s*Instance "(.+?)", status (\w+)', line)
+        if m and service is not None:
+            info['services'].append({'service': service, 'instance': m.group(1), 'status': m.group(2)})
+            seen = True
+    if service is not None and not seen:
+        info['services'].append({'service': service, 'instance': None, 'status': None})
+    return info
+
+def parse_oratab(text):
+    """/etc/oratab -> list of {'sid', 'home', 'autostart'}."""
+    out = []
+    for line in text.splitlines():
+        line = line.split('#', 1)[0].strip()
+        parts = line.split(':')
+        if len(parts) >= 2 and parts[0] and parts[1]:
+            out.append({'sid': parts[0], 'home': parts[1],
+                        'autostart': parts[2].upper() == 'Y' if len(parts) > 2 else None})
+    return out
+
+def lsnrctl_command(alias=None, exe=None):
+    """(argv, env) for `lsnrctl status [alias]`, from the ORACLE_HOME of the
+    tnslsnr binary exe when known, else lsnrctl on PATH."""
+    env = None
+    lsnrctl = 'lsnrctl'
+    if exe:
+        home = os.path.dirname(os.path.dirname(exe))      # $ORACLE_HOME/bin/tnslsnr
+        candidate = os.path.join(home, 'bin', 'lsnrctl')
+        if os.path.exists(candidate):
+            lsnrctl = candidate
+            env = dict(os.environ, ORACLE_HOME=home)
+    return [lsnrctl, 'status'] + ([alias] if alias else []), env
+
+async def lsnrctl_status(alias=None, exe=None, timeout=30):
+    """parse_lsnrctl() of one listener, with the raw 'error' text when lsnrctl
+    failed or is missing."""
+    argv, env = lsnrctl_command(alias, exe)
+    try:
+        proc = await asyncio.create_subprocess_exec(*argv, env=env, stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.STDOUT)
+    except OSError as e:
+        return dict(parse_lsnrctl(''), error=str(e))
+    try:
+        out, _ = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return dict(parse_lsnrctl(''), error=f"lsnrctl timed out after {timeout}s")
+    text = out.decode(errors='replace')
+    info = parse_lsnrctl(text)
+    if proc.returncode:
+        info['error'] = text.strip().splitlines()[-1] if text.strip() else f"exit {proc.returncode}"
+    return info
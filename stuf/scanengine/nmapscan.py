@@ -0,0 +1,281 @@
+"""
+scanengine.nmapscan
+
+nmap run as a fleet, for the sweeps where nmap's version detection is
+wanted. The inventory is split into batches (-iL files) and several nmap
+processes run at once; each writes XML to a pipe (-oX -), which is parsed
+as it arrives, so hosts come out as nmap finishes them rather than when the
+whole scan ends.
+
+A sweep is two passes:
+
+  discovery  every host, the plain port scan (NMAP_DISCOVERY_ARGS)
+  version    -sV (NMAP_VERSION_ARGS) only for hosts whose set of open ports
+             differs from the last run's; the rest are reported from the
+             state file (NMAP_STATE) with detail['cached'] set
+
+Configured through environment variables (or the NmapSweep arguments):
+
+  NMAP_PATH            nmap binary (default nmap)
+  NMAP_TIMING          timing template, -T<n> (default 4)
+  NMAP_BATCH_SIZE      hosts per nmap process (default 256)
+  NMAP_PARALLEL        nmap processes at once (default 4)
+  NMAP_HOST_TIMEOUT    --host-timeout (default 15m)
+  NMAP_DISCOVERY_ARGS  default --open
+  NMAP_VERSION_ARGS    default -sV --script ssl-cert
+  NMAP_STATE           open ports and services of the last run (default nmap_state.json)
+"""
+
+import asyncio, json, os, shlex, shutil, tempfile, time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from .results import Result
+from .targets import iter_hosts, parse_targets, parse_ports
+
+NMAP_PATH = os.environ.get("NMAP_PATH", "nmap")
+NMAP_TIMING = os.environ.get("NMAP_TIMING", "4")
+NMAP_BATCH_SIZE = int(os.environ.get("NMAP_BATCH_SIZE", "256"))
+NMAP_PARALLEL = int(os.environ.get("NMAP_PARALLEL", "4"))
+NMAP_HOST_TIMEOUT = os.environ.get("NMAP_HOST_TIMEOUT", "15m")
+NMAP_DISCOVERY_ARGS = os.environ.get("NMAP_DISCOVERY_ARGS", "--open")
+NMAP_VERSION_ARGS = os.environ.get("NMAP_VERSION_ARGS", "-sV --script ssl-cert")
+NMAP_STATE = os.environ.get("NMAP_STATE", "nmap_state.json")
+
+_DONE = object()
+
+class NmapError(Exception):
+    pass
+
+def port_spec(ports):
+    """[1521, 1522, 1523, 2484] -> '1521-1523,2484'."""
+    out, ports = [], sorted(set(ports))
+    i = 0
+    while i < len(ports):
+        j = i
+        while j + 1 < len(ports) and ports[j + 1] == ports[j] + 1:
+            j += 1
+        out.append(str(ports[i]) if i == j else f"{ports[i]}-{ports[j]}")
+        i = j + 1
+    return ",".join(out)
+
+def batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# -------------------- XML --------------------
+def host_record(elem):
+    """One <host> element -> {'addr', 'host', 'status', 'rtt_ms', 'ports': [...]}."""
+    addr = None
+    for a in elem.findall('address'):
+        if a.get('addrtype') in ('ipv4', 'ipv6'):
+            addr = a.get('addr')
+            break
+    names = [h.get('name') for h in elem.findall('hostnames/hostname')]
+    user = [h.get('name') for h in elem.findall('hostnames/hostname') if h.get('type') == 'user']
+    status = elem.find('status')
+    times = elem.find('times')
+    srtt = times.get('srtt') if times is not None else None
+    ports = []
+    for p in elem.findall('ports/port'):
+        state = p.find('state')
+        svc = p.find('service')
+        svc = svc.attrib if svc is not None else {}
+        scripts = {s.get('id'): s.get('output') for s in p.findall('script')}
+        product = svc.get('product') or ''
+        ports.append({
+            'port': int(p.get('portid')),
+            'proto': p.get('protocol'),
+            'state': state.get('state') if state is not None else 'unknown',
+            'service': svc.get('name'),
+            'product': product or None,
+            'version': svc.get('version'),
+            'extrainfo': svc.get('extrainfo'),
+            'tunnel': svc.get('tunnel'),
+            'encrypted': (svc.get('tunnel') == 'ssl' or 'ssl-cert' in scripts
+                          or 'ssl' in product.lower() or 'tls' in product.lower()),
+            'scripts': scripts or None,
+        })
+    return {'addr': addr,
+            'host': (user or names or [addr])[0],
+            'status': status.get('state') if status is not None else None,
+            'rtt_ms': round(int(srtt) / 1000, 3) if srtt and srtt.isdigit() else None,
+            'ports': ports}
+
+async def run_nmap(hosts, ports, args, timing=NMAP_TIMING, host_timeout=NMAP_HOST_TIMEOUT, nmap=NMAP_PATH):
+    """
+    Async iterator of host records (see host_record) from one nmap process
+    over hosts, as nmap writes them. NmapError when nmap fails.
+    """
+    fd, path = tempfile.mkstemp(prefix='nmap-', suffix='.lst')
+    with os.fdopen(fd, 'w') as fh:
+        fh.write("\n".join(hosts) + "\n")
+    cmd = [nmap, *shlex.split(args), f"-T{timing}", "--host-timeout", host_timeout,
+           "-p", port_spec(ports), "-oX", "-", "-iL", path]
+    proc = None
+    try:
+        proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.PIPE)
+        stderr = asyncio.ensure_future(proc.stderr.read())
+        parser = ET.XMLPullParser(events=('start', 'end'))
+        root = None
+        while True:
+            chunk = await proc.stdout.read(1 << 16)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                elif elem.tag == 'host':
+                    yield host_record(elem)
+                    root.clear()        # hosts already reported are not kept
+        rc = await proc.wait()
+        err = (await stderr).decode(errors='replace').strip()
+        if rc != 0:
+            raise NmapError(f"nmap exited {rc}: {err[-500:]}")
+    finally:
+        if proc is not None and proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        os.unlink(path)
+
+# -------------------- state --------------------
+def load_state(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as fh:
+        return json.load(fh).get('hosts', {})
+
+def save_state(path, hosts):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump({'saved': time.strftime('%Y-%m-%dT%H:%M:%S'), 'hosts': hosts}, fh)
+    os.replace(tmp, path)
+
+class NmapSweep:
+    """
+    sweep = NmapSweep([1521, 1522, 2484])
+    async for r in sweep.scan(parse_targets(['10.0.0.0/22', '@dbhosts.txt'])):
+        ...
+
+    Yields a Result (probe='nmap') per open port; detail holds nmap's
+    service fields (service, product, version, extrainfo, tunnel, encrypted,
+    scripts). state_path=None runs -sV on every host and keeps no state.
+    Failed batches are listed in .errors; their hosts keep their old state.
+    """
+    probe_name = 'nmap'
+
+    def __init__(self, ports, batch_size=NMAP_BATCH_SIZE, parallel=NMAP_PARALLEL, timing=NMAP_TIMING,
+                 host_timeout=NMAP_HOST_TIMEOUT, discovery_args=NMAP_DISCOVERY_ARGS,
+                 version_args=NMAP_VERSION_ARGS, nmap=NMAP_PATH, state_path=NMAP_STATE):
+        self.ports = sorted(set(ports))
+        self.batch_size = max(1, batch_size)
+        self.parallel = max(1, parallel)
+        self.timing = timing
+        self.host_timeout = host_timeout
+        self.discovery_args = discovery_args
+        self.version_args = version_args
+        self.nmap = nmap
+        self.state_path = state_path
+        self.stats = Counter()
+        self.errors = []
+
+    async def _fan_out(self, jobs, args):
+        """Host records from an nmap process per (hosts, ports) job, `parallel`
+        at a time, merged as they stream."""
+        jobs = iter(jobs)
+        queue = asyncio.Queue(self.parallel * 4)
+
+        async def worker():
+            for hosts, ports in jobs:
+                self.stats['nmap_runs'] += 1
+                try:
+                    async for rec in run_nmap(hosts, ports, args, self.timing, self.host_timeout, self.nmap):
+                        await queue.put(rec)
+                except (NmapError, OSError) as e:
+                    self.errors.append(f"{len(hosts)} hosts from {hosts[0]}: {e}")
+            await queue.put(_DONE)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.parallel)]
+        try:
+            running = len(workers)
+            while running:
+                rec = await queue.get()
+                if rec is _DONE:
+                    running -= 1
+                    continue
+                yield rec
+        finally:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def _results(self, rec, ports, cached=False):
+        for p in ports:
+            detail = {k: p[k] for k in ('service', 'product', 'version', 'extrainfo', 'tunnel',
+                                        'encrypted', 'scripts')}
+            if cached:
+                detail['cached'] = True
+            self.stats['cached' if cached else 'versioned'] += 1
+            yield Result(rec['host'], rec['addr'], p['port'], self.probe_name, p['state'], rec['rtt_ms'], detail)
+
+    async def scan(self, targets):
+        """Async iterator of Results for the open ports of targets, as they are known."""
+        if shutil.which(self.nmap) is None:
+            raise NmapError(f"nmap not found: {self.nmap} (set NMAP_PATH)")
+        t0 = time.perf_counter()
+        state = load_state(self.state_path)
+        changed = []
+        jobs = ((hosts, self.ports) for hosts in batches(iter_hosts(targets), self.batch_size))
+        async for rec in self._fan_out(jobs, self.discovery_args):
+            self.stats['hosts'] += 1
+            if rec['addr'] is None:
+                continue
+            open_ports = sorted(p['port'] for p in rec['ports'] if p['state'] == 'open')
+            prev = state.get(rec['addr'])
+            if self.state_path and prev is not None and prev['open'] == open_ports:
+                for r in self._results(rec, prev['ports'], cached=True):
+                    yield r
+                continue
+            self.stats['changed'] += 1
+            if open_ports:
+                changed.append((rec['addr'], open_ports))
+            else:
+                state[rec['addr']] = {'host': rec['host'], 'open': [], 'ports': []}
+
+        # -sV only where the open ports changed, spread over all `parallel`
+        # processes even when there are few; hosts are known up, so -Pn
+        self.stats['rescanned'] = len(changed)
+        size = max(1, min(self.batch_size, -(-len(changed) // self.parallel)))
+        jobs = (([a for a, _ in batch], sorted({p for _, ps in batch for p in ps}))
+                for batch in batches(changed, size))
+        want = dict(changed)
+        async for rec in self._fan_out(jobs, f"{self.version_args} -Pn"):
+            if rec['addr'] not in want:
+                continue
+            ports = [p for p in rec['ports'] if p['port'] in want[rec['addr']] and p['state'] == 'open']
+            state[rec['addr']] = {'host': rec['host'], 'open': want[rec['addr']], 'rtt_ms': rec['rtt_ms'],
+                                  'ports': ports}
+            for r in self._results(rec, ports):
+                yield r
+        if self.state_path:
+            save_state(self.state_path, state)
+        self.stats['seconds'] = time.perf_counter() - t0
+
+def nmap_scan(host, port_range, args=NMAP_VERSION_ARGS, **options):
+    """{port: detail} for the open ports of one host in port_range ('1521-1530'):
+    a one-off version scan with no state file, for the old single-host scripts."""
+    async def run():
+        sweep = NmapSweep(parse_ports(port_range), version_args=args, state_path=None, **options)
+        found = {r.port: r.detail async for r in sweep.scan(parse_targets([host]))}
+        if sweep.errors:
+            raise NmapError("; ".join(sweep.errors))
+        return found
+    return asyncio.run(run())
@@ -0,0 +1,307 @@
+"""
+scanengine.portscan
+
+Asyncio TCP connect scanner. One event loop drives thousands of non-blocking
+connects at once instead of one blocking connect_ex per port:
+
+- a global limit on connects in flight (`concurrency`) and a per-address
+  limit (`per_host`), so a sweep does not hammer any one server;
+- adaptive timeouts: each address's connect RTT is tracked the way TCP
+  tracks it (RFC 6298, srtt + 4 * rttvar), so once a host has answered, its
+  filtered ports cost a few RTTs instead of the full --timeout;
+- ports are probed port-major (every host's 1521, then every host's 1522,
+  ...), which spreads the load over hosts and lets the first answer of a host
+  set the timeout for its other ports;
+- results stream out as each probe completes (`async for r in scanner.scan(...)`).
+
+Open ports are closed with an RST (SO_LINGER 0), so a large sweep does not
+leave thousands of sockets in TIME_WAIT.
+"""
+
+import asyncio, socket, struct, time, errno, resource, ipaddress
+from collections import Counter
+from functools import lru_cache
+from .results import Result
+from .targets import iter_hosts, parse_targets
+
+# connect() errors that mean nothing at the address answered
+_UNREACHABLE = {errno.EHOSTUNREACH, errno.ENETUNREACH, errno.EHOSTDOWN, errno.ENETDOWN}
+_IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY}
+_LINGER_RST = struct.pack('ii', 1, 0)
+_DONE = object()
+
+class RttEstimator:
+    """Smoothed RTT and its variance (RFC 6298) -> connect timeout in seconds."""
+    __slots__ = ('srtt', 'rttvar')
+
+    def __init__(self):
+        self.srtt = None
+        self.rttvar = None
+
+    def sample(self, rtt):
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    def rto(self):
+        return None if self.srtt is None else self.srtt + 4 * self.rttvar
+
+def fd_budget(reserve=64):
+    """Sockets this process can have open at once: the soft RLIMIT_NOFILE,
+    raised to the hard limit first when allowed. It changes the process's
+    limit, so the scripts call it once at startup to cap --concurrency; the
+    scanners take the concurrency they are given."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard != resource.RLIM_INFINITY and soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+        except (ValueError, OSError):
+            pass
+    return max(1, soft - reserve)
+
+class PortScanner:
+    """
+    scanner = PortScanner(concurrency=2000, per_host=16, timeout=1.0)
+    async for r in scanner.scan(parse_targets(['10.0.0.0/24']), [1521, 1522]):
+        ...
+
+    timeout is the connect timeout for an address that has not answered yet
+    (and the ceiling for adaptive ones, with max_timeout); a timed-out
+    connect is retried `retries` times with the timeout doubled. `states`
+    limits what scan() yields (e.g. {'open'}); stats counts every probe.
+    """
+    probe_name = 'tcp'      # Result.probe; subclasses with an on_open probe name theirs
+
+    def __init__(self, concurrency=1000, per_host=16, timeout=1.0, min_timeout=0.05,
+                 max_timeout=None, retries=1, states=None):
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout or max(timeout, 3.0)
+        self.retries = retries
+        self.states = set(states) if states else None
+        self.stats = Counter()
+        self._rtt = {}          # addr -> RttEstimator
+        self._resolved = {}     # hostname -> future of (family, addr) or None
+        self._slots = {}        # addr -> [Semaphore, users]
+
+    # -------------------- timeouts --------------------
+    def connect_timeout(self, addr):
+        est = self._rtt.get(addr)
+        rto = est.rto() if est else None
+        if rto is None:
+            return self.timeout
+        return min(self.max_timeout, max(self.min_timeout, rto))
+
+    # -------------------- name resolution --------------------
+    async def resolve(self, host):
+        """(family, address) for host, or None; each hostname is looked up once."""
+        try:
+            return _literal(host)
+        except ValueError:
+            pass
+        fut = self._resolved.get(host)
+        if fut is None:
+            fut = self._resolved[host] = asyncio.ensure_future(self._lookup(host))
+        return await fut
+
+    @staticmethod
+    async def _lookup(host):
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError):
+            return None
+        # IPv4 first: what an Oracle client's default resolution would try
+        infos.sort(key=lambda i: i[0] != socket.AF_INET)
+        return (infos[0][0], infos[0][4][0]) if infos else None
+
+    # -------------------- one connect --------------------
+    async def connect(self, family, addr, port, timeout):
+        """
+        (state, rtt seconds or None, socket or error text): a non-blocking
+        connect with a timeout. The connected socket of an open port is
+        returned to the caller, who closes it (see close_rst).
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+        except OSError as e:
+            return 'error', None, e.strerror
+        sock.setblocking(False)
+        t0 = time.perf_counter()
+        try:
+            err = sock.connect_ex((addr, port))
+            if err in _IN_PROGRESS:
+                fut = loop.create_future()
+                fd = sock.fileno()
+                loop.add_writer(fd, _wake, fut, True)
+                timer = loop.call_later(timeout, _wake, fut, False)
+                try:
+                    ready = await fut
+                finally:
+                    loop.remove_writer(fd)
+                    timer.cancel()
+                if not ready:
+                    sock.close()
+                    return 'filtered', None, None
+                err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        except BaseException:
+            sock.close()
+            raise
+        rtt = time.perf_counter() - t0
+        if err == 0:
+            return 'open', rtt, sock
+        sock.close()
+        if err == errno.ECONNREFUSED:
+            return 'closed', rtt, None
+        if err in _UNREACHABLE:
+            return 'unreachable', None, None
+        return 'error', None, errno.errorcode.get(err, str(err))
+
+    async def probe(self, host, port):
+        """One Result for host:port."""
+        target = await self.resolve(host)
+        if target is None:
+            return Result(host, None, port, self.probe_name, 'unresolved', None, None)
+        family, addr = target
+        slot = self._slots.get(addr)
+        if slot is None:
+            slot = self._slots[addr] = [asyncio.Semaphore(self.per_host), 0]
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                return await self._probe_addr(host, family, addr, port)
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                del self._slots[addr]
+
+    async def connect_retrying(self, family, addr, port):
+        """connect() with the address's adaptive timeout, retried with it
+        doubled while the port stays silent; feeds the RTT estimate."""
+        timeout = self.connect_timeout(addr)
+        for attempt in range(self.retries + 1):
+            self.stats['connects'] += 1
+            state, rtt, extra = await self.connect(family, addr, port, timeout)
+            if rtt is not None:
+                # refused connects are answers too: they time the path just as well
+                self._rtt.setdefault(addr, RttEstimator()).sample(rtt)
+            if state != 'filtered':
+                break
+            timeout = min(self.max_timeout, timeout * 2)
+        return state, rtt, extra
+
+    async def _probe_addr(self, host, family, addr, port):
+        state, rtt, extra = await self.connect_retrying(family, addr, port)
+        detail = None
+        if state == 'open':
+            detail = await self.on_open(extra, host, addr, port)
+        elif state == 'error':
+            detail = {'error': extra}
+        return Result(host, addr, port, self.probe_name, state, None if rtt is None else round(rtt * 1000, 3), detail)
+
+    async def on_open(self, sock, host, addr, port):
+        """Hook for a follow-up probe on the connected socket; returns the
+        Result detail. The base scanner only closes it."""
+        close_rst(sock)
+        return None
+
+    # -------------------- the sweep --------------------
+    async def scan(self, targets, ports):
+        """Async iterator of Results for every (host, port), as probes complete."""
+        async for r in self.run((host, port) for port in ports for host in iter_hosts(targets)):
+            yield r
+
+    async def run(self, jobs):
+        """
+        Async iterator of Results for (host, port) jobs, as probes complete.
+        jobs is an iterable, or an async iterable (e.g. fed by an earlier
+        stage), consumed lazily by `concurrency` workers.
+        """
+        if hasattr(jobs, '__aiter__'):
+            source, lock = jobs.__aiter__(), asyncio.Lock()
+
+            async def take():
+                async with lock:
+                    try:
+                        return await source.__anext__()
+                    except StopAsyncIteration:
+                        return None
+        else:
+            source = iter(jobs)
+
+            async def take():
+                # a plain iterator shared by all workers: next() never awaits
+                return next(source, None)
+
+        queue = asyncio.Queue(self.concurrency)
+        t0 = time.perf_counter()
+        errors = []
+
+        async def worker():
+            try:
+                while True:
+                    job = await take()
+                    if job is None:
+                        break
+                    host, port = job
+                    try:
+                        r = await self.probe(host, port)
+                    except Exception as e:
+                        r = Result(host, None, port, self.probe_name, 'error', None, {'error': str(e)})
+                    await queue.put(r)
+            except Exception as e:
+                errors.append(e)   # from the job source itself: end the run with it
+            await queue.put(_DONE)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        try:
+            running = len(workers)
+            while running:
+                r = await queue.get()
+                if r is _DONE:
+                    running -= 1
+                    continue
+                self.stats[r.state] += 1
+                self.stats['probes'] += 1
+                if self.states is None or r.state in self.states:
+                    yield r
+            if errors:
+                raise errors[0]
+        finally:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.stats['seconds'] = time.perf_counter() - t0
+
+def _wake(fut, value):
+    if not fut.done():
+        fut.set_result(value)
+
+@lru_cache(maxsize=65536)
+def _literal(host):
+    """(family, address) of an IP literal; ValueError for a hostname."""
+    a = ipaddress.ip_address(host)
+    return (socket.AF_INET6 if a.version == 6 else socket.AF_INET), str(a)
+
+def close_rst(sock):
+    """Close with an RST instead of a FIN: no TIME_WAIT left behind."""
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RST)
+    except OSError:
+        pass
+    sock.close()
+
+def scan_ports(host, port_range, **options):
+    """Open ports of one host in port_range (lo, hi): the synchronous
+    stuf/soc.py entry point, now one concurrent sweep."""
+    async def run():
+        scanner = PortScanner(states={'open'}, **options)
+        ports = range(port_range[0], port_range[1] + 1)
+        return sorted([r.port async for r in scanner.scan(parse_targets([host]), ports)])
+    return asyncio.run(run())
@@ -0,0 +1,21 @@
+"""
+scanengine.results
+
+The one record every scanner stage yields, so results from different probes
+can be merged, deduplicated and written the same way.
+"""
+
+from collections import namedtuple
+
+# host: the target as given (hostname or address); addr: the address probed,
+# or for the host-side probes (ssh, ss, local) the address a socket listens on
+# state: open | closed | filtered | unreachable | unresolved | error
+# rtt_ms: connect round trip (None when there was none); detail: probe-specific dict or None
+Result = namedtuple("Result", "host addr port probe state rtt_ms detail")
+
+def as_dict(r):
+    """A Result as a flat dict for JSON output; detail keys are merged in."""
+    d = r._asdict()
+    detail = d.pop("detail") or {}
+    d.update(detail)
+    return d
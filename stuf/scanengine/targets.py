@@ -0,0 +1,79 @@
+"""
+scanengine.targets
+
+Target and port lists as the CLI takes them:
+
+  targets  10.0.0.0/24, 10.0.1.7, 2001:db8::/120, db01.example.com, @hosts.txt
+  ports    1521-1530,2484,22
+
+Networks are expanded lazily, so a large range is not held in memory.
+"""
+
+import ipaddress
+
+def parse_ports(spec):
+    """'1521-1530,2484' -> sorted list of unique ports."""
+    ports = set()
+    for part in str(spec).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        lo, _, hi = part.partition('-')
+        lo, hi = int(lo), int(hi or lo)
+        if not (0 < lo <= hi <= 65535):
+            raise ValueError(f"bad port range: {part}")
+        ports.update(range(lo, hi + 1))
+    return sorted(ports)
+
+def _read_list(path):
+    with open(path) as fh:
+        for line in fh:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                yield from line.split()
+
+def parse_targets(specs):
+    """
+    Target specs -> list of ipaddress networks and hostnames. '@file' reads
+    one spec per line (# comments allowed). A bare address becomes a /32 (/128).
+    """
+    out = []
+    for spec in specs:
+        spec = spec.strip()
+        if not spec:
+            continue
+        if spec.startswith('@'):
+            out.extend(parse_targets(_read_list(spec[1:])))
+            continue
+        try:
+            out.append(ipaddress.ip_network(spec, strict=False))
+        except ValueError:
+            out.append(spec)  # hostname, resolved at scan time
+    return out
+
+def iter_hosts(targets):
+    """Every host of the targets, in order: addresses as strings, hostnames as given."""
+    for t in targets:
+        if isinstance(t, str):
+            yield t
+        elif t.num_addresses == 1:
+            yield str(t.network_address)
+        else:
+            # .hosts() skips the network and broadcast addresses of IPv4 ranges
+            # and the Subnet-Router anycast address of IPv6 ones
+            for a in t.hosts():
+                yield str(a)
+
+def count_hosts(targets):
+    """How many hosts iter_hosts() yields, without listing them."""
+    n = 0
+    for t in targets:
+        if isinstance(t, str) or t.num_addresses == 1:
+            n += 1
+        elif t.num_addresses == 2:
+            n += 2          # /31 and /127: .hosts() keeps both
+        elif t.version == 4:
+            n += t.num_addresses - 2    # network and broadcast
+        else:
+            n += t.num_addresses - 1    # the Subnet-Router anycast address
+    return n
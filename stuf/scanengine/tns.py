@@ -0,0 +1,232 @@
+"""
+scanengine.tns
+
+Oracle TNS listener fingerprinting on top of the port scanner. Every open
+port gets a real TNS CONNECT carrying (CONNECT_DATA=(COMMAND=version)), sent
+on the socket the connect scan already opened, and the reply is parsed:
+
+  REFUSE    (DESCRIPTION=(TMP=)(VSNNUM=318767104)(ERR=1189)(ERROR_STACK=...))
+            what 10g+ listeners answer a remote version command with; the
+            VSNNUM still gives the listener version (318767104 -> 19.0.0.0.0)
+  ACCEPT    followed by DATA packets with the banner text
+            "TNSLSNR for Linux: Version 11.2.0.4.0 - Production"
+  REDIRECT  (ADDRESS=(PROTOCOL=tcp)(HOST=...)(PORT=...)): where it sends us
+
+A port that drops the plain probe (EOF, reset or a TLS alert) is tried once
+more over TLS: a TCPS listener shows its certificate, and answers the same
+CONNECT when it does not require a client certificate.
+"""
+
+import asyncio, hashlib, re, socket, ssl, struct
+from functools import lru_cache
+from .portscan import PortScanner, _LINGER_RST
+from .targets import parse_targets
+
+# packet types
+CONNECT, ACCEPT, REFUSE, REDIRECT, DATA, RESEND, MARKER = 1, 2, 4, 5, 6, 11, 12
+PACKET_NAMES = {CONNECT: 'CONNECT', ACCEPT: 'ACCEPT', REFUSE: 'REFUSE', REDIRECT: 'REDIRECT',
+                DATA: 'DATA', RESEND: 'RESEND', MARKER: 'MARKER'}
+
+# protocol 314 (10g/11g) with 300 as the oldest we accept: every listener
+# since 8i answers it, and replies keep the 2-byte packet length
+TNS_VERSION, TNS_COMPAT = 0x013A, 0x012C
+VERSION_COMMAND = b"(CONNECT_DATA=(COMMAND=version))"
+_HEADER = struct.Struct('>HHBBH')               # length, checksum, type, flags, header checksum
+_CONNECT = struct.Struct('>HHHHHHHHHHIBB')      # see connect_packet
+_CONNECT_DATA_OFFSET = 58
+_TLS_RECORD = (0x15, 0x16)                      # alert, handshake
+_MAX_REPLY = 64 * 1024
+
+def connect_packet(data=VERSION_COMMAND):
+    """A CONNECT packet carrying data (at most 230 bytes fit in the packet itself)."""
+    body = _CONNECT.pack(TNS_VERSION, TNS_COMPAT,
+                         0,             # service options
+                         0x0800,        # SDU
+                         0x7FFF,        # max TDU
+                         0x7F08,        # NT protocol characteristics
+                         0,             # line turnaround
+                         1,             # 1 in hardware byte order
+                         len(data), _CONNECT_DATA_OFFSET,
+                         0,             # max receivable connect data
+                         0, 0)          # connect flags
+    pad = b"\0" * (_CONNECT_DATA_OFFSET - _HEADER.size - len(body))
+    return _HEADER.pack(_CONNECT_DATA_OFFSET + len(data), 0, CONNECT, 0, 0) + body + pad + data
+
+def vsnnum_version(vsnnum):
+    """VSNNUM -> dotted version: 0x13000000 -> '19.0.0.0.0', 0x0B200400 -> '11.2.0.4.0'."""
+    v = int(vsnnum)
+    return f"{v >> 24}.{(v >> 20) & 0xF}.{(v >> 12) & 0xFF}.{(v >> 8) & 0xF}.{v & 0xFF}"
+
+# -------------------- packets --------------------
+def packet_text(ptype, body):
+    """The text a reply packet carries (NV string or banner), or b''."""
+    try:
+        if ptype == REFUSE:
+            n, = struct.unpack_from('>H', body, 2)
+            return body[4:4 + n]
+        if ptype == REDIRECT:
+            n, = struct.unpack_from('>H', body, 0)
+            return body[2:2 + n]
+        if ptype == ACCEPT:
+            n, off = struct.unpack_from('>HH', body, 10)
+            off -= _HEADER.size
+            return body[off:off + n] if n and off >= 16 else b""
+        if ptype == DATA:
+            return body[2:]
+    except struct.error:
+        pass
+    return b""
+
+async def read_packet(reader):
+    """(type, body) of the next packet; ValueError when the bytes are not TNS
+    (its args carry the first bytes read)."""
+    header = await reader.readexactly(_HEADER.size)
+    length, _, ptype, _, _ = _HEADER.unpack(header)
+    if ptype not in PACKET_NAMES or length < _HEADER.size:
+        raise ValueError(header)
+    return ptype, await reader.readexactly(length - _HEADER.size)
+
+async def exchange(reader, writer, timeout):
+    """
+    Send the version CONNECT and read the reply packets until the listener
+    has said its piece (REFUSE / REDIRECT, or ACCEPT and its banner), closes,
+    or timeout passes. Returns (packets, tls_hint): tls_hint is set when the
+    port dropped us or answered with a TLS record instead.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    packets, size, resent = [], 0, False
+    writer.write(connect_packet())
+    while size < _MAX_REPLY:
+        try:
+            ptype, body = await asyncio.wait_for(read_packet(reader), max(0.0, deadline - loop.time()))
+        except ValueError as e:
+            return packets, not packets and e.args[0][0] in _TLS_RECORD
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            partial = getattr(e, 'partial', b"")
+            return packets, not packets and (not partial or partial[0] in _TLS_RECORD)
+        except (asyncio.TimeoutError, OSError):
+            return packets, False
+        if ptype == RESEND and not resent:
+            writer.write(connect_packet())
+            resent = True
+            continue
+        if ptype == MARKER:
+            continue
+        packets.append((ptype, body))
+        size += len(body)
+        if ptype in (REFUSE, REDIRECT) or (ptype == DATA and b"Version" in body):
+            break
+    return packets, False
+
+def fingerprint(packets):
+    """Result detail from the reply packets; None unless they open with a
+    listener's answer to a CONNECT."""
+    if not packets or packets[0][0] not in (ACCEPT, REFUSE, REDIRECT):
+        return None
+    text = b"".join(packet_text(t, b) for t, b in packets).decode('latin-1')
+    nv = {k.upper(): v for k, v in re.findall(r"\((\w+)=([^()]*)\)", text)}
+    d = {'service': 'oracle-tns', 'packet': PACKET_NAMES[packets[0][0]], 'tls': False,
+         'version': None, 'vsnnum': None, 'err': None}
+    if nv.get('VSNNUM', '').isdigit():
+        d['vsnnum'] = int(nv['VSNNUM'])
+        d['version'] = vsnnum_version(d['vsnnum'])
+    if nv.get('ERR', '').isdigit():
+        d['err'] = int(nv['ERR'])
+    d['error_codes'] = [int(c) for c in re.findall(r"\(CODE=(\d+)\)", text, re.I)]
+    m = re.search(r"Version (\d+(?:\.\d+)+)", text)
+    if m:
+        d['version'] = m.group(1)      # the banner is more exact than VSNNUM on old listeners
+    if packets[0][0] == ACCEPT:
+        d['protocol'] = struct.unpack_from('>H', packets[0][1])[0]
+    if packets[0][0] == REDIRECT and 'HOST' in nv:
+        d['redirect'] = f"{nv['HOST']}:{nv.get('PORT', '')}"
+    banner = " ".join(text.split())
+    d['banner'] = banner[:512] if banner else None
+    return d
+
+# -------------------- probes --------------------
+async def probe_plain(sock, timeout):
+    """(detail or None, tls_hint) from a TNS exchange on a connected socket,
+    which is closed (with an RST) afterwards."""
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RST)
+        reader, writer = await asyncio.open_connection(sock=sock)
+    except OSError:
+        sock.close()
+        return None, False
+    try:
+        packets, tls_hint = await exchange(reader, writer, timeout)
+    finally:
+        writer.transport.abort()
+    return fingerprint(packets), tls_hint
+
+@lru_cache(maxsize=None)
+def _tls_context():
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    try:
+        # old TCPS listeners still speak TLS 1.0 with old ciphers
+        ctx.minimum_version = ssl.TLSVersion.TLSv1
+        ctx.set_ciphers('ALL:@SECLEVEL=0')
+    except (ValueError, ssl.SSLError):
+        pass
+    return ctx
+
+async def probe_tcps(host, addr, port, timeout):
+    """Detail for a TLS listener at addr:port, or None when no TLS handshake
+    completes. A TCPS listener that also answers the CONNECT is fingerprinted
+    like a plain one; one that wants a client certificate shows only its own."""
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(addr, port, ssl=_tls_context(), server_hostname=host if host != addr else None),
+            timeout)
+    except (asyncio.TimeoutError, OSError):     # ssl.SSLError is an OSError
+        return None
+    try:
+        tls = writer.get_extra_info('ssl_object')
+        der = tls.getpeercert(binary_form=True)
+        info = {'tls': True, 'tls_version': tls.version(),
+                'cert_sha256': hashlib.sha256(der).hexdigest() if der else None}
+        packets, _ = await exchange(reader, writer, timeout)
+    finally:
+        writer.transport.abort()
+    detail = fingerprint(packets)
+    if detail is None:
+        return {'service': 'tls', 'error': 'no TNS reply over TLS (client certificate required?)', **info}
+    detail.update(info)
+    return detail
+
+class TnsScanner(PortScanner):
+    """
+    PortScanner whose open ports are fingerprinted as TNS listeners on the
+    connection the scan opened: Result.detail is fingerprint()'s dict (plus
+    tls, tls_version and cert_sha256 for TCPS), or None for anything else.
+    reply_timeout bounds each exchange; tcps=False skips the TLS retry.
+    """
+    probe_name = 'tns'
+
+    def __init__(self, *args, reply_timeout=2.0, tcps=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reply_timeout = reply_timeout
+        self.tcps = tcps
+
+    async def on_open(self, sock, host, addr, port):
+        detail, tls_hint = await probe_plain(sock, self.reply_timeout)
+        if detail is None and tls_hint and self.tcps:
+            self.stats['tls_attempts'] += 1
+            detail = await probe_tcps(host, addr, port, self.reply_timeout)
+        if detail is not None:
+            self.stats[detail['service']] += 1
+        return detail
+
+def find_listeners(host, port_range, **options):
+    """[(port, detail)] of every TNS (or TLS) listener of one host in
+    port_range (lo, hi), all ports probed at once."""
+    async def run():
+        scanner = TnsScanner(states={'open'}, **options)
+        ports = range(port_range[0], port_range[1] + 1)
+        return sorted([(r.port, r.detail) async for r in scanner.scan(parse_targets([host]), ports)
+                       if r.detail is not None])
+    return asyncio.run(run())
@@ -1,7 +1,8 @@
 import subprocess
-import re
 import json
 
+from scanengine import parse_lsnrctl
+
 
 def get_oracle_services():
     """
@@ -13,13 +14,10 @@ def get_oracle_services():
     try:
         result = subprocess.run(['lsnrctl', 'status'], capture_output=True, text=True)
 
-        # Extract services and instances using regular expressions
-        services = re.findall(r'Service\s+"(.+?)".*?Instance\s+"(.+?)"', result.stdout)
-
         # Format the services into a JSON-compatible dictionary
         services_data = [
-            {"service": service, "instance": instance}
-            for service, instance in services
+            {"service": s["service"], "instance": s["instance"]}
+            for s in parse_lsnrctl(result.stdout)["services"] if s["instance"]
         ]
 
         return json.dumps(services_data)  # Convert to JSON string
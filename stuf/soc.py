@@ -1,16 +1,34 @@
-import socket
+import argparse, asyncio
+
+# scan_ports(host, (lo, hi)) -> open ports, as before; now one concurrent sweep
+from scanengine import PortScanner, parse_targets, parse_ports, count_hosts, scan_ports, fd_budget  # noqa: F401
+
+
+async def sweep(targets, ports, **options):
+    """Print each open port as soon as it is found, then a one-line summary."""
+    scanner = PortScanner(states={'open'}, **options)
+    async for r in scanner.scan(targets, ports):
+        name = r.host if r.host == r.addr else f"{r.host} ({r.addr})"
+        print(f"{name}:{r.port} open  rtt {r.rtt_ms:.1f} ms", flush=True)
+    st = scanner.stats
+    print(f"{st['probes']} probes in {st['seconds']:.2f}s ({st['probes'] / max(st['seconds'], 1e-6):.0f}/s): "
+          f"{st['open']} open, {st['closed']} closed, {st['filtered']} filtered, "
+          f"{st['unreachable'] + st['unresolved'] + st['error']} unreachable/unresolved/error")
 
-def scan_ports(host, port_range):
-    open_ports = []
-    for port in range(port_range[0], port_range[1] + 1):
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.settimeout(1)  # Timeout for the connection
-            result = sock.connect_ex((host, port))
-            if result == 0:
-                open_ports.append(port)
-    return open_ports
 
 if __name__ == "__main__":
-    target_host = "localhost"  # Replace with the target server's IP
-    ports = scan_ports(target_host, (20, 30))  # Scan ports 1-1024
-    print(f"Open ports on {target_host}: {ports}")
+    p = argparse.ArgumentParser(description="Concurrent TCP connect scan of hosts, CIDR ranges and @host files.")
+    p.add_argument('targets', nargs='*', default=['localhost'], help="e.g. 10.0.0.0/24 db01.example.com @hosts.txt")
+    p.add_argument('--ports', default='20-30', help="e.g. 1521-1530,2484")
+    p.add_argument('--concurrency', type=int, default=1000, help="connects in flight overall")
+    p.add_argument('--per-host', type=int, default=16, help="connects in flight per address")
+    p.add_argument('--timeout', type=float, default=1.0, help="connect timeout before a host has answered")
+    p.add_argument('--retries', type=int, default=1, help="retries of a timed-out connect")
+    args = p.parse_args()
+    args.concurrency = min(args.concurrency, fd_budget())    # raises the open-files limit once
+
+    targets = parse_targets(args.targets)
+    ports = parse_ports(args.ports)
+    print(f"Scanning {count_hosts(targets)} hosts x {len(ports)} ports...")
+    asyncio.run(sweep(targets, ports, concurrency=args.concurrency, per_host=args.per_host,
+                      timeout=args.timeout, retries=args.retries))
@@ -1,26 +1,15 @@
 import subprocess
 
+from scanengine import parse_ss
+
 
 def sniff_listening_ports():
     try:
-        # Run the ss command to list listening ports
-        result = subprocess.run(['ss', '-lt'], capture_output=True, text=True, check=True)
-        lines = result.stdout.splitlines()
-
-        listening_ports = []
-        for line in lines[1:]:  # Skip the header line
-            parts = line.split()
-            if len(parts) >= 5:
-                proto = parts[0]  # Protocol (e.g., tcp)
-                local_address = parts[3]  # Local address and port
-                address, port = local_address.rsplit(':', 1)
-                listening_ports.append({
-                    'protocol': proto.upper(),
-                    'local_address': address,
-                    'port': port
-                })
-
-        return listening_ports
+        # Run the ss command to list listening TCP ports (numeric, so ports stay numbers)
+        result = subprocess.run(['ss', '-ltn'], capture_output=True, text=True, check=True)
+        return [{'protocol': rec['proto'].upper(),
+                 'local_address': rec['address'],
+                 'port': rec['port']} for rec in parse_ss(result.stdout)]
     except Exception as e:
         print(f"Error sniffing ports: {e}")
         return []
@@ -1,27 +1,61 @@
-import socket
+import argparse, asyncio
+
+# probe_oracle_listener / find_oracle_port as before, on the scanengine TNS probe
+from scanengine import TnsScanner, parse_targets, parse_ports, count_hosts, find_listeners, fd_budget
+
 def probe_oracle_listener(host, port):
-    tns_probe = b"\x00\x3a\x00\x00\x01\x00\x00\x00\x01\x00\x00\x00\x01\x35\x00\x00\x0c\x01\x2c\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00"
-    try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.settimeout(2)
-            sock.connect((host, port))
-            sock.sendall(tns_probe)
-            response = sock.recv(1024)
-            if b"ERROR" in response and b"Oracle" in response:
-                return True
-    except Exception:
-        pass
-    return False
+    """Fingerprint of the TNS listener at host:port (a dict), or None."""
+    found = find_listeners(host, (port, port))
+    return found[0][1] if found else None
 
 def find_oracle_port(host, port_range):
-    for port in range(port_range[0], port_range[1] + 1):
-        if probe_oracle_listener(host, port):
-            print(f"Oracle listener detected on port {port}")
-            return port
-    print("Oracle listener not found in the specified range.")
-    return None
+    """Probe every port of port_range at once; print each listener found and
+    return the lowest port (None when there is none)."""
+    found = find_listeners(host, port_range)
+    for port, d in found:
+        print(f"Oracle listener detected on port {port}: {describe(d)}")
+    if not found:
+        print("Oracle listener not found in the specified range.")
+        return None
+    return found[0][0]
+
+def describe(d):
+    if d['service'] != 'oracle-tns':
+        return f"{d['service']} ({d.get('tls_version')}, {d.get('error')})"
+    s = f"{d['packet']} version {d['version'] or '?'}"
+    if d['tls']:
+        s += f" over {d['tls_version']}"
+    if d['err']:
+        s += f" ERR={d['err']}"
+    if d.get('redirect'):
+        s += f" -> {d['redirect']}"
+    return s
+
+async def sweep(targets, ports, **options):
+    """Print each listener as soon as it is fingerprinted, then a one-line summary."""
+    scanner = TnsScanner(states={'open'}, **options)
+    async for r in scanner.scan(targets, ports):
+        if r.detail is not None:
+            name = r.host if r.host == r.addr else f"{r.host} ({r.addr})"
+            print(f"{name}:{r.port} {describe(r.detail)}", flush=True)
+    st = scanner.stats
+    print(f"{st['probes']} probes in {st['seconds']:.2f}s: {st['open']} open, "
+          f"{st['oracle-tns']} TNS listeners, {st['tls']} TLS-only")
 
 if __name__ == "__main__":
-    server = "localhost"  # Replace with your target server IP
-    port_range = (1521, 1523)  # Typical Oracle listener range
-    find_oracle_port(server, port_range)
+    p = argparse.ArgumentParser(description="Find and fingerprint Oracle TNS listeners (plain and TCPS).")
+    p.add_argument('targets', nargs='*', default=['localhost'], help="e.g. 10.0.0.0/24 db01.example.com @hosts.txt")
+    p.add_argument('--ports', default='1521-1530,2484', help="e.g. 1521-1530,2484")
+    p.add_argument('--concurrency', type=int, default=1000, help="connects in flight overall")
+    p.add_argument('--per-host', type=int, default=16, help="connects in flight per address")
+    p.add_argument('--timeout', type=float, default=1.0, help="connect timeout before a host has answered")
+    p.add_argument('--reply-timeout', type=float, default=2.0, help="wait for a listener's reply")
+    p.add_argument('--no-tcps', action='store_true', help="do not retry silent ports over TLS")
+    args = p.parse_args()
+    args.concurrency = min(args.concurrency, fd_budget())    # raises the open-files limit once
+
+    targets = parse_targets(args.targets)
+    ports = parse_ports(args.ports)
+    print(f"Probing {count_hosts(targets)} hosts x {len(ports)} ports...")
+    asyncio.run(sweep(targets, ports, concurrency=args.concurrency, per_host=args.per_host,
+                      timeout=args.timeout, reply_timeout=args.reply_timeout, tcps=not args.no_tcps))